@@ -1,8 +1,12 @@
 import streamlit as st
 import google.generativeai as genai
-from data import get_showroom_data
-from helper import format_currency, search_mobil, get_response_from_gemini
+from conversation import ConversationMemory
+from data import SHOWROOM_STORE, get_shared_showroom_data
+from helper import format_currency, search_mobil, get_response_from_gemini, stream_response_from_gemini, get_local_response, route_local_answer, warm_up_caches
+from telemetry import REQUEST_SECONDS, RESPONSES, STAGE_SECONDS, get_logger, start_exporters
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 
 # Muat environment variables
@@ -14,7 +18,41 @@ if not api_key:
     st.error("❌ GEMINI_API_KEY tidak ditemukan di file .env")
     st.stop()
 
-genai.configure(api_key=api_key)
+
+@st.cache_resource(show_spinner=False)
+def configure_gemini(api_key: str):
+    """Konfigurasi Gemini sekali per proses agar client & koneksi tidak dibuat ulang setiap rerun"""
+    genai.configure(api_key=api_key)
+
+
+configure_gemini(api_key)
+
+# Log terstruktur + endpoint/file metrik (sekali per proses, lihat telemetry.py)
+log = get_logger("app")
+start_exporters()
+
+
+def record_local_answer(source: str, start: float):
+    """Mencatat metrik jawaban yang dihitung lokal tanpa model (filter, pembiayaan, aksi cepat)"""
+    elapsed = time.perf_counter() - start
+    REQUEST_SECONDS.observe(elapsed, mode="local", source=source)
+    RESPONSES.inc(source="local")
+    log.info("response", mode="local", source=source, latency=round(elapsed, 4))
+
+# Mode routing lokal untuk tombol aksi cepat (set LOCAL_QUICK_ACTIONS=false untuk selalu memakai Gemini)
+LOCAL_QUICK_ACTIONS = os.getenv("LOCAL_QUICK_ACTIONS", "true").lower() not in ("0", "false", "no")
+
+# Pesan chat dengan intent deterministik (jam, kontak, promo, katalog, harga) dijawab lokal (lihat intent.py)
+LOCAL_INTENT_ROUTING = os.getenv("LOCAL_INTENT_ROUTING", "true").lower() not in ("0", "false", "no")
+
+# Streaming jawaban ke chat bubble (set GEMINI_STREAMING=false untuk menunggu jawaban lengkap)
+GEMINI_STREAMING = os.getenv("GEMINI_STREAMING", "true").lower() not in ("0", "false", "no")
+
+# Hedged request (hanya untuk mode non-streaming): jeda (detik) sebelum model cadangan ikut dijalankan, kosong = coba model berurutan
+GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY")) if os.getenv("GEMINI_HEDGE_DELAY") else None
+
+# Batas total waktu tunggu jawaban Gemini (detik); setelah habis user dijawab dari data lokal. Kosong = default helper.py
+GEMINI_LATENCY_BUDGET = float(os.getenv("GEMINI_LATENCY_BUDGET")) if os.getenv("GEMINI_LATENCY_BUDGET") else None
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -269,14 +307,31 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Inisialisasi session state
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {"role": "assistant", "content": "Halo! Selamat datang di Showroom Mobil Sungkang. Saya siap membantu Anda mencari mobil impian. Ada yang bisa saya bantu?"}
-    ]
+# Inisialisasi session state (memori percakapan berukuran tetap, lihat conversation.py)
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+    st.session_state.memory.append(
+        "assistant",
+        "Halo! Selamat datang di Showroom Mobil Sungkang. Saya siap membantu Anda mencari mobil impian. Ada yang bisa saya bantu?"
+    )
+
+memory = st.session_state.memory
+
+# Id session untuk antrian request Gemini yang adil antar pengunjung (lihat rate_limit.py)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-if "showroom_data" not in st.session_state:
-    st.session_state.showroom_data = get_showroom_data()
+
+def show_queue_status(placeholder):
+    """Callback on_queue: tampilkan posisi antrian selama kuota semua model sedang habis"""
+    def show(position: int, wait_estimate: float):
+        placeholder.info(f"⏳ Sedang ramai, Anda di antrian ke-{position} (perkiraan {max(wait_estimate, 1):.0f} detik lagi)...")
+    return show
+
+# Referensi ke data bersama (read-only), bukan salinan per session.
+# Diambil ulang tiap rerun agar session ikut memakai data terbaru setelah file di-reload.
+SHOWROOM_STORE.add_listener(warm_up_caches)
+st.session_state.showroom_data = get_shared_showroom_data()
 
 # Header
 st.markdown("""
@@ -288,118 +343,145 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Tampilkan pesan chat
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+with STAGE_SECONDS.time(stage="render"):
+    # Pesan lama ditampilkan terlipat agar rerender tidak makin berat seiring panjang chat
+    if memory.archived:
+        with st.expander(f"🕘 Riwayat sebelumnya ({memory.summarized_messages} pesan)"):
+            if memory.summarized_messages > len(memory.archived):
+                st.caption(f"{memory.summarized_messages - len(memory.archived)} pesan paling awal hanya tersimpan sebagai ringkasan.")
+            for message in memory.archived:
+                label = "👤 Anda" if message["role"] == "user" else "🤖 Assistant"
+                st.markdown(f"**{label}:** {message['content']}")
+    
+    # Tampilkan pesan chat terbaru
+    for message in memory.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
 
 # Input chat
 if prompt := st.chat_input("Tanya tentang mobil, harga, promo, dll..."):
-    # Tambahkan pesan user ke history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    # History untuk prompt diambil sebelum pesan user ditambahkan
+    history = memory.messages
+    memory.append("user", prompt)
     
     with st.chat_message("user"):
         st.markdown(prompt)
     
     # Generate response
     with st.chat_message("assistant"):
-        with st.spinner("Tunggu ya..."):
-            print(f"[DEBUG] Pesan user: {prompt}")
-            
-            # Dapatkan response dari Gemini dengan konteks showroom
-            response = get_response_from_gemini(
+        log.debug("user_message", session=st.session_state.session_id, message=prompt[:100])
+        request_start = time.perf_counter()
+        
+        # Filter katalog, simulasi cicilan, dan intent deterministik dijawab tanpa model
+        response, local_source = route_local_answer(prompt, st.session_state.showroom_data, classify=LOCAL_INTENT_ROUTING, conversation_history=history)
+        
+        if response is not None:
+            record_local_answer(local_source, request_start)
+            st.markdown(response)
+        elif GEMINI_STREAMING:
+            # Tampilkan jawaban sedikit demi sedikit selama model masih menulis
+            queue_status = st.empty()
+            chunks = stream_response_from_gemini(
                 prompt,
                 st.session_state.showroom_data,
-                st.session_state.messages[:-1]  # Semua pesan kecuali pesan user terakhir
+                history,
+                conversation_summary=memory.summary,
+                session_id=st.session_state.session_id,
+                on_queue=show_queue_status(queue_status),
+                latency_budget=GEMINI_LATENCY_BUDGET
             )
+            placeholder = st.empty()
             
-            print(f"[DEBUG] Response diterima: {response[:100]}...")
-        
-        st.markdown(response)
+            with st.spinner("Tunggu ya..."):
+                response = next(chunks, "")
+            queue_status.empty()
+            
+            for chunk in chunks:
+                placeholder.markdown(response + "▌")
+                response += chunk
+            
+            placeholder.markdown(response)
+        else:
+            queue_status = st.empty()
+            with st.spinner("Tunggu ya..."):
+                # Dapatkan response dari Gemini dengan konteks showroom
+                response = get_response_from_gemini(
+                    prompt,
+                    st.session_state.showroom_data,
+                    history,
+                    hedge_delay=GEMINI_HEDGE_DELAY,
+                    conversation_summary=memory.summary,
+                    session_id=st.session_state.session_id,
+                    on_queue=show_queue_status(queue_status),
+                    latency_budget=GEMINI_LATENCY_BUDGET
+                )
+            queue_status.empty()
+            
+            st.markdown(response)
     
     # Tambahkan response assistant ke history
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    memory.append("assistant", response)
 
 # Tombol aksi cepat
 st.markdown("---")
 st.markdown("**Pertanyaan Cepat:**")
-col1, col2, col3, col4 = st.columns(4)
+col1, col2, col3, col4, col5 = st.columns(5)
 
 # Inisialisasi quick_action flag di session state
 if "quick_action_processed" not in st.session_state:
     st.session_state.quick_action_processed = False
 
-with col1:
-    if st.button("📋 Daftar Mobil", use_container_width=True, key="btn_daftar"):
-        if not st.session_state.quick_action_processed:
-            st.session_state.quick_action_processed = True
-            user_input = "Apa saja daftar mobil yang tersedia?"
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            # Generate response secara langsung
-            with st.spinner("Tunggu ya..."):
-                response = get_response_from_gemini(
-                    user_input,
-                    st.session_state.showroom_data,
-                    st.session_state.messages[:-1]
-                )
-            
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.rerun()
-
-with col2:
-    if st.button("🎁 Promo", use_container_width=True, key="btn_promo"):
-        if not st.session_state.quick_action_processed:
-            st.session_state.quick_action_processed = True
-            user_input = "Apa promo terbaru bulan ini?"
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            # Generate response secara langsung
-            with st.spinner("Tunggu ya..."):
-                response = get_response_from_gemini(
-                    user_input,
-                    st.session_state.showroom_data,
-                    st.session_state.messages[:-1]
-                )
-            
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.rerun()
-
-with col3:
-    if st.button("🕐 Jam Buka", use_container_width=True, key="btn_jam"):
-        if not st.session_state.quick_action_processed:
-            st.session_state.quick_action_processed = True
-            user_input = "Berapa jam operasional showroom?"
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            # Generate response secara langsung
-            with st.spinner("Tunggu ya..."):
-                response = get_response_from_gemini(
-                    user_input,
-                    st.session_state.showroom_data,
-                    st.session_state.messages[:-1]
-                )
-            
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.rerun()
-
-with col4:
-    if st.button("✉️ Kontak", use_container_width=True, key="btn_kontak"):
-        if not st.session_state.quick_action_processed:
-            st.session_state.quick_action_processed = True
-            user_input = "Bagaimana cara menghubungi showroom?"
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            # Generate response secara langsung
-            with st.spinner("Tunggu ya..."):
-                response = get_response_from_gemini(
-                    user_input,
-                    st.session_state.showroom_data,
-                    st.session_state.messages[:-1]
-                )
-            
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.rerun()
+
+def handle_quick_action(intent: str, user_input: str):
+    """Proses tombol aksi cepat: jawab dari data lokal, atau lewat Gemini jika mode lokal nonaktif"""
+    if st.session_state.quick_action_processed:
+        return
+    
+    st.session_state.quick_action_processed = True
+    history = memory.messages
+    memory.append("user", user_input)
+    
+    response = None
+    if LOCAL_QUICK_ACTIONS:
+        # Jawaban deterministik langsung dari data showroom, tanpa panggilan model
+        request_start = time.perf_counter()
+        response = get_local_response(intent, st.session_state.showroom_data)
+        if response is not None:
+            record_local_answer(intent, request_start)
+    
+    if response is None:
+        # Generate response secara langsung
+        queue_status = st.empty()
+        with st.spinner("Tunggu ya..."):
+            response = get_response_from_gemini(
+                user_input,
+                st.session_state.showroom_data,
+                history,
+                hedge_delay=GEMINI_HEDGE_DELAY,
+                conversation_summary=memory.summary,
+                session_id=st.session_state.session_id,
+                on_queue=show_queue_status(queue_status),
+                latency_budget=GEMINI_LATENCY_BUDGET
+            )
+        queue_status.empty()
+    
+    memory.append("assistant", response)
+    st.rerun()
+
+
+# (kolom, label, key, intent, pertanyaan)
+quick_actions = [
+    (col1, "📋 Daftar Mobil", "btn_daftar", "daftar_mobil", "Apa saja daftar mobil yang tersedia?"),
+    (col2, "🎁 Promo", "btn_promo", "promo", "Apa promo terbaru bulan ini?"),
+    (col3, "🕐 Jam Buka", "btn_jam", "jam_operasional", "Berapa jam operasional showroom?"),
+    (col4, "✉️ Kontak", "btn_kontak", "kontak", "Bagaimana cara menghubungi showroom?"),
+    (col5, "💳 Kredit", "btn_kredit", "pembiayaan", "Bagaimana simulasi kredit mobil di showroom ini?"),
+]
+
+for col, label, key, intent, user_input in quick_actions:
+    with col:
+        if st.button(label, use_container_width=True, key=key):
+            handle_quick_action(intent, user_input)
 
 # Reset flag setelah rendering
 st.session_state.quick_action_processed = False
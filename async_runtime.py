@@ -0,0 +1,153 @@
+"""
+async_runtime.py - Event loop bersama untuk request Gemini async dari kode Streamlit yang sinkron
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+_END = object()
+
+# Batas jumlah generate yang berjalan bersamaan dalam satu proses (request lain menunggu giliran)
+DEFAULT_MAX_CONCURRENCY = 32
+
+# Interval (detik) pemanggilan on_wait selama menunggu hasil
+WAIT_POLL_INTERVAL = 0.5
+
+
+class AsyncRunner:
+    """
+    Satu event loop di thread daemon, dipakai bersama oleh semua session
+
+    Kode sinkron (script Streamlit) menyerahkan coroutine ke loop ini dan
+    menunggu hasilnya, sehingga puluhan request yang sedang menunggu model
+    cukup dilayani satu thread, bukan satu thread (atau thread pool) per
+    request. Semaphore membatasi jumlah generate yang berjalan bersamaan.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0   # Generate yang sedang berjalan
+        self.waiting = 0     # Generate yang menunggu slot
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop bersama (dijalankan saat pertama kali dibutuhkan)"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(target=loop.run_forever, name="gemini-async", daemon=True)
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None):
+        """
+        Mengambil satu slot concurrency selama blok berjalan (dipakai dari dalam event loop bersama)
+
+        Jika timeout diisi dan slot tidak didapat dalam waktu itu,
+        asyncio.TimeoutError dilempar.
+
+        Contoh:
+            async with ASYNC_RUNNER.slot():
+                response = await model.generate_content_async(prompt)
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _check_thread(self):
+        # Menunggu hasil dari dalam loop itu sendiri akan deadlock
+        if self._thread is not None and threading.current_thread() is self._thread:
+            raise RuntimeError("AsyncRunner.run tidak boleh dipanggil dari dalam event loop bersama")
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None, on_wait: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Menjalankan coroutine di event loop bersama dan menunggu hasilnya
+
+        Args:
+            coro: Coroutine yang akan dijalankan
+            timeout: Batas waktu tunggu (detik), None = tanpa batas
+            on_wait: Dipanggil di thread pemanggil setiap WAIT_POLL_INTERVAL
+                detik selama hasil belum ada (misalnya untuk update UI)
+
+        Returns:
+            Hasil coroutine (exception dari coroutine diteruskan ke pemanggil)
+        """
+        self._check_thread()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            if on_wait is None:
+                return future.result(timeout)
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                wait = WAIT_POLL_INTERVAL if deadline is None else min(WAIT_POLL_INTERVAL, max(deadline - time.monotonic(), 0))
+                try:
+                    return future.result(wait)
+                except concurrent.futures.TimeoutError:
+                    # Python 3.10: bukan builtin TimeoutError (baru jadi alias sejak 3.11)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise
+                    on_wait()
+        except BaseException:
+            # Pemanggil berhenti menunggu (timeout / script Streamlit dihentikan), batalkan request-nya
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator, on_wait: Optional[Callable[[], None]] = None) -> Iterator:
+        """
+        Mengubah async generator menjadi iterator sinkron
+
+        Setiap item diambil dari event loop bersama. Jika pemanggil berhenti
+        di tengah jalan, async generator ditutup agar koneksi stream dilepas.
+
+        Args:
+            agen: Async generator
+            on_wait: Lihat run
+
+        Yields:
+            Item dari async generator
+        """
+        self._check_thread()
+        try:
+            while True:
+                item = self.run(_next_item(agen), on_wait=on_wait)
+                if item is _END:
+                    return
+                yield item
+        finally:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), self.loop)
+
+
+async def _next_item(agen: AsyncIterator) -> Any:
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+# Runner global, dipakai bersama oleh semua session Streamlit dalam satu proses
+ASYNC_RUNNER = AsyncRunner(int(os.getenv("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)))
@@ -0,0 +1,3 @@
+"""
+benchmarks - Alat ukur performa chatbot secara offline (tanpa memakai kuota Gemini)
+"""
@@ -0,0 +1,288 @@
+"""
+fake_gemini.py - Pengganti lokal genai.GenerativeModel untuk benchmark dan load test
+
+Latency, error (404 / 429 / 500), dan streaming bisa diatur per model,
+sehingga alur fallback, circuit breaker, hedging, dan latency budget di
+helper.py bisa diukur tanpa koneksi ke Gemini.
+
+Contoh:
+    backend = FakeGeminiBackend(FakeModelConfig(latency=0.8), overrides={
+        "gemini-2.5-flash": FakeModelConfig(latency=0.8, rate_limit_rate=0.3),
+    })
+    with install(backend):
+        get_response_from_gemini(...)
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+
+_DEFAULT_TEXT = (
+    "Terima kasih sudah bertanya! Berikut informasi yang Anda butuhkan dari showroom kami. "
+    "Harga dan promo dapat berubah sewaktu-waktu, silakan hubungi tim sales untuk detail "
+    "unit yang tersedia, simulasi kredit, dan jadwal test drive. "
+)
+
+
+class FakeModelConfig:
+    """
+    Perilaku satu model tiruan
+
+    Latency berdistribusi log-normal: median = latency, sigma = jitter
+    (jitter 0 berarti latency selalu sama). Peluang error dihitung per
+    panggilan dengan urutan 404, 429, lalu 500.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.8,
+        jitter: float = 0.3,
+        not_found_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        error_latency: float = 0.05,
+        response_chars: int = 600,
+        chunks: int = 8,
+        chunk_interval: float = 0.05,
+        stream_break_rate: float = 0.0,
+    ):
+        self.latency = latency                  # Detik sampai jawaban / chunk pertama
+        self.jitter = jitter
+        self.not_found_rate = not_found_rate    # 404 model tidak ditemukan
+        self.rate_limit_rate = rate_limit_rate  # 429 kuota habis
+        self.failure_rate = failure_rate        # 500 error server
+        self.error_latency = error_latency      # Detik sampai error dikembalikan
+        self.response_chars = response_chars
+        self.chunks = chunks                    # Jumlah chunk saat streaming
+        self.chunk_interval = chunk_interval    # Jeda antar chunk (detik)
+        self.stream_break_rate = stream_break_rate   # Peluang koneksi putus setelah chunk pertama
+
+    def replace(self, **changes: Any) -> "FakeModelConfig":
+        """Salinan config dengan beberapa nilai diganti"""
+        return FakeModelConfig(**{**vars(self), **changes})
+
+
+def parse_model_override(value: str, base: FakeModelConfig) -> Dict[str, FakeModelConfig]:
+    """
+    Membaca override config satu model dari teks CLI
+
+    Contoh: "gemini-2.5-flash:latency=2.5,rate_limit_rate=0.3"
+
+    Args:
+        value: Nama model, titik dua, lalu pasangan key=value dipisah koma
+        base: Config dasar yang nilainya ditimpa
+
+    Returns:
+        Dictionary {nama model: config}
+    """
+    model_name, _, options = value.partition(":")
+    changes = {}
+    for item in options.split(","):
+        if "=" in item:
+            key, number = item.split("=", 1)
+            key = key.strip()
+            if not hasattr(base, key):
+                raise ValueError(f"Opsi model tidak dikenal: {key}")
+            changes[key] = type(getattr(base, key))(number)
+    return {model_name.strip(): base.replace(**changes)}
+
+
+class FakeGeminiBackend:
+    """
+    Kumpulan model tiruan beserta statistik panggilan
+
+    Statistik (calls per model per hasil) dipakai bersama oleh semua
+    instance FakeGenerativeModel yang dibuat selama backend terpasang.
+    """
+
+    def __init__(self, default: Optional[FakeModelConfig] = None, overrides: Optional[Dict[str, FakeModelConfig]] = None, seed: Optional[int] = None):
+        self.default = default or FakeModelConfig()
+        self.overrides = dict(overrides or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, Dict[str, int]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def config_for(self, model_name: str) -> FakeModelConfig:
+        return self.overrides.get(model_name, self.default)
+
+    def _record(self, model_name: str, outcome: str):
+        with self._lock:
+            per_model = self.calls.setdefault(model_name, {})
+            per_model[outcome] = per_model.get(outcome, 0) + 1
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def plan(self, model_name: str) -> Dict[str, Any]:
+        """
+        Menentukan hasil satu panggilan (dipanggil sebelum menunggu latency)
+
+        Returns:
+            Dictionary outcome (ok / not_found / rate_limit / server_error),
+            delay, dan break_stream
+        """
+        config = self.config_for(model_name)
+        with self._lock:
+            roll = self._random.random()
+            delay = config.latency * (self._random.lognormvariate(0, config.jitter) if config.jitter > 0 else 1.0)
+            break_stream = self._random.random() < config.stream_break_rate
+
+        if roll < config.not_found_rate:
+            outcome = "not_found"
+        elif roll < config.not_found_rate + config.rate_limit_rate:
+            outcome = "rate_limit"
+        elif roll < config.not_found_rate + config.rate_limit_rate + config.failure_rate:
+            outcome = "server_error"
+        else:
+            outcome = "ok"
+        if outcome != "ok":
+            delay = config.error_latency
+        return {"outcome": outcome, "delay": delay, "break_stream": break_stream}
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Jumlah panggilan per model per hasil"""
+        with self._lock:
+            return {model_name: dict(outcomes) for model_name, outcomes in self.calls.items()}
+
+
+def _error_for(outcome: str, model_name: str) -> Exception:
+    # Exception yang sama dengan yang dilempar library google-generativeai
+    if outcome == "not_found":
+        return api_exceptions.NotFound(f"models/{model_name} is not found for API version v1beta")
+    if outcome == "rate_limit":
+        return api_exceptions.ResourceExhausted("Resource has been exhausted (e.g. check quota).")
+    return api_exceptions.InternalServerError("An internal error has occurred. Please retry.")
+
+
+class FakeResponse:
+    """Response / chunk dengan atribut text seperti GenerateContentResponse"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeAsyncStream:
+    def __init__(self, backend: FakeGeminiBackend, model_name: str, parts: List[str], config: FakeModelConfig, break_stream: bool):
+        self.backend = backend
+        self.model_name = model_name
+        self.parts = parts
+        self.config = config
+        self.break_stream = break_stream
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, part in enumerate(self.parts):
+            if index:
+                await asyncio.sleep(self.config.chunk_interval)
+                if self.break_stream:
+                    self.backend._record(self.model_name, "stream_break")
+                    raise api_exceptions.ServiceUnavailable("Connection reset by peer")
+            yield FakeResponse(part)
+
+
+class FakeGenerativeModel:
+    """
+    Pengganti genai.GenerativeModel (generate_content dan generate_content_async)
+
+    Argumen konstruktor sama dengan aslinya; safety/generation config
+    diterima tetapi tidak dipakai.
+    """
+
+    def __init__(self, model_name: str, safety_settings: Any = None, generation_config: Any = None, system_instruction: Any = None, backend: Optional[FakeGeminiBackend] = None, **kwargs: Any):
+        self.model_name = model_name.split("/")[-1]
+        self.system_instruction = system_instruction
+        self.backend = backend or FakeGeminiBackend()
+
+    @classmethod
+    def from_cached_content(cls, *args: Any, **kwargs: Any):
+        raise NotImplementedError("Context cache tidak didukung oleh FakeGenerativeModel")
+
+    def _parts(self, config: FakeModelConfig) -> List[str]:
+        text = (f"[{self.model_name}] " + _DEFAULT_TEXT * (config.response_chars // len(_DEFAULT_TEXT) + 1))[:config.response_chars]
+        size = max(1, -(-len(text) // max(config.chunks, 1)))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs: Any):
+        plan = self.backend.plan(self.model_name)
+        config = self.backend.config_for(self.model_name)
+        self.backend._enter()
+        try:
+            time.sleep(plan["delay"])
+        finally:
+            self.backend._exit()
+        self.backend._record(self.model_name, plan["outcome"])
+        if plan["outcome"] != "ok":
+            raise _error_for(plan["outcome"], self.model_name)
+
+        parts = self._parts(config)
+        if not stream:
+            return FakeResponse("".join(parts))
+        return iter(FakeResponse(part) for part in parts)
+
+    async def generate_content_async(self, contents: Any, stream: bool = False, **kwargs: Any):
+        plan = self.backend.plan(self.model_name)
+        config = self.backend.config_for(self.model_name)
+        self.backend._enter()
+        try:
+            await asyncio.sleep(plan["delay"])
+        except asyncio.CancelledError:
+            # Dibatalkan oleh timeout / hedging, sama seperti request yang diputus client
+            self.backend._record(self.model_name, "cancelled")
+            raise
+        finally:
+            self.backend._exit()
+        self.backend._record(self.model_name, plan["outcome"])
+        if plan["outcome"] != "ok":
+            raise _error_for(plan["outcome"], self.model_name)
+
+        parts = self._parts(config)
+        if not stream:
+            return FakeResponse("".join(parts))
+        return _FakeAsyncStream(self.backend, self.model_name, parts, config, plan["break_stream"])
+
+
+@contextmanager
+def install(backend: FakeGeminiBackend):
+    """
+    Memasang model tiruan di tempat genai.GenerativeModel selama blok berjalan
+
+    Pool instance model di helper.py dikosongkan dan context cache Gemini
+    dimatikan (butuh API asli), lalu keduanya dikembalikan setelah blok selesai.
+
+    Args:
+        backend: Backend tiruan yang dipakai oleh semua model
+    """
+    import helper
+
+    def factory(model_name: str, *args: Any, **kwargs: Any) -> FakeGenerativeModel:
+        return FakeGenerativeModel(model_name, *args, backend=backend, **kwargs)
+
+    factory.from_cached_content = FakeGenerativeModel.from_cached_content
+
+    original_model = genai.GenerativeModel
+    original_caching = helper.CONTEXT_CACHING
+    genai.GenerativeModel = factory
+    helper.CONTEXT_CACHING = False
+    helper._MODEL_POOL.clear()
+    try:
+        yield backend
+    finally:
+        genai.GenerativeModel = original_model
+        helper.CONTEXT_CACHING = original_caching
+        helper._MODEL_POOL.clear()
@@ -0,0 +1,449 @@
+"""
+load_test.py - Load test alur chat app.py + helper.py dengan backend Gemini tiruan
+
+N session berjalan bersamaan, masing-masing di thread sendiri seperti script
+Streamlit. Tiap session punya ConversationMemory sendiri dan mengirim pesan
+lewat alur yang sama dengan app.py: jawaban filter / simulasi kredit / aksi
+cepat dari data lokal, sisanya ke Gemini (streaming atau tidak). Model
+Gemini diganti FakeGenerativeModel (lihat fake_gemini.py), jadi tidak ada
+kuota yang terpakai.
+
+Laporan: throughput, latency p50/p95/p99 per sumber jawaban, sebaran
+fallback (model yang menjawab, kedalaman fallback, hasil tiap percobaan),
+dan memori per session.
+
+Contoh:
+    python -m benchmarks.load_test --sessions 50 --messages 10
+    python -m benchmarks.load_test --sessions 200 --stream --override "gemini-2.5-flash:rate_limit_rate=0.3"
+    python -m benchmarks.load_test --hedge-delay 1.5 --json bench_output.json
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import helper
+from benchmarks.fake_gemini import FakeGeminiBackend, FakeModelConfig, install, parse_model_override
+from conversation import ConversationMemory
+from data import get_shared_showroom_data
+from rate_limit import RATE_LIMITER, TokenBucket, parse_rate_limits
+from response_cache import ResponseCache
+from telemetry import METRICS
+
+# Porsi jenis pesan yang dikirim session (dinormalisasi saat dipakai)
+DEFAULT_MIX = {"open": 0.5, "intent": 0.1, "filter": 0.15, "financing": 0.1, "quick": 0.15}
+
+OPEN_TEMPLATES = [
+    "Apa kelebihan {car} dibanding {other} untuk keluarga?",
+    "{car} irit bensin nggak kalau dipakai harian di kota?",
+    "Rekomendasi mobil untuk mudik bareng keluarga besar dong",
+    "Kalau mau tukar tambah mobil lama ke {car} bisa?",
+    "Bedanya {car} sama {other} apa aja ya?",
+    "Saya mau mobil buat usaha katering, cocoknya apa?",
+]
+
+FILTER_TEMPLATES = [
+    "SUV di bawah 300 juta",
+    "hatchback di bawah 200 juta",
+    "MPV tahun 2024",
+    "mobil termurah",
+    "cicilan di bawah 6 juta",
+]
+
+FINANCING_TEMPLATES = [
+    "cicilan {car} berapa?",
+    "simulasi kredit {car} dp 30% 48 bulan",
+    "kredit {car} dp 50 juta",
+]
+
+# Pertanyaan bebas yang intent-nya deterministik (dijawab lokal lewat intent.py)
+INTENT_TEMPLATES = [
+    "jam buka showroom?",
+    "alamat showroom dimana ya",
+    "nomor wa berapa",
+    "ada promo apa sekarang",
+    "harga {car} berapa",
+    "mobil apa aja yang ready",
+]
+
+# (intent, pesan) tombol aksi cepat di app.py
+QUICK_ACTIONS = [
+    ("daftar_mobil", "Apa saja daftar mobil yang tersedia?"),
+    ("promo", "Apa promo terbaru bulan ini?"),
+    ("jam_operasional", "Berapa jam operasional showroom?"),
+    ("kontak", "Bagaimana cara menghubungi showroom?"),
+    ("pembiayaan", "Bagaimana simulasi kredit mobil di showroom ini?"),
+]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """
+    Membaca porsi jenis pesan dari teks CLI
+
+    Contoh: "open=0.6,intent=0.1,filter=0.1,financing=0.1,quick=0.1"
+
+    Returns:
+        Dictionary jenis pesan -> bobot
+    """
+    mix = {}
+    for item in value.split(","):
+        if "=" in item:
+            kind, weight = item.split("=", 1)
+            if kind.strip() not in DEFAULT_MIX:
+                raise ValueError(f"Jenis pesan tidak dikenal: {kind}")
+            mix[kind.strip()] = float(weight)
+    return mix
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Persentil nearest-rank dari data mentah (0 jika kosong)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+class SimulatedSession:
+    """State satu session (setara st.session_state di app.py) + hasil pengukurannya"""
+
+    def __init__(self, index: int, seed: int):
+        self.session_id = f"bench-{index}"
+        self.index = index
+        self.memory = ConversationMemory()
+        self.random = random.Random(seed)
+        self.results: List[Dict[str, Any]] = []
+
+
+def make_message(session: SimulatedSession, mix: Dict[str, float], car_names: List[str], turn: int, unique: bool) -> Tuple[str, str, Optional[str]]:
+    """
+    Memilih pesan berikutnya untuk satu session
+
+    Args:
+        session: Session pengirim
+        mix: Porsi jenis pesan
+        car_names: Nama mobil di katalog (untuk mengisi template)
+        turn: Nomor pesan dalam session
+        unique: Tambahkan penanda session/pesan ke pertanyaan terbuka agar tidak kena cache jawaban
+
+    Returns:
+        Tuple (jenis pesan, teks pesan, intent aksi cepat atau None)
+    """
+    kinds = list(mix)
+    kind = session.random.choices(kinds, weights=[mix[k] for k in kinds])[0]
+    car, other = session.random.sample(car_names, 2)
+
+    if kind == "quick":
+        intent, message = session.random.choice(QUICK_ACTIONS)
+        return kind, message, intent
+    if kind == "filter":
+        return kind, session.random.choice(FILTER_TEMPLATES), None
+    if kind == "financing":
+        return kind, session.random.choice(FINANCING_TEMPLATES).format(car=car), None
+    if kind == "intent":
+        return kind, session.random.choice(INTENT_TEMPLATES).format(car=car), None
+
+    message = session.random.choice(OPEN_TEMPLATES).format(car=car, other=other)
+    if unique:
+        message += f" (sesi {session.index} pesan {turn})"
+    return kind, message, None
+
+
+def answer_turn(session: SimulatedSession, showroom_data: Dict, message: str, intent: Optional[str], options: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Menjawab satu pesan dengan alur yang sama seperti app.py
+
+    Returns:
+        Dictionary source (local / gemini), latency, ttft (detik sampai teks pertama tampil), dan panjang jawaban
+    """
+    history = session.memory.messages
+    session.memory.append("user", message)
+    start = time.perf_counter()
+    ttft = None
+
+    response = None
+    if intent is not None:
+        # Tombol aksi cepat (handle_quick_action)
+        response = helper.get_local_response(intent, showroom_data)
+    else:
+        response, _ = helper.route_local_answer(message, showroom_data, classify=options.intent_routing, conversation_history=history)
+
+    source = "local"
+    if response is None:
+        source = "gemini"
+        if options.stream and intent is None:
+            chunks = helper.stream_response_from_gemini(
+                message,
+                showroom_data,
+                history,
+                conversation_summary=session.memory.summary,
+                session_id=session.session_id,
+                latency_budget=options.latency_budget,
+            )
+            response = next(chunks, "")
+            ttft = time.perf_counter() - start
+            for chunk in chunks:
+                response += chunk
+        else:
+            response = helper.get_response_from_gemini(
+                message,
+                showroom_data,
+                history,
+                hedge_delay=options.hedge_delay,
+                conversation_summary=session.memory.summary,
+                session_id=session.session_id,
+                latency_budget=options.latency_budget,
+            )
+
+    latency = time.perf_counter() - start
+    session.memory.append("assistant", response)
+    return {"source": source, "latency": latency, "ttft": latency if ttft is None else ttft, "chars": len(response)}
+
+
+def run_session(session: SimulatedSession, showroom_data: Dict, car_names: List[str], mix: Dict[str, float], options: argparse.Namespace, start_event: threading.Event):
+    """Menjalankan semua pesan satu session (dipanggil di thread sendiri)"""
+    start_event.wait()
+    for turn in range(1, options.messages + 1):
+        kind, message, intent = make_message(session, mix, car_names, turn, unique=not options.cache_hits)
+        result = answer_turn(session, showroom_data, message, intent, options)
+        result["kind"] = kind
+        session.results.append(result)
+        if options.think_time:
+            time.sleep(session.random.uniform(0, 2 * options.think_time))
+
+
+def measure_session_memory(sessions: List[SimulatedSession]) -> float:
+    """
+    Rata-rata memori state per session (byte)
+
+    Diukur dengan menyalin ConversationMemory semua session di bawah
+    tracemalloc, sehingga load test sendiri tidak diperlambat tracing.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        copies = [copy.deepcopy(session.memory) for session in sessions]
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del copies
+    return used / max(len(sessions), 1)
+
+
+def _counter_delta(before: Dict, after: Dict, name: str, label: str, **where: str) -> Dict[str, float]:
+    # Selisih counter telemetry per nilai label (dijumlahkan untuk label lain, disaring dengan where)
+    def totals(snapshot: Dict) -> Dict[str, float]:
+        result: Dict[str, float] = {}
+        for series in snapshot.get(name, []):
+            if any(series["labels"].get(key) != value for key, value in where.items()):
+                continue
+            key = series["labels"].get(label, "")
+            result[key] = result.get(key, 0) + series["value"]
+        return result
+
+    old, new = totals(before), totals(after)
+    return {key: value - old.get(key, 0) for key, value in sorted(new.items()) if value - old.get(key, 0)}
+
+
+def _depth_delta(before: Dict, after: Dict) -> Dict[str, int]:
+    # Selisih histogram kedalaman fallback per bucket
+    def buckets(snapshot: Dict) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for series in snapshot.get("chatbot_fallback_depth", []):
+            for bound, count in series["buckets"].items():
+                result[bound] = result.get(bound, 0) + count
+        return result
+
+    old, new = buckets(before), buckets(after)
+    return {bound: count - old.get(bound, 0) for bound, count in new.items() if count - old.get(bound, 0)}
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "p99": round(percentile(values, 0.99), 4),
+        "max": round(max(values, default=0.0), 4),
+    }
+
+
+def run_load_test(options: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Menjalankan load test sesuai opsi CLI
+
+    Returns:
+        Dictionary hasil (lihat render_report)
+    """
+    default = FakeModelConfig(
+        latency=options.latency,
+        jitter=options.jitter,
+        not_found_rate=options.not_found_rate,
+        rate_limit_rate=options.rate_limit_rate,
+        failure_rate=options.failure_rate,
+        chunks=options.chunks,
+        chunk_interval=options.chunk_interval,
+        stream_break_rate=options.stream_break_rate,
+    )
+    overrides: Dict[str, FakeModelConfig] = {}
+    for value in options.override:
+        overrides.update(parse_model_override(value, default))
+    backend = FakeGeminiBackend(default, overrides, seed=options.seed)
+
+    mix = parse_mix(options.mix) if options.mix else dict(DEFAULT_MIX)
+    showroom_data = get_shared_showroom_data()
+    car_names = [f"{m['merek']} {m['model'].split()[0]}" for m in showroom_data['daftar_mobil']]
+    helper.warm_up_caches(showroom_data)
+
+    sessions = [SimulatedSession(i, options.seed * 100003 + i) for i in range(options.sessions)]
+    start_event = threading.Event()
+
+    # Kuota per model dan cache jawaban diganti selama test, dikembalikan setelahnya
+    original_buckets = RATE_LIMITER.buckets
+    original_cache = helper.RESPONSE_CACHE
+    RATE_LIMITER.buckets = {model_name: TokenBucket(rpm) for model_name, rpm in parse_rate_limits(options.rate_limits).items() if rpm > 0}
+    helper.RESPONSE_CACHE = ResponseCache(path=None)
+    helper.MODEL_HEALTH.reset()
+
+    metrics_before = METRICS.snapshot()
+    try:
+        with install(backend), ThreadPoolExecutor(max_workers=options.sessions) as pool:
+            futures = [pool.submit(run_session, session, showroom_data, car_names, mix, options, start_event) for session in sessions]
+            started = time.perf_counter()
+            start_event.set()
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - started
+    finally:
+        RATE_LIMITER.buckets = original_buckets
+        helper.RESPONSE_CACHE = original_cache
+    metrics_after = METRICS.snapshot()
+
+    results = [result for session in sessions for result in session.results]
+    by_source: Dict[str, List[float]] = {}
+    by_kind: Dict[str, List[float]] = {}
+    for result in results:
+        by_source.setdefault(result["source"], []).append(result["latency"])
+        by_kind.setdefault(result["kind"], []).append(result["latency"])
+    gemini_ttft = [result["ttft"] for result in results if result["source"] == "gemini"]
+
+    return {
+        "config": {
+            "sessions": options.sessions,
+            "messages": options.messages,
+            "stream": options.stream,
+            "hedge_delay": options.hedge_delay,
+            "latency_budget": options.latency_budget,
+            "rate_limits": options.rate_limits,
+            "mix": mix,
+            "model": vars(default),
+            "overrides": {name: vars(config) for name, config in overrides.items()},
+        },
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency": _latency_summary([result["latency"] for result in results]),
+        "latency_by_source": {source: _latency_summary(values) for source, values in sorted(by_source.items())},
+        "latency_by_kind": {kind: _latency_summary(values) for kind, values in sorted(by_kind.items())},
+        "gemini_ttft": _latency_summary(gemini_ttft),
+        "fallback": {
+            "responses": _counter_delta(metrics_before, metrics_after, "chatbot_responses_total", "source"),
+            "answered_by": _counter_delta(metrics_before, metrics_after, "chatbot_model_attempts_total", "model", outcome="ok"),
+            "attempts_by_model": _counter_delta(metrics_before, metrics_after, "chatbot_model_attempts_total", "model"),
+            "attempt_outcomes": _counter_delta(metrics_before, metrics_after, "chatbot_model_attempts_total", "outcome"),
+            "depth": _depth_delta(metrics_before, metrics_after),
+        },
+        "backend_calls": backend.snapshot(),
+        "backend_max_in_flight": backend.max_in_flight,
+        "memory_per_session": round(measure_session_memory(sessions)),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def render_report(result: Dict[str, Any]) -> str:
+    """Ringkasan hasil load test dalam bentuk teks"""
+    config = result["config"]
+    lines = [
+        f"Sessions: {config['sessions']} x {config['messages']} pesan  "
+        f"(stream={config['stream']}, hedge={config['hedge_delay']}, budget={config['latency_budget']})",
+        f"Selesai dalam {result['elapsed']:.2f} detik  |  throughput {result['throughput']:.1f} pesan/detik",
+        "",
+        f"{'latency (detik)':<22}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    rows = [("semua", result["latency"])]
+    rows += [(f"sumber: {source}", summary) for source, summary in result["latency_by_source"].items()]
+    rows += [(f"jenis: {kind}", summary) for kind, summary in result["latency_by_kind"].items()]
+    rows.append(("gemini teks pertama", result["gemini_ttft"]))
+    for label, summary in rows:
+        lines.append(f"{label:<22}{summary['count']:>7}{summary['p50']:>9.3f}{summary['p95']:>9.3f}{summary['p99']:>9.3f}{summary['max']:>9.3f}")
+
+    fallback = result["fallback"]
+    lines += [
+        "",
+        "Sumber jawaban Gemini: " + (", ".join(f"{k}={v:g}" for k, v in fallback["responses"].items()) or "-"),
+        "Dijawab oleh: " + (", ".join(f"{k}={v:g}" for k, v in fallback["answered_by"].items()) or "-"),
+        "Percobaan per model: " + (", ".join(f"{k}={v:g}" for k, v in fallback["attempts_by_model"].items()) or "-"),
+        "Hasil percobaan: " + (", ".join(f"{k}={v:g}" for k, v in fallback["attempt_outcomes"].items()) or "-"),
+        "Kedalaman fallback: " + (", ".join(f"<={k}: {v}" for k, v in fallback["depth"].items()) or "-"),
+        "Panggilan backend: " + "; ".join(
+            f"{model_name} " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))
+            for model_name, outcomes in sorted(result["backend_calls"].items())
+        ),
+        f"Request backend bersamaan (maks): {result['backend_max_in_flight']}",
+        "",
+        f"Memori per session: {result['memory_per_session'] / 1024:.1f} KiB  |  peak RSS proses: {result['peak_rss_mb']:.1f} MiB",
+    ]
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test chatbot dengan backend Gemini tiruan")
+    parser.add_argument("--sessions", type=int, default=20, help="Jumlah session bersamaan")
+    parser.add_argument("--messages", type=int, default=5, help="Jumlah pesan per session")
+    parser.add_argument("--stream", action="store_true", help="Pakai stream_response_from_gemini seperti GEMINI_STREAMING=true")
+    parser.add_argument("--hedge-delay", type=float, default=None, help="Hedged request (mode non-streaming)")
+    parser.add_argument("--latency-budget", type=float, default=None, help="Batas total waktu tunggu Gemini (default helper.py)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Rata-rata jeda antar pesan per session (detik)")
+    parser.add_argument("--mix", default="", help="Porsi jenis pesan, contoh open=0.6,intent=0.1,filter=0.1,financing=0.1,quick=0.1")
+    parser.add_argument("--no-intent-routing", dest="intent_routing", action="store_false", help="Seperti LOCAL_INTENT_ROUTING=false (pesan intent dikirim ke model)")
+    parser.add_argument("--cache-hits", action="store_true", help="Izinkan pertanyaan berulang kena cache jawaban")
+    parser.add_argument("--rate-limits", default="", help="RPM per model (format GEMINI_RATE_LIMITS), kosong = tanpa batas")
+    parser.add_argument("--latency", type=float, default=0.8, help="Median latency model tiruan (detik)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Sigma log-normal latency")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="Peluang error 404")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Peluang error 429")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Peluang error 500")
+    parser.add_argument("--chunks", type=int, default=8, help="Jumlah chunk per jawaban streaming")
+    parser.add_argument("--chunk-interval", type=float, default=0.05, help="Jeda antar chunk (detik)")
+    parser.add_argument("--stream-break-rate", type=float, default=0.0, help="Peluang stream putus setelah chunk pertama")
+    parser.add_argument("--override", action="append", default=[], help="Config per model, contoh gemini-2.5-flash:latency=3,rate_limit_rate=0.5")
+    parser.add_argument("--seed", type=int, default=1, help="Seed random (hasil bisa diulang)")
+    parser.add_argument("--json", default="", help="Simpan hasil lengkap ke file JSON")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    options = build_parser().parse_args(argv)
+    result = run_load_test(options)
+    print(render_report(result))
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nHasil lengkap ditulis ke {options.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""
+microbench.py - Microbenchmark fungsi format & pencarian helper.py untuk berbagai ukuran katalog
+
+Katalog sintetis (skema daftar_mobil yang sama dengan showroom_data.json)
+dibuat untuk setiap ukuran, lalu tiap fungsi diukur waktunya (best/median
+per panggilan) dan alokasi memorinya (puncak tracemalloc per panggilan).
+Hasil bisa disimpan sebagai baseline JSON dan dibandingkan dengan run
+berikutnya untuk melihat regresi.
+
+Contoh:
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --sizes 20,1000,100000 --save .cache/microbench.json
+    python -m benchmarks.microbench --compare .cache/microbench.json --fail-on-regression
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import helper
+from catalog import CatalogIndex
+from data import DEFAULT_DATA_PATH, freeze_data, validate_showroom_data
+from rendering import CatalogRenderer
+
+DEFAULT_SIZES = (20, 100, 1000, 10000, 100000)
+
+# Minimal durasi satu sampel (detik); fungsi cepat diulang dalam loop sampai melewati batas ini
+MIN_SAMPLE_TIME = 0.05
+
+# Batas total waktu ukur per fungsi per ukuran (detik), sampel dihentikan lebih awal jika lewat
+MAX_CASE_TIME = 3.0
+
+# Rasio waktu terhadap baseline yang dianggap regresi
+DEFAULT_REGRESSION_THRESHOLD = 0.25
+
+_MEREK_MODEL = {
+    "Toyota": ["Avanza", "Rush", "Innova", "Fortuner", "Yaris", "Corolla", "Raize", "Agya"],
+    "Daihatsu": ["Xenia", "Terios", "Ayla", "Sigra", "Rocky"],
+    "Honda": ["Brio", "Jazz", "HR-V", "CR-V", "Civic", "City", "Mobilio", "BR-V"],
+    "Suzuki": ["Ertiga", "XL7", "Baleno", "Ignis", "Carry"],
+    "Mitsubishi": ["Xpander", "Pajero Sport", "L300", "Triton"],
+    "Nissan": ["Livina", "Kicks", "Magnite", "Navara"],
+    "Hyundai": ["Creta", "Stargazer", "Ioniq 5", "Santa Fe"],
+    "Wuling": ["Confero", "Almaz", "Air ev", "Cortez"],
+    "Mazda": ["CX-3", "CX-5", "Mazda2", "Mazda3"],
+    "Kia": ["Sonet", "Seltos", "Carens"],
+}
+_KATEGORI_MODEL = {
+    "Avanza": "MPV", "Xenia": "MPV", "Innova": "MPV", "Ertiga": "MPV", "XL7": "MPV", "Xpander": "MPV",
+    "Livina": "MPV", "Stargazer": "MPV", "Confero": "MPV", "Cortez": "MPV", "Mobilio": "MPV",
+    "Sigra": "MPV", "Carens": "MPV", "BR-V": "SUV", "Carry": "Pickup", "L300": "Pickup",
+    "Triton": "Pickup", "Navara": "Pickup", "Corolla": "Sedan", "Civic": "Sedan", "City": "Sedan",
+    "Mazda3": "Sedan", "Brio": "Hatchback", "Jazz": "Hatchback", "Yaris": "Hatchback", "Agya": "Hatchback",
+    "Ayla": "Hatchback", "Baleno": "Hatchback", "Ignis": "Hatchback", "Mazda2": "Hatchback", "Air ev": "Hatchback",
+}
+_MESIN = ["1.2", "1.3", "1.5", "1.8", "2.0", "2.4"]
+_TRANSMISI = ["MT", "AT", "CVT"]
+_TRIM = ["", " G", " E", " S", " RS", " Limited", " Prestige"]
+_FITUR = ["AC", "Power steering", "Airbag", "ABS", "Keyless", "Kamera mundur", "Sunroof", "Head unit Android", "Cruise control"]
+
+# Kata kunci search_mobil: pencocokan persis, prefix, typo, dan kategori
+SEARCH_KEYWORDS = {
+    "exact": "avanza",
+    "prefix": "xpan",
+    "typo": "fortunr",
+    "kategori": "suv",
+}
+
+
+def generate_daftar_mobil(size: int, seed: int = 1) -> List[Dict]:
+    """
+    Membuat daftar_mobil sintetis dengan skema yang sama seperti showroom_data.json
+
+    Args:
+        size: Jumlah mobil
+        seed: Seed random (katalog yang sama untuk seed yang sama)
+
+    Returns:
+        List mobil (id 1..size)
+    """
+    rng = random.Random(seed)
+    mereks = list(_MEREK_MODEL)
+    daftar_mobil = []
+    for car_id in range(1, size + 1):
+        merek = rng.choice(mereks)
+        base = rng.choice(_MEREK_MODEL[merek])
+        tahun = rng.randint(2016, 2025)
+        kategori = _KATEGORI_MODEL.get(base, "SUV")
+        if tahun < 2023:
+            kategori += " Bekas"
+        harga = rng.randint(90, 1500) * 1_000_000
+        transmisi = rng.choice(_TRANSMISI)
+        daftar_mobil.append({
+            "id": car_id,
+            "merek": merek,
+            "model": f"{base} {rng.choice(_MESIN)} {transmisi}{rng.choice(_TRIM)}",
+            "tahun": tahun,
+            "kategori": kategori,
+            "harga": harga,
+            "cicilan": -(-int(harga * 0.8 * 1.11 / 36) // 100_000) * 100_000,
+            "spesifikasi": f"{rng.choice([5, 7, 8])} seater, {'Manual' if transmisi == 'MT' else 'Otomatis'}, "
+                           + ", ".join(rng.sample(_FITUR, 3)),
+        })
+    return daftar_mobil
+
+
+def generate_showroom_data(size: int, seed: int = 1) -> Dict:
+    """
+    Data showroom lengkap dengan katalog sintetis (bagian lain dari showroom_data.json)
+
+    Jumlah promo ikut membesar (1 promo per 10 mobil, minimal 3) agar
+    format_promosi juga teruji pada data besar.
+
+    Args:
+        size: Jumlah mobil
+        seed: Seed random
+
+    Returns:
+        Data showroom yang sudah dibekukan (freeze_data), sama seperti di app.py
+    """
+    with open(DEFAULT_DATA_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+
+    rng = random.Random(seed)
+    data["daftar_mobil"] = generate_daftar_mobil(size, seed)
+    data["promosi"] = [
+        {
+            "id": promo_id,
+            "judul": f"Promo {rng.choice(['Diskon', 'Cashback', 'Bunga 0%', 'Gratis Asuransi', 'Trade-in'])} #{promo_id}",
+            "deskripsi": f"Potongan Rp {rng.randint(2, 30)}.000.000 untuk {rng.choice(list(_KATEGORI_MODEL))} dan {rng.choice(list(_KATEGORI_MODEL))}",
+        }
+        for promo_id in range(1, max(3, size // 10) + 1)
+    ]
+    validate_showroom_data(data)
+    return freeze_data(data)
+
+
+def build_cases(data: Dict) -> List[Tuple[str, Callable[[], Any]]]:
+    """
+    Daftar fungsi yang diukur untuk satu katalog
+
+    create_system_prompt diukur dua kali: build (tanpa cache, saat data
+    berubah) dan cached (request berikutnya). search_mobil diukur per jenis
+    kata kunci dengan index yang sudah jadi; pembuatan index dan renderer
+    katalog (fragmen + daftar lengkap tanpa cache) diukur terpisah.
+
+    Returns:
+        List (nama, callable tanpa argumen)
+    """
+    daftar_mobil = data["daftar_mobil"]
+    helper.create_system_prompt(data)
+    helper.get_catalog_index(daftar_mobil)
+
+    cases = [
+        ("format_daftar_mobil", lambda: helper.format_daftar_mobil(daftar_mobil)),
+        ("format_promosi", lambda: helper.format_promosi(data["promosi"])),
+        ("format_kontak", lambda: helper.format_kontak(data)),
+        ("create_system_prompt[build]", lambda: helper._build_system_prompt(data)),
+        ("create_system_prompt[cached]", lambda: helper.create_system_prompt(data)),
+        ("catalog_index[build]", lambda: CatalogIndex(daftar_mobil)),
+        ("catalog_renderer[build]", lambda: CatalogRenderer(daftar_mobil).render_list()),
+    ]
+    for kind, keyword in SEARCH_KEYWORDS.items():
+        cases.append((f"search_mobil[{kind}]", lambda keyword=keyword: helper.search_mobil(keyword, daftar_mobil)))
+    return cases
+
+
+def time_case(func: Callable[[], Any], repeat: int, min_sample_time: float = MIN_SAMPLE_TIME, max_time: float = MAX_CASE_TIME) -> Dict[str, float]:
+    """
+    Mengukur waktu satu fungsi (detik per panggilan)
+
+    Jumlah loop per sampel dipilih otomatis seperti timeit.autorange.
+
+    Returns:
+        Dictionary best, median, loops, dan samples
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_time or elapsed * 2 > max_time:
+            break
+        loops *= 10 if elapsed * 10 < min_sample_time else 2
+
+    samples = [elapsed / loops]
+    deadline = time.perf_counter() + max_time
+    while len(samples) < repeat and time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+
+    return {"best": min(samples), "median": statistics.median(samples), "loops": loops, "samples": len(samples)}
+
+
+def measure_allocations(func: Callable[[], Any]) -> Dict[str, int]:
+    """
+    Alokasi memori satu panggilan (tracemalloc)
+
+    Returns:
+        Dictionary peak (byte tertinggi yang dialokasikan selama panggilan)
+        dan retained (byte yang masih dipakai setelah hasil dibuang)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - before
+        del result
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return {"peak": max(peak, 0), "retained": max(retained, 0)}
+
+
+def run_benchmarks(sizes: List[int], repeat: int, only: Optional[List[str]] = None, seed: int = 1, progress: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    Menjalankan semua microbenchmark
+
+    Args:
+        sizes: Ukuran katalog
+        repeat: Jumlah sampel waktu per fungsi
+        only: Hanya fungsi yang namanya diawali salah satu nilai ini
+        seed: Seed katalog sintetis
+        progress: Dipanggil dengan satu baris hasil per fungsi
+
+    Returns:
+        Dictionary meta + results {"nama@ukuran": hasil}
+    """
+    results = {}
+    for size in sizes:
+        data = generate_showroom_data(size, seed)
+        for name, func in build_cases(data):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            timing = time_case(func, repeat)
+            memory = measure_allocations(func)
+            results[f"{name}@{size}"] = {"name": name, "size": size, **timing, **memory}
+            progress(format_row(results[f"{name}@{size}"]))
+        del data
+        gc.collect()
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def format_row(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> str:
+    """Satu baris tabel hasil (dengan perbandingan baseline jika ada)"""
+    row = (
+        f"{result['name']:<30}{result['size']:>8}"
+        f"{_format_seconds(result['best']):>12}{_format_seconds(result['median']):>12}"
+        f"{result['peak'] / 1024:>12.1f}{result['retained'] / 1024:>12.1f}"
+    )
+    if baseline is not None:
+        ratio = result["best"] / baseline["best"] if baseline["best"] else float("inf")
+        mark = "  REGRESI" if ratio > 1 + threshold else ("  lebih cepat" if ratio < 1 - threshold else "")
+        row += f"{_format_seconds(baseline['best']):>12}{ratio:>8.2f}x{mark}"
+    return row
+
+
+def header(compare: bool = False) -> str:
+    text = f"{'fungsi':<30}{'mobil':>8}{'best':>12}{'median':>12}{'peak KiB':>12}{'sisa KiB':>12}"
+    if compare:
+        text += f"{'baseline':>12}{'rasio':>9}"
+    return text
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> Tuple[str, List[str]]:
+    """
+    Membandingkan hasil dengan baseline
+
+    Returns:
+        Tuple (tabel perbandingan, daftar key yang regresi)
+    """
+    lines = [header(compare=True)]
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        lines.append(format_row(result, base, threshold))
+        if base is not None and base["best"] and result["best"] / base["best"] > 1 + threshold:
+            regressions.append(key)
+    return "\n".join(lines), regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Microbenchmark fungsi format & pencarian helper.py")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="Ukuran katalog, dipisah koma")
+    parser.add_argument("--repeat", type=int, default=5, help="Jumlah sampel waktu per fungsi")
+    parser.add_argument("--only", default="", help="Hanya fungsi dengan awalan nama ini (dipisah koma)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed katalog sintetis")
+    parser.add_argument("--save", default="", help="Simpan hasil sebagai baseline JSON")
+    parser.add_argument("--compare", default="", help="Bandingkan dengan baseline JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="Batas kenaikan waktu yang dianggap regresi (0.25 = 25%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit code 1 jika ada regresi")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    options = build_parser().parse_args(argv)
+    sizes = [int(size) for size in options.sizes.split(",") if size.strip()]
+    only = [name.strip() for name in options.only.split(",") if name.strip()]
+
+    print(header())
+    current = run_benchmarks(sizes, options.repeat, only, options.seed)
+
+    if options.save:
+        os.makedirs(os.path.dirname(os.path.abspath(options.save)), exist_ok=True)
+        with open(options.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline disimpan ke {options.save}")
+
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        table, regressions = compare_results(current, baseline, options.threshold)
+        print(f"\nDibandingkan dengan {options.compare} ({baseline['meta'].get('created', '?')}):")
+        print(table)
+        if regressions:
+            print(f"\n{len(regressions)} regresi: {', '.join(regressions)}")
+            if options.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
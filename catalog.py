@@ -0,0 +1,639 @@
+"""
+catalog.py - Index katalog mobil untuk pencarian cepat (inverted index + fuzzy matching)
+"""
+
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import List, Dict, Optional, Set, Collection
+
+from data import get_data_version
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+# Field mobil yang diindeks untuk pencarian
+INDEXED_FIELDS = ("merek", "model", "kategori")
+
+# Field numerik yang disimpan sebagai array terurut untuk range query
+NUMERIC_FIELDS = ("harga", "cicilan", "tahun")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Memecah teks menjadi token pencarian
+
+    Token bergabung seperti "cr-v" juga menghasilkan bagian-bagiannya
+    ("cr", "v") dan versi tanpa tanda hubung ("crv").
+
+    Args:
+        text: Teks yang akan dipecah
+
+    Returns:
+        List token lowercase
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token:
+            parts = token.split("-")
+            tokens.extend(part for part in parts if part)
+            tokens.append("".join(parts))
+    return tokens
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein dengan berhenti lebih awal jika jarak sudah melewati limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CatalogIndex:
+    """
+    Index katalog yang dibangun sekali dari daftar_mobil
+
+    - Lookup langsung berdasarkan id, merek, dan kategori
+    - Inverted index token -> posisi mobil (merek, model, kategori)
+    - Prefix matching lewat vocabulary yang diurutkan ("ava" -> avanza)
+    - Toleransi typo lewat trigram + edit distance ("avansa" -> avanza)
+    - Range query harga/cicilan/tahun lewat array terurut + bisect
+    """
+
+    def __init__(self, daftar_mobil: List[Dict]):
+        self.mobil = list(daftar_mobil)
+        self.by_id: Dict[int, Dict] = {}
+        self.by_merek: Dict[str, List[int]] = defaultdict(list)
+        self.by_kategori: Dict[str, List[int]] = defaultdict(list)
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        self.labels: Dict[str, str] = {}  # nama lowercase -> nama asli (merek & kategori)
+
+        for pos, mobil in enumerate(self.mobil):
+            self.by_id[mobil["id"]] = mobil
+            self.by_merek[mobil["merek"].lower()].append(pos)
+            self.by_kategori[mobil["kategori"].lower()].append(pos)
+            self.labels[mobil["merek"].lower()] = mobil["merek"]
+            self.labels[mobil["kategori"].lower()] = mobil["kategori"]
+            for field in INDEXED_FIELDS:
+                for token in tokenize(mobil[field]):
+                    self.postings[token].add(pos)
+
+        self.vocabulary = sorted(self.postings)
+        # Token nama mobil (merek/model/kategori), dibuang dari pertanyaan saat membentuk key cache jawaban
+        self.name_terms = frozenset(self.postings)
+        for token in self.vocabulary:
+            for gram in _trigrams(token):
+                self.trigram_index[gram].add(token)
+
+        # Array terurut (nilai, posisi) per field numerik untuk range query dengan bisect
+        self.sorted_values = {
+            field: sorted((mobil[field], pos) for pos, mobil in enumerate(self.mobil))
+            for field in NUMERIC_FIELDS
+        }
+        self.sorted_keys = {field: [value for value, _ in pairs] for field, pairs in self.sorted_values.items()}
+        self._summary: Optional[List[Dict]] = None
+
+    def __len__(self) -> int:
+        return len(self.mobil)
+
+    def get_by_id(self, mobil_id: int) -> Optional[Dict]:
+        """Mengambil mobil berdasarkan id"""
+        return self.by_id.get(mobil_id)
+
+    def get_by_merek(self, merek: str) -> List[Dict]:
+        """Mengambil semua mobil dari satu merek"""
+        return [self.mobil[pos] for pos in self.by_merek.get(merek.lower(), [])]
+
+    def get_by_kategori(self, kategori: str) -> List[Dict]:
+        """Mengambil semua mobil dari satu kategori"""
+        return [self.mobil[pos] for pos in self.by_kategori.get(kategori.lower(), [])]
+
+    def _prefix_matches(self, token: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, token)
+        matches = []
+        for candidate in self.vocabulary[start:]:
+            if not candidate.startswith(token):
+                break
+            matches.append(candidate)
+        return matches
+
+    def _fuzzy_matches(self, token: str) -> List[str]:
+        if len(token) < 4:
+            return []
+        limit = 1 if len(token) <= 5 else 2
+        candidates = set()
+        for gram in _trigrams(token):
+            candidates |= self.trigram_index.get(gram, set())
+        return [
+            candidate for candidate in candidates
+            if _edit_distance(token, candidate, limit) <= limit
+        ]
+
+    def expand_token(self, token: str, fuzzy: bool = True) -> List[str]:
+        """
+        Mencari token di vocabulary yang cocok dengan token query
+
+        Args:
+            token: Token query
+            fuzzy: Izinkan toleransi typo jika tidak ada yang cocok
+
+        Returns:
+            List token vocabulary (exact/prefix, atau fuzzy sebagai cadangan)
+        """
+        matches = self._prefix_matches(token)
+        if not matches and fuzzy:
+            matches = self._fuzzy_matches(token)
+        return matches
+
+    def _positions(self, token: str, fuzzy: bool = True) -> Set[int]:
+        positions = set()
+        for match in self.expand_token(token, fuzzy):
+            positions |= self.postings[match]
+        return positions
+
+    def search(self, keyword: str) -> List[Dict]:
+        """
+        Mencari mobil yang cocok dengan semua kata pada keyword
+
+        Args:
+            keyword: Kata kunci (merek, model, atau kategori)
+
+        Returns:
+            List mobil yang cocok, sesuai urutan katalog
+        """
+        tokens = _TOKEN_RE.findall(keyword.lower())
+        if not tokens:
+            return []
+
+        result = None
+        for token in tokens:
+            positions = self._positions(token)
+            result = positions if result is None else result & positions
+            if not result:
+                return []
+
+        return [self.mobil[pos] for pos in sorted(result)]
+
+    def range_positions(self, field: str, low: Optional[int] = None, high: Optional[int] = None) -> List[int]:
+        """
+        Posisi mobil dengan nilai field dalam rentang [low, high]
+
+        Args:
+            field: Salah satu NUMERIC_FIELDS
+            low: Batas bawah (None = tidak dibatasi)
+            high: Batas atas (None = tidak dibatasi)
+
+        Returns:
+            List posisi, terurut berdasarkan nilai field
+        """
+        keys = self.sorted_keys[field]
+        start = 0 if low is None else bisect.bisect_left(keys, low)
+        end = len(keys) if high is None else bisect.bisect_right(keys, high)
+        return [pos for _, pos in self.sorted_values[field][start:end]]
+
+    def filter(self, car_filter: "CarFilter", limit: Optional[int] = None) -> List[Dict]:
+        """
+        Menjalankan filter terstruktur dan mengurutkan hasilnya
+
+        Args:
+            car_filter: Hasil parse_filter_query
+            limit: Jumlah maksimal hasil (None = semua)
+
+        Returns:
+            List mobil yang memenuhi semua batasan
+        """
+        candidates: Optional[Set[int]] = None
+
+        def narrow(positions) -> None:
+            nonlocal candidates
+            positions = set(positions)
+            candidates = positions if candidates is None else candidates & positions
+
+        for field in NUMERIC_FIELDS:
+            low = getattr(car_filter, f"{field}_min")
+            high = getattr(car_filter, f"{field}_max")
+            if low is not None or high is not None:
+                narrow(self.range_positions(field, low, high))
+
+        if car_filter.kategori:
+            narrow(pos for kategori in car_filter.kategori for pos in self.by_kategori.get(kategori, []))
+        if car_filter.merek:
+            narrow(pos for merek in car_filter.merek for pos in self.by_merek.get(merek, []))
+        if car_filter.bekas is not None:
+            narrow(
+                pos for kategori, positions in self.by_kategori.items()
+                if ("bekas" in kategori) == car_filter.bekas for pos in positions
+            )
+
+        sort_field = car_filter.sort_by
+        if candidates is None and sort_field in self.sorted_values:
+            # Tanpa batasan: urutan sudah tersedia di array terurut, tidak perlu sort ulang
+            pairs = self.sorted_values[sort_field]
+            if car_filter.descending:
+                pairs = pairs[::-1]
+            if limit is not None:
+                pairs = pairs[:limit]
+            return [self.mobil[pos] for _, pos in pairs]
+
+        if candidates is None:
+            candidates = set(range(len(self.mobil)))
+
+        ranked = sorted(
+            candidates,
+            key=lambda pos: (self.mobil[pos][sort_field], pos),
+            reverse=car_filter.descending,
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.mobil[pos] for pos in ranked]
+
+    def count(self, car_filter: "CarFilter") -> int:
+        """Jumlah mobil yang memenuhi filter"""
+        return len(self.filter(car_filter))
+
+    def category_summary(self) -> List[Dict]:
+        """
+        Ringkasan per kategori sesuai urutan kemunculan pertama di katalog
+
+        Returns:
+            List dictionary kategori, jumlah, termurah (mobil), harga_max
+        """
+        if self._summary is None:
+            ringkasan: Dict[str, Dict] = {}
+            for mobil in self.mobil:
+                entry = ringkasan.get(mobil["kategori"])
+                if entry is None:
+                    ringkasan[mobil["kategori"]] = {"kategori": mobil["kategori"], "jumlah": 1, "termurah": mobil, "harga_max": mobil["harga"]}
+                    continue
+                entry["jumlah"] += 1
+                if mobil["harga"] < entry["termurah"]["harga"]:
+                    entry["termurah"] = mobil
+                entry["harga_max"] = max(entry["harga_max"], mobil["harga"])
+            self._summary = list(ringkasan.values())
+        return self._summary
+
+    def match_text(self, text: str, limit: int = 5, min_ratio: float = 0.5, ignore: Collection[str] = ()) -> List[Dict]:
+        """
+        Mencari mobil yang disebut dalam kalimat bebas (misalnya pertanyaan user)
+
+        Token dibobot dengan IDF sehingga kata spesifik ("avanza") lebih
+        menentukan daripada kata umum ("suv"). Token pendek/angka diabaikan.
+
+        Args:
+            text: Kalimat bebas
+            limit: Jumlah maksimal mobil yang dikembalikan
+            min_ratio: Skor minimal relatif terhadap skor tertinggi
+            ignore: Token yang tidak dihitung (misalnya merek/kategori yang sudah jadi filter)
+
+        Returns:
+            List mobil paling relevan, skor tertinggi di depan
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        total = max(len(self.mobil), 1)
+
+        for token in set(_TOKEN_RE.findall(text.lower())):
+            if len(token) < 3 or not any(ch.isalpha() for ch in token) or token in ignore:
+                continue
+            for match in self.expand_token(token):
+                # Token pendek hanya dihitung jika cocok persis, bukan sebagai prefix
+                if match != token and len(token) < 4:
+                    continue
+                postings = self.postings[match]
+                idf = math.log(1 + total / len(postings))
+                for pos in postings:
+                    scores[pos] += idf
+
+        if not scores:
+            return []
+
+        # Buang mobil yang hanya cocok sebagian kecil (misalnya merek saja saat model disebut)
+        cutoff = max(scores.values()) * min_ratio
+        ranked = sorted(
+            (item for item in scores.items() if item[1] >= cutoff),
+            key=lambda item: (-item[1], item[0]),
+        )
+        return [self.mobil[pos] for pos, _ in ranked[:limit]]
+
+
+# Cache index per versi daftar_mobil, dipakai bersama oleh semua session
+_INDEX_CACHE: Dict[str, CatalogIndex] = {}
+_INDEX_CACHE_LOCK = threading.Lock()
+_INDEX_CACHE_MAX_ENTRIES = 2
+
+
+def get_catalog_index(daftar_mobil: List[Dict]) -> CatalogIndex:
+    """
+    Mengambil CatalogIndex untuk daftar_mobil (dibangun ulang hanya jika isinya berubah)
+
+    Args:
+        daftar_mobil: List dari semua mobil
+
+    Returns:
+        CatalogIndex siap pakai
+    """
+    # Backend SQLite (inventory.SQLiteInventory) sudah berfungsi sebagai index
+    as_catalog_index = getattr(daftar_mobil, "as_catalog_index", None)
+    if as_catalog_index is not None:
+        return as_catalog_index()
+
+    version = get_data_version(daftar_mobil)
+
+    index = _INDEX_CACHE.get(version)
+    if index is not None:
+        return index
+
+    index = CatalogIndex(daftar_mobil)
+    with _INDEX_CACHE_LOCK:
+        while len(_INDEX_CACHE) >= _INDEX_CACHE_MAX_ENTRIES:
+            _INDEX_CACHE.pop(next(iter(_INDEX_CACHE)))
+        _INDEX_CACHE[version] = index
+
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Filter terstruktur: harga, cicilan, tahun, kategori, merek
+# ---------------------------------------------------------------------------
+
+# Satuan nominal dalam Bahasa Indonesia
+_UNITS = {
+    "rb": 1_000, "ribu": 1_000, "k": 1_000,
+    "jt": 1_000_000, "juta": 1_000_000,
+    "m": 1_000_000_000, "miliar": 1_000_000_000, "milyar": 1_000_000_000, "milliar": 1_000_000_000,
+}
+
+_AMOUNT_RE = re.compile(
+    r"(?:rp\.?\s*)?(\d+(?:[.,]\d+)*)\s*(rb|ribu|k|jt|juta|m|miliar|milyar|milliar)?\b"
+)
+_RANGE_RE = re.compile(
+    r"(?:antara\s+)?(?:rp\.?\s*)?(\d+(?:[.,]\d+)?)\s*(rb|ribu|k|jt|juta|m|miliar|milyar|milliar)?"
+    r"\s*(?:-|–|sampai|sd|s/d|hingga|dan)\s*"
+    r"(?:rp\.?\s*)?(\d+(?:[.,]\d+)?)\s*(rb|ribu|k|jt|juta|m|miliar|milyar|milliar)\b"
+)
+_UPPER_WORDS = ("di bawah", "dibawah", "kurang dari", "maksimal", "maks", "max", "budget", "bujet", "dana",
+                "tidak lebih dari", "paling mahal", "sampai", "hingga", "<")
+_LOWER_WORDS = ("di atas", "diatas", "lebih dari", "minimal", "min ", "mulai", "paling murah", ">")
+_AROUND_WORDS = ("sekitar", "kisaran", "seharga", "range", "kurang lebih", "+-")
+_INSTALLMENT_WORDS = ("cicilan", "angsuran", "per bulan", "perbulan", "/bulan", "sebulan", "bulanan", "nyicil")
+
+# Kata yang boleh muncul di pertanyaan filter murni (tidak butuh jawaban model)
+FILTER_VOCABULARY = {
+    "mobil", "harga", "harganya", "cicilan", "cicilannya", "angsuran", "tahun", "di", "bawah", "dibawah", "atas",
+    "diatas", "kurang", "lebih", "dari", "maksimal", "maks", "max", "minimal", "min", "mulai", "budget", "bujet",
+    "dana", "antara", "sampai", "hingga", "sd", "dan", "rp", "juta", "jt", "ribu", "rb", "k", "m", "miliar",
+    "milyar", "per", "bulan", "perbulan", "sebulan", "bulanan", "ada", "apa", "apakah", "aja", "saja", "yang",
+    "yg", "dong", "ya", "kak", "min", "gan", "tolong", "cari", "carikan", "tampilkan", "list", "daftar", "pilihan",
+    "rekomendasi", "tersedia", "termurah", "termahal", "terbaru", "murah", "mahal", "paling", "baru", "bekas",
+    "second", "ke", "keatas", "kebawah", "tidak", "nggak", "ga", "mau", "cari", "punya", "untuk", "buat", "dengan",
+    "saya", "aku", "berapa", "budgetnya", "duit", "uang", "seharga", "kisaran", "sekitar", "range", "nyicil",
+}
+
+
+def parse_amount(number: str, unit: Optional[str]) -> Optional[int]:
+    """
+    Mengubah angka + satuan ("300", "juta") menjadi rupiah
+
+    Args:
+        number: Angka dalam teks ("300", "1,5", "300.000.000")
+        unit: Satuan (juta/jt, miliar/m, ribu/rb) atau None
+
+    Returns:
+        Nominal dalam rupiah, atau None jika bukan nominal yang valid
+    """
+    if unit:
+        value = float(number.replace(",", "."))
+        return int(value * _UNITS[unit])
+
+    digits = number.replace(".", "").replace(",", "")
+    if not digits.isdigit():
+        return None
+    value = int(digits)
+    # Tanpa satuan hanya dianggap nominal jika jelas ditulis lengkap (>= 100 ribu)
+    return value if value >= 100_000 else None
+
+
+class CarFilter:
+    """Hasil parsing pertanyaan filter (semua batas inklusif, None = tidak dibatasi)"""
+
+    def __init__(self):
+        self.harga_min: Optional[int] = None
+        self.harga_max: Optional[int] = None
+        self.cicilan_min: Optional[int] = None
+        self.cicilan_max: Optional[int] = None
+        self.tahun_min: Optional[int] = None
+        self.tahun_max: Optional[int] = None
+        self.kategori: List[str] = []
+        self.merek: List[str] = []
+        self.bekas: Optional[bool] = None
+        self.sort_by: str = "harga"
+        self.descending: bool = False
+        self.is_pure = False
+
+    @property
+    def has_numeric(self) -> bool:
+        return any(value is not None for value in (
+            self.harga_min, self.harga_max, self.cicilan_min, self.cicilan_max, self.tahun_min, self.tahun_max,
+        ))
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.has_numeric or self.kategori or self.merek or self.bekas is not None)
+
+    @property
+    def terms(self) -> Set[str]:
+        """Kata di pertanyaan yang sudah dipakai sebagai batasan (merek, kategori, bekas)"""
+        terms = set(self.merek)
+        for kategori in self.kategori:
+            terms.update(tokenize(kategori))
+        if self.bekas is not None:
+            terms.update(("bekas", "second"))
+        return terms
+
+    def matches(self, mobil: Dict) -> bool:
+        """
+        Apakah satu mobil memenuhi semua batasan filter
+
+        Args:
+            mobil: Dictionary mobil
+
+        Returns:
+            True jika mobil lolos filter
+        """
+        for field in NUMERIC_FIELDS:
+            low = getattr(self, f"{field}_min")
+            high = getattr(self, f"{field}_max")
+            if (low is not None and mobil[field] < low) or (high is not None and mobil[field] > high):
+                return False
+        kategori = mobil["kategori"].lower()
+        if self.kategori and kategori not in self.kategori:
+            return False
+        if self.merek and mobil["merek"].lower() not in self.merek:
+            return False
+        return self.bekas is None or ("bekas" in kategori) == self.bekas
+
+    def describe(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Deskripsi singkat filter dalam Bahasa Indonesia (labels: nama asli merek/kategori)"""
+        labels = labels or {}
+
+        def rupiah(amount: int) -> str:
+            return f"Rp {amount:,.0f}".replace(",", ".")
+
+        parts = []
+        if self.kategori:
+            parts.append("kategori " + "/".join(
+                labels.get(k) or labels.get(k.replace(" bekas", ""), k) + " Bekas" if k.endswith(" bekas") else labels.get(k, k)
+                for k in self.kategori
+            ))
+        if self.merek:
+            parts.append("merek " + "/".join(labels.get(m, m) for m in self.merek))
+        if self.bekas is not None and not self.kategori:
+            parts.append("mobil bekas" if self.bekas else "mobil baru")
+        for label, low, high in (
+            ("harga", self.harga_min, self.harga_max),
+            ("cicilan", self.cicilan_min, self.cicilan_max),
+        ):
+            if low is not None and high is not None:
+                parts.append(f"{label} {rupiah(low)} - {rupiah(high)}")
+            elif high is not None:
+                parts.append(f"{label} maksimal {rupiah(high)}")
+            elif low is not None:
+                parts.append(f"{label} minimal {rupiah(low)}")
+        if self.tahun_min is not None and self.tahun_max is not None and self.tahun_min == self.tahun_max:
+            parts.append(f"tahun {self.tahun_min}")
+        elif self.tahun_min is not None:
+            parts.append(f"tahun {self.tahun_min} ke atas")
+        elif self.tahun_max is not None:
+            parts.append(f"tahun {self.tahun_max} ke bawah")
+        return ", ".join(parts)
+
+
+def _direction(text: str, start: int) -> Optional[str]:
+    # Lihat kata pembanding tepat sebelum nominal ("di bawah 300 juta")
+    window = text[max(0, start - 20):start]
+    best, best_pos = None, -1
+    for words, direction in ((_UPPER_WORDS, "max"), (_LOWER_WORDS, "min"), (_AROUND_WORDS, "around")):
+        for word in words:
+            pos = window.rfind(word)
+            if pos > best_pos:
+                best, best_pos = direction, pos
+    return best
+
+
+def _is_installment(text: str, start: int, end: int) -> bool:
+    window = text[max(0, start - 25):end + 12]
+    return any(word in window for word in _INSTALLMENT_WORDS)
+
+
+def parse_filter_query(text: str, index: "CatalogIndex") -> CarFilter:
+    """
+    Mengambil batasan harga, cicilan, tahun, kategori, dan merek dari pertanyaan
+
+    Contoh: "SUV di bawah 300 juta", "cicilan di bawah 6 juta",
+    "mobil bekas antara 150-200 juta", "Toyota tahun 2024 termurah"
+
+    Args:
+        text: Pertanyaan user
+        index: CatalogIndex (untuk mengenali nama kategori dan merek)
+
+    Returns:
+        CarFilter hasil parsing (is_empty = True jika tidak ada batasan)
+    """
+    car_filter = CarFilter()
+    lowered = " " + text.lower() + " "
+    consumed = []
+
+    # Rentang nominal: "150-200 juta", "antara 150 juta dan 200 juta"
+    for match in _RANGE_RE.finditer(lowered):
+        unit_low = match.group(2) or match.group(4)
+        low = parse_amount(match.group(1), unit_low)
+        high = parse_amount(match.group(3), match.group(4))
+        if low is None or high is None:
+            continue
+        if _is_installment(lowered, match.start(), match.end()):
+            car_filter.cicilan_min, car_filter.cicilan_max = min(low, high), max(low, high)
+        else:
+            car_filter.harga_min, car_filter.harga_max = min(low, high), max(low, high)
+        consumed.append((match.start(), match.end()))
+
+    for match in _AMOUNT_RE.finditer(lowered):
+        if any(start <= match.start() < end for start, end in consumed):
+            continue
+
+        number, unit = match.group(1), match.group(2)
+        digits = number.replace(".", "").replace(",", "")
+
+        # Tahun: 4 digit tanpa satuan
+        if unit is None and digits.isdigit() and len(digits) == 4 and 1990 <= int(digits) <= 2100:
+            year = int(digits)
+            after = lowered[match.end():match.end() + 12]
+            direction = _direction(lowered, match.start())
+            if "ke atas" in after or "keatas" in after or direction == "min":
+                car_filter.tahun_min = year
+            elif "ke bawah" in after or "kebawah" in after or direction == "max":
+                car_filter.tahun_max = year
+            else:
+                car_filter.tahun_min = car_filter.tahun_max = year
+            continue
+
+        amount = parse_amount(number, unit)
+        if amount is None:
+            continue
+
+        direction = _direction(lowered, match.start()) or "max"
+        field = "cicilan" if _is_installment(lowered, match.start(), match.end()) else "harga"
+        if direction == "around":
+            # "sekitar 200 juta" -> toleransi 10%
+            setattr(car_filter, f"{field}_min", int(amount * 0.9))
+            setattr(car_filter, f"{field}_max", int(amount * 1.1))
+        else:
+            setattr(car_filter, f"{field}_{direction}", amount)
+
+    tokens = set(_TOKEN_RE.findall(lowered))
+
+    for kategori in index.by_kategori:
+        base = kategori.replace(" bekas", "")
+        if base in tokens and kategori not in car_filter.kategori and not kategori.endswith(" bekas"):
+            car_filter.kategori.append(kategori)
+    for merek in index.by_merek:
+        if merek in tokens:
+            car_filter.merek.append(merek)
+
+    if "bekas" in tokens or "second" in tokens:
+        car_filter.bekas = True
+    elif "baru" in tokens and "terbaru" not in tokens:
+        car_filter.bekas = False
+
+    if car_filter.bekas and car_filter.kategori:
+        # "SUV bekas" -> kategori "suv bekas" jika ada
+        car_filter.kategori = [f"{kategori} bekas" for kategori in car_filter.kategori]
+
+    if "termahal" in tokens or ("paling" in tokens and "mahal" in tokens):
+        car_filter.descending = True
+    if "terbaru" in tokens:
+        car_filter.sort_by, car_filter.descending = "tahun", True
+    elif car_filter.cicilan_max is not None or car_filter.cicilan_min is not None:
+        car_filter.sort_by = "cicilan"
+
+    superlative = bool(tokens & {"termurah", "termahal", "terbaru"}) or ("paling" in tokens)
+    leftover = {
+        token for token in tokens
+        if token not in FILTER_VOCABULARY and not any(ch.isdigit() for ch in token)
+        and token not in index.by_merek and token not in {k.split()[0] for k in index.by_kategori}
+    }
+    car_filter.is_pure = (car_filter.has_numeric or superlative) and not leftover
+    return car_filter
@@ -0,0 +1,103 @@
+"""
+conversation.py - Memori percakapan per session dengan ukuran tetap (ring buffer + ringkasan)
+"""
+
+import re
+from collections import deque
+from typing import List, Dict
+
+# Jumlah pesan terbaru yang disimpan utuh (dipakai untuk prompt dan ditampilkan sebagai chat bubble)
+MAX_RECENT_MESSAGES = 12
+
+# Jumlah pesan lama yang masih bisa dibuka di riwayat (ditampilkan terlipat)
+MAX_ARCHIVED_MESSAGES = 40
+
+# Jumlah baris ringkasan percakapan lama yang disimpan
+MAX_SUMMARY_LINES = 8
+
+_MARKDOWN_RE = re.compile(r"[*_`#>|]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def compact_text(text: str, max_chars: int) -> str:
+    """
+    Meringkas teks menjadi satu baris pendek (tanpa markdown)
+
+    Args:
+        text: Teks pesan
+        max_chars: Panjang maksimal hasil
+
+    Returns:
+        Teks satu baris, dipotong dengan "…" jika terlalu panjang
+    """
+    text = _SPACE_RE.sub(" ", _MARKDOWN_RE.sub("", text)).strip()
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - 1].rstrip() + "…"
+
+
+class ConversationMemory:
+    """
+    Memori percakapan satu session yang ukurannya tidak bertambah
+
+    - Pesan terbaru disimpan utuh di ring buffer (MAX_RECENT_MESSAGES)
+    - Pesan yang keluar dari buffer pindah ke arsip terbatas untuk ditampilkan
+      terlipat, dan diringkas menjadi satu baris per giliran tanya-jawab
+    - Ringkasan juga bergulir: hanya MAX_SUMMARY_LINES baris terakhir disimpan
+    """
+
+    def __init__(
+        self,
+        max_recent: int = MAX_RECENT_MESSAGES,
+        max_archived: int = MAX_ARCHIVED_MESSAGES,
+        max_summary_lines: int = MAX_SUMMARY_LINES,
+    ):
+        self._recent = deque()
+        self._archived = deque(maxlen=max_archived)
+        self._summary_lines = deque(maxlen=max_summary_lines)
+        self.max_recent = max_recent
+        self.total_messages = 0
+        self.summarized_messages = 0
+
+    def append(self, role: str, content: str):
+        """
+        Menambahkan pesan ke memori
+
+        Args:
+            role: "user" atau "assistant"
+            content: Isi pesan
+        """
+        self._recent.append({"role": role, "content": content})
+        self.total_messages += 1
+        while len(self._recent) > self.max_recent:
+            self._evict(self._recent.popleft())
+
+    def _evict(self, message: Dict):
+        self._archived.append(message)
+        self.summarized_messages += 1
+
+        if message["role"] == "user":
+            self._summary_lines.append(f"- User: {compact_text(message['content'], 120)}")
+        elif self._summary_lines and "→" not in self._summary_lines[-1]:
+            # Jawaban assistant digabung ke baris pertanyaannya
+            self._summary_lines[-1] += f" → Assistant: {compact_text(message['content'], 80)}"
+
+    @property
+    def messages(self) -> List[Dict]:
+        """Pesan terbaru (utuh), urut dari yang paling lama"""
+        return list(self._recent)
+
+    @property
+    def archived(self) -> List[Dict]:
+        """Pesan lama yang masih disimpan untuk ditampilkan terlipat"""
+        return list(self._archived)
+
+    @property
+    def summary(self) -> str:
+        """Ringkasan pesan yang sudah keluar dari buffer (kosong jika belum ada)"""
+        if not self._summary_lines:
+            return ""
+        return f"Ringkasan {self.summarized_messages} pesan sebelumnya:\n" + "\n".join(self._summary_lines)
+
+    def __len__(self) -> int:
+        return len(self._recent)
@@ -1,337 +1,316 @@
 """
-data.py - Menyimpan semua data Showroom Mobil Sungkang
+data.py - Memuat data Showroom Mobil Sungkang dari file (showroom_data.json) dengan hot reload
 """
 
-def get_showroom_data():
-    """Mengembalikan dictionary berisi semua data showroom"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional, Set
+
+from telemetry import get_logger
+
+log = get_logger("data")
+
+
+def _hash_data(data) -> str:
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def get_data_version(data) -> str:
+    """
+    Mengambil versi data (berubah hanya jika isi data berubah)
+    
+    Data beku dari freeze_data() sudah membawa versinya sendiri sehingga
+    tidak perlu di-hash ulang; data biasa di-hash dari isinya.
+    
+    Args:
+        data: Data showroom (atau bagian darinya, misalnya daftar_mobil)
+        
+    Returns:
+        String hash pendek yang hanya berubah jika isi data berubah
+    """
+    version = getattr(data, "version", None)
+    if version is not None:
+        return version
+    return _hash_data(data)
+
+
+class FrozenDict(dict):
+    """Dictionary read-only yang dipakai bersama oleh semua session"""
+    
+    version = None
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Data showroom bersifat read-only, gunakan salinan jika perlu mengubah")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),), {"version": self.version})
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class FrozenList(tuple):
+    """List read-only (tuple) yang membawa versi datanya"""
+    
+    version = None
+    
+    def __reduce__(self):
+        return (FrozenList, (tuple(self),), {"version": self.version})
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return FrozenList(_freeze(item) for item in value)
+    return value
+
+
+def freeze_data(data: dict) -> FrozenDict:
+    """
+    Membekukan data showroom dan memberi versi pada data dan tiap bagiannya
+    
+    Versi disimpan di data utama dan di setiap bagian tingkat pertama
+    (daftar_mobil, promosi, paket_pembiayaan, ...), sehingga cache turunan
+    (prompt, index katalog, matriks pembiayaan) cukup membaca atributnya.
+    
+    Args:
+        data: Dictionary data showroom
+        
+    Returns:
+        FrozenDict yang tidak bisa diubah
+    """
+    frozen = _freeze(data)
+    for section in frozen.values():
+        if isinstance(section, (FrozenDict, FrozenList)):
+            section.version = _hash_data(section)
+    frozen.version = _hash_data(frozen)
+    return frozen
+
+
+# Lokasi file data showroom (bisa diganti lewat env SHOWROOM_DATA_FILE)
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "showroom_data.json")
+
+# Interval pengecekan perubahan file dalam detik (0 = tanpa hot reload)
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Bagian wajib di file data dan field wajib tiap mobil
+REQUIRED_SECTIONS = ("nama", "alamat", "whatsapp", "email", "jam_operasional", "daftar_mobil", "promosi", "paket_pembiayaan")
+REQUIRED_MOBIL_FIELDS = ("id", "merek", "model", "tahun", "kategori", "harga", "cicilan")
+
+
+def validate_showroom_data(data: dict):
+    """
+    Memeriksa struktur data showroom sebelum dipakai
     
-    showroom = {
-        "nama": "Showroom Mobil Sungkang",
-        "alamat": "Jl. Gatot Subroto No. 45, Semarang, Jawa Tengah 50123",
-        "kota": "Semarang",
-        "provinsi": "Jawa Tengah",
-        "whatsapp": "+62 812-3456-7890",
-        "instagram": "@sungkangmobil",
-        "email": "info@sungkangmobil.com",
-        "website": "www.sungkangmobil.com",
-        "tahun_berdiri": 2010,
+    Args:
+        data: Dictionary data showroom hasil load file
         
-        "jam_operasional": {
-            "Senin-Jumat": "08:00 - 18:00",
-            "Sabtu": "08:00 - 14:00",
-            "Minggu": "Libur",
-            "Hari Libur Nasional": "Libur"
-        },
+    Raises:
+        ValueError: Jika bagian atau field wajib tidak ada
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Data showroom harus berupa object JSON")
+    
+    missing = [key for key in REQUIRED_SECTIONS if key not in data]
+    if missing:
+        raise ValueError(f"Bagian wajib tidak ada: {', '.join(missing)}")
+    
+    if not isinstance(data["daftar_mobil"], list):
+        # Backend SQLite: struktur tabel sudah dijamin oleh schema database
+        return
+    
+    ids = set()
+    for pos, mobil in enumerate(data["daftar_mobil"]):
+        missing = [field for field in REQUIRED_MOBIL_FIELDS if field not in mobil]
+        if missing:
+            raise ValueError(f"Mobil ke-{pos + 1} tidak punya field: {', '.join(missing)}")
+        if mobil["id"] in ids:
+            raise ValueError(f"Id mobil duplikat: {mobil['id']}")
+        ids.add(mobil["id"])
+
+
+def load_showroom_data(path: str = DEFAULT_DATA_PATH, inventory_path: Optional[str] = None) -> dict:
+    """
+    Membaca data showroom dari file JSON
+    
+    Args:
+        path: Lokasi file data
+        inventory_path: Database SQLite inventori (lihat inventory.py); jika diisi,
+            daftar_mobil dibaca dari database, bukan dari file JSON
         
-        "daftar_mobil": [
-            {
-                "id": 1,
-                "merek": "Toyota",
-                "model": "Avanza 1.3 MT",
-                "tahun": 2024,
-                "kategori": "MPV",
-                "harga": 181000000,
-                "cicilan": 5800000,
-                "spesifikasi": "7 seater, Manual, AC, Power steering"
-            },
-            {
-                "id": 2,
-                "merek": "Daihatsu",
-                "model": "Xenia 1.3 MT",
-                "tahun": 2024,
-                "kategori": "MPV",
-                "harga": 165000000,
-                "cicilan": 5200000,
-                "spesifikasi": "7 seater, Manual, AC, Power Window"
-            },
-            {
-                "id": 3,
-                "merek": "Honda",
-                "model": "CR-V 1.5 Turbo",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 425000000,
-                "cicilan": 13500000,
-                "spesifikasi": "SUV Premium, Turbo, Automatic, CVT"
-            },
-            {
-                "id": 4,
-                "merek": "Toyota",
-                "model": "Rush 1.5 MT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 245000000,
-                "cicilan": 7800000,
-                "spesifikasi": "SUV Compact, Manual, AC, Power Window"
-            },
-            {
-                "id": 5,
-                "merek": "Honda",
-                "model": "City 1.5 MT",
-                "tahun": 2024,
-                "kategori": "Sedan",
-                "harga": 290000000,
-                "cicilan": 9200000,
-                "spesifikasi": "Sedan Compact, Manual, AC, ABS"
-            },
-            {
-                "id": 6,
-                "merek": "Toyota",
-                "model": "Corolla 1.6 Manual",
-                "tahun": 2024,
-                "kategori": "Sedan",
-                "harga": 312000000,
-                "cicilan": 9900000,
-                "spesifikasi": "Sedan Mid-size, Manual, AC, Power steering"
-            },
-            {
-                "id": 7,
-                "merek": "Isuzu",
-                "model": "D-Max 2.5 Single Cabin",
-                "tahun": 2024,
-                "kategori": "Pickup",
-                "harga": 285000000,
-                "cicilan": 9100000,
-                "spesifikasi": "Pickup, Diesel, Manual, AC"
-            },
-            {
-                "id": 8,
-                "merek": "Datsun",
-                "model": "GO 1.2 MT",
-                "tahun": 2024,
-                "kategori": "Hatchback",
-                "harga": 139000000,
-                "cicilan": 4400000,
-                "spesifikasi": "Hatchback, Manual, AC, Power Window"
-            },
-            {
-                "id": 9,
-                "merek": "Toyota",
-                "model": "Innova 2.4 Diesel",
-                "tahun": 2019,
-                "kategori": "MPV Bekas",
-                "harga": 285000000,
-                "cicilan": 9100000,
-                "spesifikasi": "Sangat Baik, Kilometer rendah, Full Service Record"
-            },
-            {
-                "id": 10,
-                "merek": "Honda",
-                "model": "Jazz 1.5 Automatic",
-                "tahun": 2018,
-                "kategori": "Hatchback Bekas",
-                "harga": 175000000,
-                "cicilan": 5600000,
-                "spesifikasi": "Baik, Terawat, Kilometer 75.000 km"
-            },
-            {
-                "id": 11,
-                "merek": "Mitsubishi",
-                "model": "Pajero Sport 2.4 AT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 480000000,
-                "cicilan": 15200000,
-                "spesifikasi": "SUV Premium, Automatic, 4x4, All Power"
-            },
-            {
-                "id": 12,
-                "merek": "Suzuki",
-                "model": "Ertiga 1.5 MT",
-                "tahun": 2024,
-                "kategori": "MPV",
-                "harga": 195000000,
-                "cicilan": 6200000,
-                "spesifikasi": "7 seater, Manual, AC, Power Window"
-            },
-            {
-                "id": 13,
-                "merek": "Hyundai",
-                "model": "Creta 1.5 AT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 320000000,
-                "cicilan": 10200000,
-                "spesifikasi": "SUV Modern, Automatic, Warranty"
-            },
-            {
-                "id": 14,
-                "merek": "Kia",
-                "model": "Sonet 1.5 MT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 280000000,
-                "cicilan": 8900000,
-                "spesifikasi": "SUV Compact, Manual, Modern Design"
-            },
-            {
-                "id": 15,
-                "merek": "Nissan",
-                "model": "Grand Livina 1.5 MT",
-                "tahun": 2024,
-                "kategori": "MPV",
-                "harga": 210000000,
-                "cicilan": 6700000,
-                "spesifikasi": "MPV Spacious, 7 seater, Terpercaya"
-            },
-            {
-                "id": 16,
-                "merek": "Toyota",
-                "model": "Fortuner 2.8 Diesel AT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 530000000,
-                "cicilan": 16800000,
-                "spesifikasi": "SUV Tangguh, Diesel, 7 seater, Premium"
-            },
-            {
-                "id": 17,
-                "merek": "Honda",
-                "model": "Civic 1.5 Turbo AT",
-                "tahun": 2024,
-                "kategori": "Sedan",
-                "harga": 450000000,
-                "cicilan": 14300000,
-                "spesifikasi": "Sedan Sporty, Turbo, Full Power"
-            },
-            {
-                "id": 18,
-                "merek": "Mazda",
-                "model": "CX-5 2.5 AT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 420000000,
-                "cicilan": 13400000,
-                "spesifikasi": "SUV Stylish, Automatic, Premium Interior"
-            },
-            {
-                "id": 19,
-                "merek": "Chevrolet",
-                "model": "Trailblazer 2.0 AT",
-                "tahun": 2024,
-                "kategori": "SUV",
-                "harga": 390000000,
-                "cicilan": 12400000,
-                "spesifikasi": "SUV Powerful, Automatic, Turbo"
-            },
-            {
-                "id": 20,
-                "merek": "Wuling",
-                "model": "Cortez 1.5 MT",
-                "tahun": 2024,
-                "kategori": "MPV",
-                "harga": 165000000,
-                "cicilan": 5300000,
-                "spesifikasi": "MPV Ekonomis, 7 seater, Terjangkau"
-            }
-        ],
+    Returns:
+        Dictionary data showroom yang sudah divalidasi
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if inventory_path:
+        from inventory import SQLiteInventory
+        data["daftar_mobil"] = SQLiteInventory(inventory_path)
+    validate_showroom_data(data)
+    return data
+
+
+def _share_sections(new: FrozenDict, old: Optional[FrozenDict]) -> FrozenDict:
+    # Bagian yang isinya tidak berubah memakai objek lama, agar index/cache turunannya tetap valid
+    if old is None:
+        return new
+    shared = {
+        key: old[key] if key in old and getattr(section, "version", None) is not None
+        and getattr(old[key], "version", None) == section.version else section
+        for key, section in new.items()
+    }
+    frozen = FrozenDict(shared)
+    frozen.version = new.version
+    return frozen
+
+
+class ShowroomDataStore:
+    """
+    Penyimpan data showroom bersama (read-only) dengan hot reload dari file
+    
+    - Data dibaca dan dibekukan sekali, semua session memegang referensi yang sama
+    - Thread watcher mengecek perubahan file (mtime/size) secara berkala
+    - Reload dilakukan penuh di samping lalu ditukar dengan satu assignment
+      (atomic), sehingga request yang sedang berjalan tetap memakai versi lama
+    - Bagian yang tidak berubah tetap objek yang sama dengan versi yang sama,
+      sehingga hanya cache turunan bagian yang berubah yang dibangun ulang
+    - File rusak/tidak valid diabaikan, data lama tetap dipakai
+    """
+    
+    def __init__(self, path: str = DEFAULT_DATA_PATH, poll_interval: float = DEFAULT_POLL_INTERVAL, inventory_path: Optional[str] = None):
+        self.path = path
+        self.inventory_path = inventory_path
+        self.poll_interval = poll_interval
+        self.last_error = ""
+        self._data: Optional[FrozenDict] = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self._listeners: Set[Callable[[FrozenDict], None]] = set()
+        self._watcher: Optional[threading.Thread] = None
+    
+    def _file_signature(self):
+        signature = []
+        for path in (self.path, self.inventory_path):
+            if path:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def _load(self) -> FrozenDict:
+        return freeze_data(load_showroom_data(self.path, self.inventory_path))
+    
+    def get(self) -> FrozenDict:
+        """
+        Mengambil versi data showroom saat ini
         
-        "promosi": [
-            {
-                "id": 1,
-                "judul": "Diskon Langsung",
-                "deskripsi": "Diskon Rp 10.000.000 untuk Avanza, Xenia, Rush"
-            },
-            {
-                "id": 2,
-                "judul": "Asuransi Gratis",
-                "deskripsi": "Gratis Asuransi 1 Tahun untuk semua mobil baru"
-            },
-            {
-                "id": 3,
-                "judul": "DP 0%",
-                "deskripsi": "DP 0% untuk tenor 24 bulan (kredit minimal Rp 150 juta)"
-            },
-            {
-                "id": 4,
-                "judul": "Trade-in Terbaik",
-                "deskripsi": "Trade-in dengan nilai tukar tertinggi + Rp 5.000.000"
-            },
-            {
-                "id": 5,
-                "judul": "Cicilan Spesial",
-                "deskripsi": "Cicilan Spesial Rp 3.999.000 untuk Datsun GO (60 bulan)"
-            }
-        ],
+        Returns:
+            FrozenDict berisi data showroom
+        """
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._signature = self._file_signature()
+                    self._data = self._load()
+            self._start_watcher()
+        return self._data
+    
+    def reload(self) -> bool:
+        """
+        Membaca ulang file data jika berubah sejak terakhir dibaca
         
-        "paket_pembiayaan": [
-            {
-                "tenor": "12 Bulan",
-                "bunga": "3.5%",
-                "dp_minimum": "20%",
-                "catatan": "Mobil baru"
-            },
-            {
-                "tenor": "24 Bulan",
-                "bunga": "4.2%",
-                "dp_minimum": "15%",
-                "catatan": "Mobil baru & bekas"
-            },
-            {
-                "tenor": "36 Bulan",
-                "bunga": "4.8%",
-                "dp_minimum": "10%",
-                "catatan": "Mobil baru & bekas"
-            },
-            {
-                "tenor": "48 Bulan",
-                "bunga": "5.5%",
-                "dp_minimum": "10%",
-                "catatan": "Mobil baru saja"
-            },
-            {
-                "tenor": "60 Bulan",
-                "bunga": "6.2%",
-                "dp_minimum": "15%",
-                "catatan": "Mobil baru saja"
-            }
-        ],
+        Returns:
+            True jika data baru dipasang
+        """
+        with self._lock:
+            try:
+                signature = self._file_signature()
+                if signature == self._signature:
+                    return False
+                self._signature = signature
+                new_data = self._load()
+            except (OSError, ValueError, sqlite3.Error) as e:
+                # json.JSONDecodeError turunan ValueError; data lama tetap dipakai
+                self.last_error = str(e)
+                log.warning("reload_failed", path=self.path, error=str(e))
+                return False
+            
+            self.last_error = ""
+            if self._data is not None and new_data.version == self._data.version:
+                return False
+            
+            new_data = _share_sections(new_data, self._data)
+            old_data = self._data or {}
+            changed = [key for key in new_data if new_data[key] is not old_data.get(key) and new_data[key] != old_data.get(key)]
+            self._data = new_data
         
-        "layanan": [
-            "Penjualan Mobil Baru",
-            "Penjualan Mobil Bekas",
-            "Layanan Test Drive (Gratis)",
-            "Financing/Kredit",
-            "Trade-in",
-            "Konsultasi Gratis",
-            "Layanan Purna Jual",
-            "Asuransi"
-        ],
+        log.info("data_reloaded", version=new_data.version, changed=changed)
+        for listener in list(self._listeners):
+            try:
+                listener(new_data)
+            except Exception as e:
+                log.exception("reload_listener_failed", error=type(e).__name__)
+        return True
+    
+    def add_listener(self, listener: Callable[[FrozenDict], None]):
+        """
+        Mendaftarkan fungsi yang dipanggil setelah data baru dipasang
         
-        "fasilitas": [
-            "Ruang tunggu ber-AC dengan WiFi gratis",
-            "Ruang konsultasi privat",
-            "Toilet bersih & fasilitas wudhu",
-            "Mushola",
-            "Kantin/Kafe kecil",
-            "Area display mobil indoor & outdoor",
-            "Test drive track khusus",
-            "Mesin ATM & transfer bank nearby",
-            "Tempat bermain anak-anak"
-        ],
+        Dipakai untuk membangun cache turunan (index, prompt) di thread watcher,
+        bukan di request user pertama setelah reload.
         
-        "kontak_departemen": [
-            {
-                "departemen": "Sales Manager",
-                "nama": "Bambang Sutrisno",
-                "whatsapp": "+62 812-9876-5432"
-            },
-            {
-                "departemen": "Sales Executive",
-                "nama": "Siti Nurhaliza",
-                "whatsapp": "+62 813-5678-9012"
-            },
-            {
-                "departemen": "Finance/Kredit",
-                "nama": "Ahmad Wijaya",
-                "whatsapp": "+62 814-3456-7890"
-            },
-            {
-                "departemen": "After Sales",
-                "nama": "Hendra Kusuma",
-                "whatsapp": "+62 815-2345-6789"
-            }
-        ]
-    }
+        Args:
+            listener: Fungsi dengan argumen data showroom baru
+        """
+        self._listeners.add(listener)
     
-    return showroom
\ No newline at end of file
+    def _start_watcher(self):
+        if self.poll_interval <= 0 or self._watcher is not None:
+            return
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="showroom-data-watcher", daemon=True)
+                self._watcher.start()
+    
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.reload()
+
+
+# Store global, dipakai bersama oleh semua session Streamlit dalam satu proses
+SHOWROOM_STORE = ShowroomDataStore(
+    path=os.getenv("SHOWROOM_DATA_FILE", DEFAULT_DATA_PATH),
+    poll_interval=float(os.getenv("SHOWROOM_DATA_POLL", DEFAULT_POLL_INTERVAL)),
+    inventory_path=os.getenv("SHOWROOM_INVENTORY_DB") or None,
+)
+
+
+def get_shared_showroom_data() -> FrozenDict:
+    """
+    Mengambil data showroom bersama (read-only) untuk seluruh proses
+    
+    Data dibaca dari file dan dibekukan sekali; setiap session hanya
+    menyimpan referensi ke objek yang sama, bukan salinan. Jika file
+    berubah, versi baru dipasang otomatis oleh SHOWROOM_STORE.
+    
+    Returns:
+        FrozenDict berisi data showroom
+    """
+    return SHOWROOM_STORE.get()
+
+
+def get_showroom_data() -> dict:
+    """Mengembalikan dictionary berisi semua data showroom (dibaca dari file data)"""
+    return load_showroom_data(SHOWROOM_STORE.path, SHOWROOM_STORE.inventory_path)
@@ -0,0 +1,280 @@
+"""
+financing.py - Simulasi kredit: matriks cicilan mobil x tenor x DP dari paket_pembiayaan
+"""
+
+import re
+import threading
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from data import get_data_version
+
+# Persentase DP yang dihitung di matriks
+DP_LEVELS = (0.10, 0.15, 0.20, 0.25, 0.30, 0.40, 0.50)
+
+# Kata yang menandakan user meminta simulasi cicilan
+SIMULATION_KEYWORDS = {
+    "kredit", "cicilan", "cicil", "angsuran", "dp", "tenor", "leasing", "pembiayaan",
+    "simulasi", "nyicil", "nyicilnya", "cicilannya", "angsurannya", "kreditnya", "dpnya",
+}
+
+# DP yang ditampilkan jika user tidak menyebut DP
+DEFAULT_DISPLAY_DP = (0.20, 0.30)
+
+# Cicilan dibulatkan ke atas per kelipatan ini (seperti tabel angsuran leasing)
+ROUND_TO = 1_000
+
+# DP nominal tanpa satuan ("dp 50000000", "dp 50.000.000") baru dianggap rupiah mulai angka ini
+MIN_DP_AMOUNT = 100_000
+
+# Tenor tanpa satuan ("tenor 4", "tenor 36"): sampai angka ini dianggap tahun, di atasnya bulan
+MAX_TENOR_YEARS = 5
+
+# Angka DP boleh memakai pemisah ribuan; satuan opsional (tanpa satuan dibaca sebagai rupiah penuh / nol)
+_DP_RE = re.compile(
+    r"\b(?:dp|uang muka)\s*(?:nya)?\s*(?:rp\.?\s*)?(\d+(?:[.,]\d+)*)(?!\d)\s*(%|persen|jt|juta|rb|ribu)?"
+    r"(?!\s*(?:bulan|bln|tahun|thn)\b)"
+)
+_TENOR_RE = re.compile(r"(\d+)\s*(bulan|bln|tahun|thn)\b")
+_TENOR_BARE_RE = re.compile(r"\btenor\s*(?:nya)?\s*(\d+)(?!\d)(?!\s*(?:bulan|bln|tahun|thn)\b)")
+
+
+def parse_percent(value: str) -> float:
+    """
+    Mengubah teks persen ("4.8%") menjadi rasio (0.048)
+
+    Args:
+        value: Teks persen
+
+    Returns:
+        Rasio dalam float
+    """
+    return float(value.strip().rstrip("%").replace(",", ".")) / 100
+
+
+def parse_tenor(value: str) -> int:
+    """
+    Mengubah teks tenor ("36 Bulan") menjadi jumlah bulan
+
+    Args:
+        value: Teks tenor
+
+    Returns:
+        Jumlah bulan
+    """
+    return int(re.search(r"\d+", value).group())
+
+
+def is_bekas(mobil: Dict) -> bool:
+    """Apakah mobil termasuk mobil bekas (berdasarkan kategori)"""
+    return "bekas" in mobil["kategori"].lower()
+
+
+class FinancingMatrix:
+    """
+    Matriks cicilan semua mobil x semua tenor x semua level DP
+
+    Dihitung sekali dalam satu operasi vektor NumPy dengan skema bunga flat
+    per tahun (umum untuk kredit mobil):
+
+        cicilan = harga x (1 - DP) x (1 + bunga x tenor_tahun) / tenor_bulan
+
+    Kombinasi yang tidak diizinkan paket (DP di bawah minimum, atau tenor
+    khusus mobil baru untuk mobil bekas) bernilai NaN.
+
+    Dengan precompute=False (inventori SQLite) matriks tidak dibangun; cicilan
+    dihitung per mobil yang diminta, dan data mobil diambil lewat get_by_id.
+    """
+
+    def __init__(self, daftar_mobil: List[Dict], paket_pembiayaan: List[Dict], dp_levels: Tuple[float, ...] = DP_LEVELS, precompute: bool = True):
+        self.daftar_mobil = daftar_mobil
+        self.paket = list(paket_pembiayaan)
+
+        self.tenor = np.array([parse_tenor(paket["tenor"]) for paket in self.paket], dtype=np.int64)
+        self.bunga = np.array([parse_percent(paket["bunga"]) for paket in self.paket], dtype=np.float64)
+        self.dp_minimum = np.array([parse_percent(paket["dp_minimum"]) for paket in self.paket], dtype=np.float64)
+        self.khusus_baru = np.array(["bekas" not in paket.get("catatan", "").lower() for paket in self.paket], dtype=bool)
+        self.dp_levels = np.array(dp_levels, dtype=np.float64)
+
+        self.row_by_id: Dict[int, int] = {}
+        self.cicilan: Optional[np.ndarray] = None
+        if precompute:
+            mobil = list(daftar_mobil)
+            self.row_by_id = {m["id"]: row for row, m in enumerate(mobil)}
+            self.harga = np.array([m["harga"] for m in mobil], dtype=np.float64)
+            self.bekas = np.array([is_bekas(m) for m in mobil], dtype=bool)
+            self.cicilan = self._compute()
+
+    def _compute(self) -> np.ndarray:
+        # Bentuk akhir: (mobil, tenor, dp)
+        harga = self.harga[:, None, None]
+        dp = self.dp_levels[None, None, :]
+        faktor = (1 + self.bunga * self.tenor / 12) / self.tenor
+
+        matrix = harga * (1 - dp) * faktor[None, :, None]
+        matrix = np.ceil(matrix / ROUND_TO) * ROUND_TO
+
+        dp_kurang = self.dp_levels[None, :] < self.dp_minimum[:, None] - 1e-9   # (tenor, dp)
+        tidak_untuk_bekas = self.bekas[:, None] & self.khusus_baru[None, :]     # (mobil, tenor)
+        invalid = dp_kurang[None, :, :] | tidak_untuk_bekas[:, :, None]
+        matrix[invalid] = np.nan
+        return matrix
+
+    def _car(self, mobil_id: int) -> Tuple[float, bool]:
+        # Harga dan status bekas satu mobil (dari matriks, atau langsung dari inventori)
+        row = self.row_by_id.get(mobil_id)
+        if row is not None:
+            return float(self.harga[row]), bool(self.bekas[row])
+        mobil = self.daftar_mobil.get_by_id(mobil_id) if hasattr(self.daftar_mobil, "get_by_id") else None
+        if mobil is None:
+            raise KeyError(mobil_id)
+        return float(mobil["harga"]), is_bekas(mobil)
+
+    def hitung(self, mobil_id: int, dp: float) -> List[Dict]:
+        """
+        Menghitung cicilan satu mobil untuk DP tertentu di semua tenor
+
+        Dipakai untuk DP yang tidak ada di DP_LEVELS (misalnya DP nominal),
+        dan untuk semua DP jika matriks tidak dibangun (precompute=False).
+
+        Args:
+            mobil_id: Id mobil
+            dp: Rasio DP (0.25 = 25%)
+
+        Returns:
+            List dictionary per tenor (lihat simulasi)
+        """
+        harga, bekas = self._car(mobil_id)
+        pokok = harga * (1 - dp)
+        cicilan = np.ceil(pokok * (1 + self.bunga * self.tenor / 12) / self.tenor / ROUND_TO) * ROUND_TO
+        valid = (dp >= self.dp_minimum - 1e-9) & ~(bekas & self.khusus_baru)
+        return self._rows(harga, dp, np.where(valid, cicilan, np.nan))
+
+    def simulasi(self, mobil_id: int, dp: float) -> List[Dict]:
+        """
+        Mengambil baris matriks untuk satu mobil dan satu level DP
+
+        Args:
+            mobil_id: Id mobil
+            dp: Rasio DP (harus salah satu DP_LEVELS, selain itu dihitung ulang)
+
+        Returns:
+            List dictionary per tenor: tenor, bunga, dp_minimum, dp, cicilan (None jika tidak tersedia)
+        """
+        matches = np.flatnonzero(np.isclose(self.dp_levels, dp))
+        row = self.row_by_id.get(mobil_id)
+        if not len(matches) or row is None:
+            return self.hitung(mobil_id, dp)
+        return self._rows(float(self.harga[row]), dp, self.cicilan[row, :, matches[0]])
+
+    def _rows(self, harga: float, dp: float, cicilan: np.ndarray) -> List[Dict]:
+        return [
+            {
+                "tenor": int(self.tenor[col]),
+                "bunga": float(self.bunga[col]),
+                "dp_minimum": float(self.dp_minimum[col]),
+                "dp": dp,
+                "uang_muka": int(round(harga * dp)),
+                "cicilan": None if np.isnan(cicilan[col]) else int(cicilan[col]),
+            }
+            for col in range(len(self.tenor))
+        ]
+
+
+def _parse_dp(lowered: str) -> Tuple[Optional[float], Optional[int], Optional[str]]:
+    # (rasio, nominal, teks DP yang tidak terbaca); semua None jika DP tidak disebut
+    match = _DP_RE.search(lowered)
+    if not match:
+        return None, None, None
+
+    number, unit = match.group(1), match.group(2)
+    if unit in ("%", "persen"):
+        return parse_percent(number), None, None
+    if unit is not None:
+        multiplier = 1_000_000 if unit in ("jt", "juta") else 1_000
+        return None, int(float(number.replace(",", ".")) * multiplier), None
+
+    # Tanpa satuan: "dp 0" berarti tanpa uang muka, angka besar berarti rupiah penuh
+    amount = int(re.sub(r"[.,]", "", number))
+    if amount == 0:
+        return 0.0, None, None
+    if amount >= MIN_DP_AMOUNT:
+        return None, amount, None
+    # "dp 30" bisa berarti 30% atau 30 juta
+    return None, None, match.group(0).strip()
+
+
+def parse_financing_request(text: str) -> Tuple[Optional[float], Optional[int], Optional[int]]:
+    """
+    Mengambil DP dan tenor yang diminta user dari pertanyaan
+
+    Contoh: "dp 30% 48 bulan", "uang muka 50 juta tenor 3 tahun",
+    "dp 0", "dp 50.000.000 tenor 4"
+
+    Args:
+        text: Pertanyaan user
+
+    Returns:
+        Tuple (dp_persen sebagai rasio, dp_nominal rupiah, tenor_bulan), None jika tidak disebut
+    """
+    lowered = text.lower()
+    dp_ratio, dp_amount, _ = _parse_dp(lowered)
+
+    tenor = None
+    match = _TENOR_RE.search(lowered)
+    if match:
+        tenor = int(match.group(1)) * (12 if match.group(2) in ("tahun", "thn") else 1)
+    else:
+        match = _TENOR_BARE_RE.search(lowered)
+        if match:
+            value = int(match.group(1))
+            tenor = value * 12 if value <= MAX_TENOR_YEARS else value
+
+    return dp_ratio, dp_amount, tenor
+
+
+def unparsed_dp_text(text: str) -> Optional[str]:
+    """
+    Teks DP yang disebut user tetapi tidak bisa dibaca sebagai persen atau nominal
+
+    Contoh: "dp 30" (tanpa % atau satuan, bisa 30% atau 30 juta)
+
+    Args:
+        text: Pertanyaan user
+
+    Returns:
+        Potongan teks DP, atau None jika DP terbaca / tidak disebut
+    """
+    return _parse_dp(text.lower())[2]
+
+
+# Cache matriks per versi (daftar_mobil, paket_pembiayaan), dipakai bersama semua session
+_MATRIX_CACHE: Dict[str, FinancingMatrix] = {}
+_MATRIX_CACHE_LOCK = threading.Lock()
+
+
+def get_financing_matrix(daftar_mobil: List[Dict], paket_pembiayaan: List[Dict]) -> FinancingMatrix:
+    """
+    Mengambil FinancingMatrix (dihitung ulang hanya jika mobil atau paket berubah)
+
+    Args:
+        daftar_mobil: List dari semua mobil
+        paket_pembiayaan: List paket kredit
+
+    Returns:
+        FinancingMatrix siap pakai
+    """
+    version = get_data_version(daftar_mobil) + get_data_version(paket_pembiayaan)
+
+    matrix = _MATRIX_CACHE.get(version)
+    if matrix is not None:
+        return matrix
+
+    # Inventori SQLite tidak dimuat seluruhnya; cicilan dihitung per mobil yang ditanyakan
+    matrix = FinancingMatrix(daftar_mobil, paket_pembiayaan, precompute=isinstance(daftar_mobil, (list, tuple)))
+    with _MATRIX_CACHE_LOCK:
+        _MATRIX_CACHE.clear()
+        _MATRIX_CACHE[version] = matrix
+
+    return matrix
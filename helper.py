@@ -2,8 +2,39 @@
 helper.py - Fungsi-fungsi helper untuk chatbot dengan Multi-Model Fallback
 """
 
+import asyncio
+import hashlib
+import threading
+import time
+
 import google.generativeai as genai
-from typing import List, Dict, Any, Tuple
+from datetime import timedelta
+from google.generativeai import caching
+from typing import List, Dict, Any, Tuple, Optional, Iterator, AsyncIterator, Callable, Union
+
+from async_runtime import ASYNC_RUNNER
+from catalog import CarFilter, get_catalog_index, parse_filter_query, tokenize
+from data import get_data_version
+from financing import DEFAULT_DISPLAY_DP, SIMULATION_KEYWORDS, get_financing_matrix, parse_financing_request, parse_tenor, unparsed_dp_text
+from intent import car_name_candidates, classify_intent
+from conversation import compact_text
+from model_health import MODEL_HEALTH, classify_error
+from rate_limit import RATE_LIMITER, QueueTicket
+from prompt_builder import PromptBuilder, estimate_tokens, truncate_to_tokens
+from rendering import CarFragments, CatalogRenderer, format_currency, get_catalog_renderer, get_memory_renderer, get_section_text, render_promosi
+from response_cache import RESPONSE_CACHE
+from retrieval import retrieve_context
+from telemetry import (
+    FALLBACK_DEPTH,
+    MODEL_ATTEMPTS,
+    PROMPT_TOKENS,
+    REQUEST_SECONDS,
+    RESPONSES,
+    STAGE_SECONDS,
+    get_logger,
+)
+
+log = get_logger("helper")
 
 # Daftar model Gemini (fallback)
 GEMINI_MODELS = [
@@ -13,22 +44,77 @@ GEMINI_MODELS = [
     'gemini-3-pro',
 ]
 
-def format_currency(amount: int) -> str:
-    """
-    Format angka menjadi currency Rupiah
-    
-    Args:
-        amount: Jumlah dalam rupiah
-        
-    Returns:
-        String dengan format Rp X.XXX.XXX
-    """
-    return f"Rp {amount:,.0f}".replace(",", ".")
+# Cache system prompt, dipakai bersama oleh semua session Streamlit dalam satu proses
+# Key: (jenis prompt, versi data showroom) -> prompt yang sudah jadi
+_PROMPT_CACHE: Dict[Tuple[str, str], str] = {}
+_PROMPT_CACHE_LOCK = threading.Lock()
+_PROMPT_CACHE_MAX_ENTRIES = 8
+
+# Retrieval-augmented prompt: hanya mobil/promo/paket yang relevan yang dimasukkan ke prompt
+RETRIEVAL_PROMPT = True
+RETRIEVAL_TOP_K = 5
+
+# Jumlah mobil yang ditampilkan di daftar mobil untuk inventori SQLite (halaman pertama saja)
+SQLITE_LIST_LIMIT = 50
+
+# Batas ukuran prompt (estimasi token) agar latency dan biaya per request bisa diprediksi
+PROMPT_TOKEN_BUDGET = 3000
+
+# Pesan user yang sangat panjang (misalnya hasil paste) dipotong sampai batas ini
+MAX_USER_MESSAGE_TOKENS = 800
+
+# Kirim system instruction + giliran chat terstruktur (False = satu prompt teks panjang)
+NATIVE_CHAT = True
+
+# Context caching: system instruction yang besar di-upload sekali lalu dipakai ulang per model.
+# Gemini menolak cache di bawah batas minimal token (2.5 Flash: 1024, Pro: 2048), jadi
+# prompt yang lebih kecil langsung dikirim sebagai system instruction biasa.
+CONTEXT_CACHING = True
+CONTEXT_CACHE_MIN_TOKENS = 1024
+CONTEXT_CACHE_TTL = 3600
+CONTEXT_CACHE_RETRY = 600  # Jeda sebelum mencoba membuat cache lagi setelah gagal
+
+# Batas waktu (detik) satu request ke model; untuk streaming berlaku per potongan jawaban
+GEMINI_REQUEST_TIMEOUT = 60.0
 
+# Batas waktu per model (model pro "berpikir" lebih lama), model lain memakai GEMINI_REQUEST_TIMEOUT
+MODEL_TIMEOUTS = {
+    'gemini-2.5-flash': 20.0,
+    'gemini-2.5-flash-lite': 12.0,
+    'gemini-2.5-pro': 40.0,
+    'gemini-3-pro': 40.0,
+}
+
+# Batas total waktu tunggu user (antrian + semua percobaan model, sampai token pertama untuk streaming).
+# Jika habis, model tidak dicoba lagi dan user dijawab dari data lokal.
+RESPONSE_LATENCY_BUDGET = 30.0
+
+# Percobaan model baru tidak dimulai jika sisa budget kurang dari ini (detik)
+MIN_ATTEMPT_TIME = 3.0
+
+# Parameter generate default untuk semua model
+GENERATION_SETTINGS = {
+    "max_output_tokens": 3000,
+    "temperature": 0.7,
+    "top_p": 0.95,
+}
+
+# Pool instance GenerativeModel, dibuat sekali per proses dan dipakai bersama semua session
+# Key: (nama model, parameter generate)
+_MODEL_POOL: Dict[Tuple, Any] = {}
+_MODEL_POOL_LOCK = threading.Lock()
+_SAFETY_SETTINGS: Optional[List[Dict]] = None
+
+# Model dari context cache per (nama model, hash system instruction) -> (model atau None, berlaku sampai)
+_CONTEXT_CACHE: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+_CONTEXT_CACHE_LOCK = threading.Lock()
 
 def search_mobil(keyword: str, daftar_mobil: List[Dict]) -> List[Dict]:
     """
-    Mencari mobil berdasarkan keyword (merek atau model)
+    Mencari mobil berdasarkan keyword (merek, model, atau kategori)
+    
+    Pencarian memakai CatalogIndex yang dibangun sekali per versi katalog,
+    mendukung prefix ("ava") dan typo ringan ("avansa").
     
     Args:
         keyword: Kata kunci pencarian
@@ -37,41 +123,31 @@ def search_mobil(keyword: str, daftar_mobil: List[Dict]) -> List[Dict]:
     Returns:
         List mobil yang cocok dengan keyword
     """
-    keyword = keyword.lower()
-    hasil = []
-    
-    for mobil in daftar_mobil:
-        if (keyword in mobil['merek'].lower() or 
-            keyword in mobil['model'].lower() or
-            keyword in mobil['kategori'].lower()):
-            hasil.append(mobil)
-    
-    return hasil
+    return get_catalog_index(daftar_mobil).search(keyword)
 
 
-def format_mobil_info(mobil: Dict) -> str:
+def format_mobil_info(mobil: Dict, renderer: Optional[CatalogRenderer] = None) -> str:
     """
     Format informasi mobil menjadi string yang readable
     
     Args:
         mobil: Dictionary berisi data mobil
+        renderer: Renderer katalog (harga/cicilan sudah diformat), None = format langsung
         
     Returns:
         String berisi informasi mobil yang diformat
     """
-    info = f"""
-🚗 **{mobil['merek']} {mobil['model']}** ({mobil['tahun']})
-
-Spesifikasi: {mobil['spesifikasi']}
-Harga: {format_currency(mobil['harga'])}
-Cicilan: {format_currency(mobil['cicilan'])}/bulan (36 bulan)
-"""
-    return info.strip()
+    fragments = renderer.fragment(mobil) if renderer is not None else CarFragments(mobil)
+    return fragments.info(mobil)
 
 
 def format_daftar_mobil(daftar_mobil: List[Dict]) -> str:
     """
-    Format daftar mobil menjadi string yang readable
+    Format daftar mobil per kategori menjadi string yang readable
+    
+    Teks disusun sekali per versi katalog (lihat rendering.CatalogRenderer);
+    panggilan berikutnya untuk katalog yang sama hanya mengambil hasil cache.
+    Inventori SQLite hanya ditampilkan halaman pertamanya (SQLITE_LIST_LIMIT mobil).
     
     Args:
         daftar_mobil: List dari semua mobil
@@ -79,24 +155,18 @@ def format_daftar_mobil(daftar_mobil: List[Dict]) -> str:
     Returns:
         String berisi daftar mobil yang diformat
     """
-    text = "📋 **DAFTAR MOBIL KAMI:**\n\n"
-    
-    # Kelompokkan berdasarkan kategori
-    kategori_dict = {}
-    for mobil in daftar_mobil:
-        cat = mobil['kategori']
-        if cat not in kategori_dict:
-            kategori_dict[cat] = []
-        kategori_dict[cat].append(mobil)
+    renderer = get_memory_renderer(daftar_mobil)
+    if renderer is not None:
+        return renderer.render_list()
     
-    # Format per kategori
-    for kategori, mobils in kategori_dict.items():
-        text += f"**{kategori}:**\n"
-        for i, mobil in enumerate(mobils, 1):
-            text += f"{i}. {mobil['merek']} {mobil['model']} ({mobil['tahun']}) - {format_currency(mobil['harga'])}\n"
-        text += "\n"
-    
-    return text.strip()
+    page = daftar_mobil[:SQLITE_LIST_LIMIT]
+    text = CatalogRenderer(page).render_list()
+    if len(page) < len(daftar_mobil):
+        text += (
+            f"\n\n_Menampilkan {len(page)} dari {len(daftar_mobil)} mobil. "
+            "Sebutkan kategori, merek, atau budget untuk melihat pilihan lainnya._"
+        )
+    return text
 
 
 def format_promosi(promosi: List[Dict]) -> str:
@@ -109,13 +179,7 @@ def format_promosi(promosi: List[Dict]) -> str:
     Returns:
         String berisi daftar promosi
     """
-    text = "🎉 **PROMOSI SPESIAL BULAN INI:**\n\n"
-    
-    for i, promo in enumerate(promosi, 1):
-        text += f"{i}. **{promo['judul']}**\n   {promo['deskripsi']}\n\n"
-    
-    text += "⏰ *Tawaran terbatas! Jangan lewatkan kesempatan ini.* 🚗"
-    return text.strip()
+    return get_section_text("promosi", promosi, render_promosi)
 
 
 def format_jam_operasional(jam_operasional: Dict) -> str:
@@ -158,289 +222,1666 @@ def format_kontak(showroom_data: Dict) -> str:
     return text.strip()
 
 
-def create_system_prompt(showroom_data: Dict) -> str:
+def format_ringkasan_katalog(daftar_mobil: List[Dict]) -> str:
     """
-    Membuat system prompt untuk Gemini dengan konteks showroom
+    Format ringkasan katalog per kategori (jumlah, rentang harga, termurah)
     
     Args:
-        showroom_data: Dictionary berisi data showroom
+        daftar_mobil: List dari semua mobil
         
     Returns:
-        String berisi system prompt
+        String berisi ringkasan katalog
     """
+    # Ringkasan dihitung sekali per versi katalog (GROUP BY di SQLite untuk inventori besar)
+    index = get_catalog_index(daftar_mobil)
     
-    daftar_mobil_str = format_daftar_mobil(showroom_data['daftar_mobil'])
+    lines = [f"📋 **RINGKASAN KATALOG ({len(daftar_mobil)} mobil):**", ""]
+    for entry in index.category_summary():
+        termurah = entry['termurah']
+        lines.append(
+            f"- {entry['kategori']}: {entry['jumlah']} mobil, {format_currency(termurah['harga'])} - {format_currency(entry['harga_max'])} "
+            f"(termurah: {termurah['merek']} {termurah['model']})"
+        )
     
-    prompt = f"""Anda adalah assistant customer service untuk {showroom_data['nama']}.
-
-INFORMASI SHOWROOM:
-- Nama: {showroom_data['nama']}
-- Alamat: {showroom_data['alamat']}
-- WhatsApp: {showroom_data['whatsapp']}
-- Instagram: {showroom_data.get('instagram', 'N/A')}
-- Email: {showroom_data['email']}
-- Website: {showroom_data['website']}
+    lines.append("")
+    lines.append(f"Merek tersedia: {', '.join(sorted(index.labels[merek] for merek in index.by_merek))}")
+    return "\n".join(lines)
 
-JAM OPERASIONAL:
-{format_jam_operasional(showroom_data['jam_operasional'])}
 
-{daftar_mobil_str}
+def format_paket_pembiayaan(paket_pembiayaan: List[Dict]) -> str:
+    """
+    Format paket pembiayaan menjadi string
+    
+    Args:
+        paket_pembiayaan: List paket kredit
+        
+    Returns:
+        String berisi daftar paket pembiayaan
+    """
+    text = "💳 **PAKET PEMBIAYAAN:**\n\n"
+    
+    for paket in paket_pembiayaan:
+        text += f"- {paket['tenor']}: bunga {paket['bunga']}, DP minimal {paket['dp_minimum']} ({paket['catatan']})\n"
+    
+    return text.strip()
 
-PROMOSI AKTIF:
-{format_promosi(showroom_data['promosi'])}
 
-LAYANAN:
-{', '.join(showroom_data['layanan'])}
+def format_hasil_filter(hasil: List[Dict], deskripsi: str, total: int, renderer: Optional[CatalogRenderer] = None) -> str:
+    """
+    Format hasil filter mobil (harga, cicilan, kategori, dll) menjadi string
+    
+    Args:
+        hasil: List mobil yang ditampilkan (sudah diurutkan)
+        deskripsi: Deskripsi filter (CarFilter.describe)
+        total: Jumlah seluruh mobil yang cocok
+        renderer: Renderer katalog (harga/cicilan sudah diformat), None = format langsung
+        
+    Returns:
+        String berisi daftar mobil yang cocok
+    """
+    judul = f"🔎 **Mobil dengan {deskripsi}:**" if deskripsi else "🔎 **Pilihan mobil untuk Anda:**"
+    
+    if not hasil:
+        return (
+            f"{judul}\n\nMaaf, saat ini belum ada mobil yang sesuai kriteria tersebut. 🙏\n\n"
+            "💬 Coba longgarkan kriteria (misalnya budget atau kategori), atau hubungi tim sales kami "
+            "untuk info unit yang akan datang!"
+        )
+    
+    lines = [judul, ""]
+    for i, mobil in enumerate(hasil, 1):
+        fragments = renderer.fragment(mobil) if renderer is not None else CarFragments(mobil)
+        lines.append(f"{i}. {fragments.filter_line()}")
+    
+    if total > len(hasil):
+        lines.append(f"\n...dan {total - len(hasil)} mobil lainnya.")
+    
+    lines.append("\n💬 Mau info detail atau jadwalkan test drive? Hubungi kami atau kunjungi showroom! 🚗")
+    return "\n".join(lines)
 
-PETUNJUK:
-1. Jawab sederhana dan informatif dengan memberikan sedikit detail(maksimal 3-5 point penting)
-2. Hindari penjelasan panjang yang tidak perlu
-3. Jika menggunakan list atau angka, tampilkan hanya TOP 5-10 paling relevan
-4. Gunakan Emoji yang relevan untuk membuat percakapan lebih hidup
-5. Jika ada pertanyaan khusus, sarankan customer untuk menghubungi showroom
-6. Selalu berakhir dengan ajakan untuk menghubungi atau berkunjung
-7. Gunakan Bahasa Indonesia yang baik dan profesional
 
-"""
-    
-    return prompt
+def format_persen(ratio: float) -> str:
+    """Format rasio (0.048) menjadi teks persen ("4.8%")"""
+    return f"{round(ratio * 100, 1):g}%"
 
 
-def get_safety_settings() -> List[Dict]:
+def format_simulasi_kredit(mobil: Dict, simulasi: List[List[Dict]], tenor: Optional[int] = None) -> str:
     """
-    Mendapatkan safety settings yang optimal untuk Gemini
+    Format tabel simulasi cicilan satu mobil
     
+    Args:
+        mobil: Dictionary data mobil
+        simulasi: List baris simulasi per DP (hasil FinancingMatrix.simulasi)
+        tenor: Tenor yang diminta user (ditandai), None jika tidak disebut
+        
     Returns:
-        List of safety settings configuration
+        String tabel markdown (tenor x DP)
     """
-    return [
-        {
-            "category": genai.types.HarmCategory.HARM_CATEGORY_HARASSMENT,
-            "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        },
-        {
-            "category": genai.types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-            "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        },
-        {
-            "category": genai.types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-            "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        },
-        {
-            "category": genai.types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-            "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        },
+    header = "| Tenor | Bunga/thn | " + " | ".join(
+        f"DP {format_persen(rows[0]['dp'])} ({format_currency(rows[0]['uang_muka'])})" for rows in simulasi
+    ) + " |"
+    lines = [
+        f"💳 **Simulasi Kredit {mobil['merek']} {mobil['model']}** ({format_currency(mobil['harga'])})",
+        "",
+        header,
+        "|" + " --- |" * (len(simulasi) + 2),
     ]
+    
+    for col, row in enumerate(simulasi[0]):
+        label = f"{row['tenor']} bulan"
+        if row['tenor'] == tenor:
+            label = f"**➡️ {label}**"
+        cells = [
+            format_currency(rows[col]['cicilan']) if rows[col]['cicilan'] is not None
+            else f"min. DP {format_persen(rows[col]['dp_minimum'])}" if rows[col]['dp'] < rows[col]['dp_minimum']
+            else "khusus mobil baru"
+            for rows in simulasi
+        ]
+        lines.append(f"| {label} | {format_persen(row['bunga'])} | " + " | ".join(cells) + " |")
+    
+    return "\n".join(lines)
 
 
-def try_gemini_model(model_name: str, prompt: str, showroom_data: Dict) -> Tuple[bool, str]:
+def format_simulasi_ringkas(mobil: Dict, simulasi: List[List[Dict]]) -> str:
     """
-    Mencoba menggunakan satu model Gemini tertentu
+    Format simulasi cicilan satu mobil dalam satu baris per DP (untuk prompt model)
     
     Args:
-        model_name: Nama model yang akan dicoba
-        prompt: Prompt untuk dikirim ke model
-        showroom_data: Data showroom (untuk error handling)
+        mobil: Dictionary data mobil
+        simulasi: List baris simulasi per DP (hasil FinancingMatrix.simulasi)
         
     Returns:
-        Tuple (success: bool, response: str)
+        String simulasi ringkas
     """
-    try:
-        print(f"[DEBUG] 🔄 Mencoba model: {model_name}...")
-        
-        # Buat instance model
-        model = genai.GenerativeModel(
-            model_name,
-            safety_settings=get_safety_settings()
-        )
-        
-        # Generate content
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=3000,
-                temperature=0.7,
-                top_p=0.95,
-            )
+    lines = [f"- {mobil['merek']} {mobil['model']} ({format_currency(mobil['harga'])}):"]
+    for rows in simulasi:
+        cicilan = " | ".join(
+            f"{row['tenor']} bln {format_currency(row['cicilan'])}" for row in rows if row['cicilan'] is not None
         )
-        
-        print(f"[DEBUG] ✅ Model {model_name} berhasil!")
-        print(f"[DEBUG] Response length: {len(response.text)} characters")
-        
-        return True, response.text.strip()
+        lines.append(f"  DP {format_persen(rows[0]['dp'])} ({format_currency(rows[0]['uang_muka'])}): {cicilan or 'tidak tersedia'}")
+    return "\n".join(lines)
+
+
+def answer_filter_query(user_message: str, showroom_data: Dict, limit: int = 10) -> Optional[str]:
+    """
+    Menjawab pertanyaan filter murni (harga/cicilan/tahun/kategori) langsung dari katalog
     
-    except ValueError as ve:
-        error_msg = str(ve)
-        print(f"[DEBUG] ⚠️ ValueError pada model {model_name}: {error_msg[:100]}")
-        return False, error_msg
+    Contoh: "SUV di bawah 300 juta", "cicilan di bawah 6 juta", "mobil termurah"
     
-    except TypeError as te:
-        error_msg = str(te)
-        print(f"[DEBUG] ⚠️ TypeError pada model {model_name}: {error_msg[:100]}")
-        return False, error_msg
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        limit: Jumlah maksimal mobil yang ditampilkan
+        
+    Returns:
+        String jawaban, atau None jika pertanyaan perlu dijawab oleh model
+    """
+    index = get_catalog_index(showroom_data['daftar_mobil'])
+    car_filter = parse_filter_query(user_message, index)
     
-    except Exception as e:
-        error_msg = str(e)
-        print(f"[DEBUG] ⚠️ Error pada model {model_name}: {type(e).__name__} - {error_msg[:100]}")
-        return False, error_msg
+    if not car_filter.is_pure:
+        return None
+    
+    hasil = index.filter(car_filter, limit=limit)
+    return format_hasil_filter(hasil, car_filter.describe(index.labels), index.count(car_filter), get_memory_renderer(showroom_data['daftar_mobil']))
 
 
-def get_response_from_gemini(user_message: str, showroom_data: Dict, conversation_history: List[Dict]) -> str:
+def get_simulasi_kredit(user_message: str, showroom_data: Dict, mobil: List[Dict]) -> List[Tuple[Dict, List[List[Dict]], Optional[int]]]:
     """
-    Mendapatkan response dari Google Gemini API dengan multi-model fallback
+    Mengambil simulasi cicilan dari matriks pembiayaan untuk mobil yang ditanyakan
     
-    Strategi:
-    1. Coba 8 model Gemini secara berurutan (dari terbaru ke lebih lama)
-    2. Jika satu model gagal, otomatis try model berikutnya
-    3. Jika semua gagal, return error message yang informatif
+    DP dan tenor diambil dari pesan user ("dp 30%", "dp 50 juta", "48 bulan");
+    jika DP tidak disebut, dipakai DEFAULT_DISPLAY_DP.
     
     Args:
         user_message: Pesan dari user
         showroom_data: Dictionary berisi data showroom
-        conversation_history: History percakapan sebelumnya
+        mobil: List mobil yang disimulasikan
         
     Returns:
-        Response dari Gemini atau error message
+        List tuple (mobil, simulasi per DP, tenor yang diminta)
     """
+    matrix = get_financing_matrix(showroom_data['daftar_mobil'], showroom_data['paket_pembiayaan'])
+    dp_ratio, dp_amount, tenor = parse_financing_request(user_message)
     
-    try:
-        print("\n" + "="*80)
-        print("[DEBUG] 🚀 MEMULAI GEMINI REQUEST")
-        print(f"[DEBUG] User message: {user_message[:100]}...")
-        print(f"[DEBUG] Conversation history: {len(conversation_history)} messages")
-        
-        # Buat system prompt dengan konteks showroom
-        system_prompt = create_system_prompt(showroom_data)
-        
-        # Siapkan conversation context
-        conversation_text = system_prompt + "\n\n--- CONVERSATION HISTORY ---\n"
-        
-        # Tambahkan conversation history (max 5 pesan terakhir untuk efficiency)
-        for msg in conversation_history[-5:]:
-            role = "👤 User" if msg["role"] == "user" else "🤖 Assistant"
-            conversation_text += f"{role}: {msg['content']}\n"
-        
-        # Tambahkan user message terbaru
-        full_prompt = conversation_text + f"\n👤 User: {user_message}\n\nJawab dalam Bahasa Indonesia dengan ramah dan profesional:"
-        
-        print(f"[DEBUG] Full prompt length: {len(full_prompt)} characters")
-        print("[DEBUG] 📋 Daftar model yang akan dicoba:")
-        for i, model in enumerate(GEMINI_MODELS, 1):
-            print(f"       {i}. {model}")
-        print("-"*80)
-        
-        # Coba setiap model secara berurutan (fallback strategy)
-        for idx, model_name in enumerate(GEMINI_MODELS, 1):
-            print(f"\n[DEBUG] Attempt {idx}/{len(GEMINI_MODELS)}")
-            success, response = try_gemini_model(model_name, full_prompt, showroom_data)
-            
-            if success:
-                print(f"[DEBUG] 🎉 SUCCESS! Berhasil menggunakan model: {model_name}")
-                print("="*80 + "\n")
-                return response
-        
-        # Jika semua model gagal
-        print("[DEBUG] ❌ Semua model gagal dicoba!")
-        print("="*80 + "\n")
-        
-        return f"""😔 **Maaf, layanan chatbot sedang tidak dapat diakses.**
+    hasil = []
+    for m in mobil:
+        if dp_amount is not None:
+            dp_levels = [min(dp_amount / m['harga'], 1.0)]
+        elif dp_ratio is not None:
+            dp_levels = [dp_ratio]
+        else:
+            dp_levels = list(DEFAULT_DISPLAY_DP)
+        hasil.append((m, [matrix.simulasi(m['id'], dp) for dp in dp_levels], tenor))
+    return hasil
 
-**Yang terjadi:** Sistem tidak dapat memproses pertanyaan Anda saat ini.
 
-**Yang bisa Anda lakukan:**
-1. ⏳ Tunggu beberapa saat dan coba lagi
-2. 🔄 Refresh halaman browser Anda
-3. 🌐 Pastikan koneksi internet Anda stabil
+def get_catatan_kredit(user_message: str, showroom_data: Dict) -> List[str]:
+    """
+    Catatan untuk DP/tenor yang disebut user tetapi tidak bisa dipakai di simulasi
+    
+    Contoh: "dp 30" (tanpa % atau satuan), "tenor 30 bulan" (tidak ada di paket)
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        List catatan (kosong jika semua DP/tenor terbaca)
+    """
+    catatan = []
+    dp_text = unparsed_dp_text(user_message)
+    if dp_text:
+        default_dp = " & ".join(format_persen(dp) for dp in DEFAULT_DISPLAY_DP)
+        catatan.append(
+            f"\"{dp_text}\" belum bisa kami baca sebagai DP, simulasi memakai DP {default_dp}. "
+            "Tulis misalnya \"DP 30%\" atau \"DP 50 juta\"."
+        )
+    tenor = parse_financing_request(user_message)[2]
+    tersedia = [parse_tenor(paket['tenor']) for paket in showroom_data['paket_pembiayaan']]
+    if tenor is not None and tenor not in tersedia:
+        catatan.append(f"Tenor {tenor} bulan tidak ada di paket kami (tersedia: {', '.join(map(str, tersedia))} bulan).")
+    return catatan
 
-Jika masalah berlanjut, silakan hubungi kami langsung:
-📱 WhatsApp: {showroom_data['whatsapp']}
-📧 Email: {showroom_data['email']}
 
-Kami siap membantu Anda! 🚗"""
+def answer_financing_query(user_message: str, showroom_data: Dict, limit: int = 2) -> Optional[str]:
+    """
+    Menjawab pertanyaan simulasi cicilan mobil tertentu langsung dari matriks pembiayaan
     
-    except Exception as e:
-        error_type = type(e).__name__
-        error_msg = str(e)
+    Contoh: "cicilan avanza berapa?", "kredit avanza dp 30% 48 bulan"
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        limit: Jumlah maksimal mobil yang disimulasikan
         
-        print(f"[ERROR] Unhandled {error_type}: {error_msg}")
-        print("="*80 + "\n")
+    Returns:
+        String jawaban, atau None jika pertanyaan perlu dijawab oleh model
+    """
+    if not set(tokenize(user_message)) & SIMULATION_KEYWORDS:
+        return None
+    
+    mobil = get_catalog_index(showroom_data['daftar_mobil']).match_text(user_message, limit=limit)
+    if not mobil:
+        return None
+    
+    tables = [format_simulasi_kredit(m, simulasi, tenor) for m, simulasi, tenor in get_simulasi_kredit(user_message, showroom_data, mobil)]
+    return (
+        "\n\n".join(tables)
+        + "".join(f"\n\n⚠️ {catatan}" for catatan in get_catatan_kredit(user_message, showroom_data))
+        + "\n\n📌 Skema bunga flat per tahun, cicilan dibulatkan ke atas per Rp 1.000. "
+        "Angka final dapat berbeda sesuai persetujuan leasing dan asuransi."
+        + "\n\n💬 Mau ajukan kredit atau coba DP/tenor lain? Hubungi tim sales kami atau kunjungi showroom! 🚗"
+    )
+
+
+def get_local_response(intent: str, showroom_data: Dict) -> Optional[str]:
+    """
+    Menjawab intent sederhana langsung dari data showroom tanpa memanggil Gemini
+    
+    Args:
+        intent: Nama intent (lihat LOCAL_INTENTS)
+        showroom_data: Dictionary berisi data showroom
         
-        # Detect specific error types dan berikan response yang sesuai
-        if "api_key" in error_msg.lower() or "authentication" in error_msg.lower() or "invalid" in error_msg.lower() or "unauthorized" in error_msg.lower():
-            return f"""😔 **Maaf, layanan chatbot sedang mengalami masalah teknis.**
+    Returns:
+        String jawaban, atau None jika intent tidak bisa dijawab secara lokal
+    """
+    renderer = LOCAL_INTENTS.get(intent)
+    if renderer is None:
+        return None
+    return renderer(showroom_data)
 
-**Yang terjadi:** Sistem tidak dapat terhubung dengan layanan AI saat ini.
 
-**Yang bisa Anda lakukan:**
-1. ⏳ Tunggu beberapa saat dan coba lagi
-2. 🔄 Refresh halaman browser Anda
+def _answer_daftar_mobil(showroom_data: Dict) -> str:
+    return (
+        format_daftar_mobil(showroom_data['daftar_mobil'])
+        + "\n\n💬 Tertarik dengan salah satu mobil? Tanyakan detail harga, spesifikasi, "
+        "atau cicilannya, dan kunjungi showroom kami untuk test drive gratis! 🚗"
+    )
 
-Jika masalah berlanjut, silakan hubungi kami:
-📱 WhatsApp: {showroom_data['whatsapp']}
-📧 Email: {showroom_data['email']}
 
-Kami akan segera memperbaikinya! 🚗"""
-        
-        elif "quota" in error_msg.lower() or "rate limit" in error_msg.lower() or "too many" in error_msg.lower() or "resource exhausted" in error_msg.lower():
-            return f"""⏳ **Layanan chatbot sedang sibuk.**
+def _answer_jam_operasional(showroom_data: Dict) -> str:
+    return (
+        format_jam_operasional(showroom_data['jam_operasional'])
+        + f"\n\n📍 Kunjungi kami di {showroom_data['alamat']}"
+    )
 
-**Yang terjadi:** Terlalu banyak pengguna yang menggunakan layanan ini secara bersamaan.
 
-**Yang bisa Anda lakukan:**
-1. ⏰ Tunggu 30 detik - 1 menit, lalu coba lagi
-2. 🔄 Refresh halaman dan kirim ulang pertanyaan Anda
+def _answer_pembiayaan(showroom_data: Dict) -> str:
+    # Contoh simulasi memakai mobil termurah di katalog (array terurut / ORDER BY harga LIMIT 1 di SQLite)
+    matrix = get_financing_matrix(showroom_data['daftar_mobil'], showroom_data['paket_pembiayaan'])
+    termurah = get_catalog_index(showroom_data['daftar_mobil']).filter(CarFilter(), limit=1)[0]
+    simulasi = [matrix.simulasi(termurah['id'], dp) for dp in DEFAULT_DISPLAY_DP]
+    return (
+        format_paket_pembiayaan(showroom_data['paket_pembiayaan'])
+        + "\n\nContoh:\n\n" + format_simulasi_kredit(termurah, simulasi)
+        + "\n\n💬 Ketik misalnya \"simulasi kredit Avanza DP 30% 48 bulan\" untuk menghitung cicilan mobil pilihan Anda! 🚗"
+    )
 
-Atau, jika pertanyaan Anda mendesak, silakan hubungi kami langsung:
-📱 WhatsApp: {showroom_data['whatsapp']}
 
-Kami siap membantu Anda! 🚗"""
-        
-        elif "not found" in error_msg.lower() or "404" in error_msg or "does not exist" in error_msg.lower() or "model not found" in error_msg.lower():
-            return f"""😔 **Maaf, layanan chatbot sedang tidak tersedia.**
+# Intent yang dijawab secara lokal (dipakai oleh tombol Pertanyaan Cepat)
+LOCAL_INTENTS = {
+    "daftar_mobil": _answer_daftar_mobil,
+    "promo": lambda showroom_data: format_promosi(showroom_data['promosi']),
+    "jam_operasional": _answer_jam_operasional,
+    "kontak": format_kontak,
+    "pembiayaan": _answer_pembiayaan,
+}
 
-**Yang terjadi:** Sistem AI sedang mengalami gangguan teknis.
 
-**Yang bisa Anda lakukan:**
-1. ⏳ Tunggu beberapa saat dan coba lagi
-2. 🔄 Refresh halaman browser Anda
+def answer_price_query(user_message: str, showroom_data: Dict, limit: int = 3) -> Optional[str]:
+    """
+    Menjawab pertanyaan harga mobil tertentu langsung dari katalog
 
-Atau hubungi kami langsung untuk bantuan:
-📱 WhatsApp: {showroom_data['whatsapp']}
-📧 Email: {showroom_data['email']}
+    Contoh: "harga avanza berapa?", "brp harga fortuner"
 
-Kami akan segera memperbaikinya! 🚗"""
-        
-        elif "blocked" in error_msg.lower() or "safety" in error_msg.lower():
-            return f"""🤔 **Pertanyaan Anda tidak dapat diproses.**
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        limit: Jumlah maksimal mobil yang ditampilkan
 
-**Yang terjadi:** Sistem tidak dapat memahami atau memproses pertanyaan Anda.
+    Returns:
+        String jawaban, atau None jika tidak ada mobil yang disebut
+    """
+    mobil = get_catalog_index(showroom_data['daftar_mobil']).match_text(user_message, limit=limit)
+    if not mobil:
+        return None
 
-**Yang bisa Anda lakukan:**
-1. 📝 Coba tanyakan dengan kata-kata yang berbeda
-2. 🎯 Fokus pada pertanyaan tentang mobil, harga, promo, atau layanan kami
-3. 💬 Gunakan bahasa yang lebih sederhana dan jelas
+    renderer = get_memory_renderer(showroom_data['daftar_mobil'])
+    return (
+        "\n\n".join(format_mobil_info(m, renderer) for m in mobil)
+        + "\n\n💬 Mau simulasi kredit atau jadwalkan test drive? Tanyakan saja atau kunjungi showroom kami! 🚗"
+    )
 
-**Contoh pertanyaan yang bisa ditanyakan:**
-- "Berapa harga Toyota Avanza?"
-- "Ada promo apa bulan ini?"
-- "Jam operasional showroom?"
-- "Bagaimana cara menghubungi showroom?"
 
-Jika masih mengalami masalah, hubungi kami:
-📱 WhatsApp: {showroom_data['whatsapp']}"""
-        
-        else:
-            return f"""😔 **Maaf, terjadi kesalahan saat memproses pertanyaan Anda.**
+def _needs_model(user_message: str, catalog_index) -> bool:
+    # Mobil yang tidak ada di katalog ("cicilan xpander") tidak boleh dijawab dengan data mobil lain
+    if any(not catalog_index.match_text(token, limit=1) for token in car_name_candidates(user_message)):
+        return True
 
-**Yang terjadi:** Sistem mengalami gangguan saat ini.
+    # Mobil yang disebut bertentangan dengan kualifier ("avanza bekas", "fortuner 2019");
+    # nominal tidak diperiksa karena bisa berupa DP atau cicilan yang diminta
+    car_filter = parse_filter_query(user_message, catalog_index)
+    car_filter.harga_min = car_filter.harga_max = car_filter.cicilan_min = car_filter.cicilan_max = None
+    if car_filter.is_empty:
+        return False
+    named = catalog_index.match_text(user_message, limit=5, ignore=car_filter.terms)
+    return bool(named) and not any(car_filter.matches(m) for m in named)
 
-**Yang bisa Anda lakukan:**
-1. 🔄 Refresh halaman browser Anda
-2. 🌐 Pastikan koneksi internet Anda stabil
-3. ⏳ Tunggu 1-2 menit dan coba lagi
 
-Jika masalah berlanjut, silakan hubungi kami langsung:
-📱 WhatsApp: {showroom_data['whatsapp']}
-📧 Email: {showroom_data['email']}
+def route_local_answer(
+    user_message: str,
+    showroom_data: Dict,
+    classify: bool = True,
+    conversation_history: Optional[List[Dict]] = None,
+) -> Tuple[Optional[str], str]:
+    """
+    Mencoba menjawab pesan chat tanpa Gemini
+
+    Urutan: filter katalog, simulasi cicilan, lalu intent dari classifier
+    offline (intent.py). Pesan dengan intent "open" atau intent yang datanya
+    tidak cukup dikembalikan ke model, misalnya harga tanpa nama mobil,
+    mobil yang tidak ada di katalog, mobil yang tidak cocok dengan kualifier
+    ("harga avanza bekas"), paket kredit umum padahal user menyebut DP atau
+    tenor, atau jawaban umum (katalog, promo, kontak, paket kredit) untuk
+    pertanyaan tentang mobil tertentu.
+
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        classify: False = hanya filter dan simulasi cicilan (tanpa classifier)
+        conversation_history: History percakapan sebelumnya (pesan lanjutan
+            yang merujuk konteks dikirim ke model)
+
+    Returns:
+        Tuple (jawaban atau None, sumber jawaban: filter / financing / intent / "")
+    """
+    response = answer_filter_query(user_message, showroom_data)
+    if response is not None:
+        return response, "filter"
+
+    catalog_index = get_catalog_index(showroom_data['daftar_mobil'])
+    if _needs_model(user_message, catalog_index):
+        return None, ""
+
+    response = answer_financing_query(user_message, showroom_data)
+    if response is not None:
+        return response, "financing"
+
+    if not classify:
+        return None, ""
+
+    # History selalu diawali sapaan asisten; pesan lanjutan berarti sudah ada pesan user sebelumnya
+    follow_up = any(msg["role"] == "user" for msg in conversation_history or ())
+    result = classify_intent(user_message, follow_up=follow_up)
+    if not result.is_local:
+        return None, ""
+
+    if result.intent == "harga":
+        response = answer_price_query(user_message, showroom_data)
+    elif catalog_index.match_text(user_message, limit=1):
+        # Jawaban umum tidak menjawab pertanyaan tentang mobil tertentu ("stok avanza", "promo fortuner")
+        response = None
+    elif result.intent == "pembiayaan" and (
+        any(value is not None for value in parse_financing_request(user_message)) or unparsed_dp_text(user_message)
+    ):
+        # DP/tenor yang disebut user (terbaca atau tidak) tidak terjawab oleh daftar paket umum
+        response = None
+    else:
+        response = get_local_response(result.intent, showroom_data)
+
+    if response is None:
+        return None, ""
+    log.debug("intent_routed", intent=result.intent, confidence=round(result.confidence, 3), decided_by=result.source)
+    return response, "intent"
 
-Kami akan segera membantu Anda! 🚗"""
\ No newline at end of file
+
+def create_system_prompt(showroom_data: Dict) -> str:
+    """
+    Membuat system prompt untuk Gemini dengan konteks showroom
+    
+    Prompt di-cache per versi data showroom, sehingga hanya dibangun ulang
+    jika output get_showroom_data() berubah.
+    
+    Args:
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        String berisi system prompt
+    """
+    return _get_cached_prompt("lengkap", showroom_data, _build_system_prompt)
+
+
+def create_retrieval_base_prompt(showroom_data: Dict) -> str:
+    """
+    Membuat bagian statis system prompt untuk mode retrieval
+    
+    Berisi info showroom dan ringkasan katalog (bukan daftar lengkap);
+    detail mobil/promo/paket yang relevan ditambahkan per pesan.
+    
+    Args:
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        String berisi bagian statis system prompt
+    """
+    return _get_cached_prompt("retrieval", showroom_data, _build_retrieval_base_prompt)
+
+
+def warm_up_caches(showroom_data: Dict):
+    """
+    Membangun cache turunan data showroom (index katalog, matriks pembiayaan, teks katalog, prompt)
+    
+    Dipanggil setelah data di-reload agar request user berikutnya tidak
+    menanggung waktu build. Bagian data yang tidak berubah langsung kena cache.
+    
+    Args:
+        showroom_data: Dictionary berisi data showroom
+    """
+    get_catalog_index(showroom_data['daftar_mobil'])
+    get_financing_matrix(showroom_data['daftar_mobil'], showroom_data['paket_pembiayaan'])
+    renderer = get_memory_renderer(showroom_data['daftar_mobil'])
+    if renderer is not None:
+        # Fragmen per mobil dan daftar lengkap disusun sekarang, bukan saat user pertama bertanya
+        renderer.render_list()
+    format_promosi(showroom_data['promosi'])
+    create_retrieval_base_prompt(showroom_data)
+    if not RETRIEVAL_PROMPT:
+        create_system_prompt(showroom_data)
+
+
+def _get_cached_prompt(kind: str, showroom_data: Dict, builder) -> str:
+    key = (kind, get_data_version(showroom_data))
+    
+    prompt = _PROMPT_CACHE.get(key)
+    if prompt is not None:
+        return prompt
+    
+    prompt = builder(showroom_data)
+    
+    with _PROMPT_CACHE_LOCK:
+        # Versi lama tidak akan dipakai lagi, buang yang paling awal masuk
+        while len(_PROMPT_CACHE) >= _PROMPT_CACHE_MAX_ENTRIES:
+            _PROMPT_CACHE.pop(next(iter(_PROMPT_CACHE)))
+        _PROMPT_CACHE[key] = prompt
+    
+    return prompt
+
+
+def _build_system_prompt(showroom_data: Dict) -> str:
+    """
+    Menyusun system prompt dari data showroom (tanpa cache)
+    
+    Args:
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        String berisi system prompt
+    """
+    
+    daftar_mobil_str = format_daftar_mobil(showroom_data['daftar_mobil'])
+    
+    katalog_str = f"""{daftar_mobil_str}
+
+PROMOSI AKTIF:
+{format_promosi(showroom_data['promosi'])}"""
+    
+    return _compose_system_prompt(showroom_data, katalog_str)
+
+
+def _build_retrieval_base_prompt(showroom_data: Dict) -> str:
+    """
+    Menyusun bagian statis system prompt mode retrieval (tanpa cache)
+    
+    Args:
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        String berisi bagian statis system prompt
+    """
+    return _compose_system_prompt(showroom_data, format_ringkasan_katalog(showroom_data['daftar_mobil']))
+
+
+def _compose_system_prompt(showroom_data: Dict, katalog_str: str) -> str:
+    return f"""Anda adalah assistant customer service untuk {showroom_data['nama']}.
+
+INFORMASI SHOWROOM:
+- Nama: {showroom_data['nama']}
+- Alamat: {showroom_data['alamat']}
+- WhatsApp: {showroom_data['whatsapp']}
+- Instagram: {showroom_data.get('instagram', 'N/A')}
+- Email: {showroom_data['email']}
+- Website: {showroom_data['website']}
+
+JAM OPERASIONAL:
+{format_jam_operasional(showroom_data['jam_operasional'])}
+
+{katalog_str}
+
+LAYANAN:
+{', '.join(showroom_data['layanan'])}
+
+PETUNJUK:
+1. Jawab sederhana dan informatif dengan memberikan sedikit detail(maksimal 3-5 point penting)
+2. Hindari penjelasan panjang yang tidak perlu
+3. Jika menggunakan list atau angka, tampilkan hanya TOP 5-10 paling relevan
+4. Gunakan Emoji yang relevan untuk membuat percakapan lebih hidup
+5. Jika ada pertanyaan khusus, sarankan customer untuk menghubungi showroom
+6. Selalu berakhir dengan ajakan untuk menghubungi atau berkunjung
+7. Gunakan Bahasa Indonesia yang baik dan profesional
+
+"""
+
+
+def get_safety_settings() -> List[Dict]:
+    """
+    Mendapatkan safety settings yang optimal untuk Gemini
+    
+    List dibuat sekali lalu dipakai ulang untuk semua request.
+    
+    Returns:
+        List of safety settings configuration
+    """
+    global _SAFETY_SETTINGS
+    
+    if _SAFETY_SETTINGS is None:
+        _SAFETY_SETTINGS = [
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+            },
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+            },
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+            },
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+            },
+        ]
+    
+    return _SAFETY_SETTINGS
+
+
+def get_gemini_model(model_name: str, system_instruction: Optional[str] = None, **generation_settings: Any):
+    """
+    Mengambil instance GenerativeModel dari pool (dibuat hanya sekali per kombinasi)
+    
+    Instance yang sama dipakai ulang sehingga client/koneksi gRPC bawaan
+    library juga ikut dipakai ulang antar request dan antar session.
+    
+    Args:
+        model_name: Nama model Gemini
+        system_instruction: System instruction statis (None = tanpa)
+        **generation_settings: Override parameter generate (default GENERATION_SETTINGS)
+        
+    Returns:
+        Instance genai.GenerativeModel
+    """
+    settings = {**GENERATION_SETTINGS, **generation_settings}
+    key = (model_name, system_instruction, tuple(sorted(settings.items())))
+    
+    model = _MODEL_POOL.get(key)
+    if model is not None:
+        return model
+    
+    with _MODEL_POOL_LOCK:
+        model = _MODEL_POOL.get(key)
+        if model is None:
+            if system_instruction is not None:
+                # Instance untuk system instruction versi lama tidak dipakai lagi
+                for old_key in [k for k in _MODEL_POOL if k[0] == model_name and k[1] is not None and k[2] == key[2]]:
+                    del _MODEL_POOL[old_key]
+            model = genai.GenerativeModel(
+                model_name,
+                safety_settings=get_safety_settings(),
+                generation_config=genai.types.GenerationConfig(**settings),
+                system_instruction=system_instruction,
+            )
+            _MODEL_POOL[key] = model
+    
+    return model
+
+
+def get_context_cached_model(model_name: str, system_instruction: str):
+    """
+    Mengambil model yang memakai context cache Gemini untuk system instruction
+    
+    Cache dibuat sekali per (model, isi system instruction) dan diperbarui
+    sebelum TTL habis. Jika instruction terlalu kecil untuk di-cache atau
+    pembuatan cache gagal (model/backend tidak mendukung), mengembalikan None
+    dan pemanggil memakai system instruction biasa.
+    
+    Args:
+        model_name: Nama model Gemini
+        system_instruction: System instruction statis
+        
+    Returns:
+        Instance genai.GenerativeModel dari cached content, atau None
+    """
+    if not CONTEXT_CACHING or estimate_tokens(system_instruction) < CONTEXT_CACHE_MIN_TOKENS:
+        return None
+    
+    key = (model_name, hashlib.sha1(system_instruction.encode("utf-8")).hexdigest())
+    entry = _CONTEXT_CACHE.get(key)
+    # Cache diperbarui 60 detik sebelum kedaluwarsa agar request tidak memakai cache yang sudah habis
+    if entry is not None and entry[1] > time.time() + 60:
+        return entry[0]
+    
+    with _CONTEXT_CACHE_LOCK:
+        now = time.time()
+        entry = _CONTEXT_CACHE.get(key)
+        if entry is not None and entry[1] > now + 60:
+            return entry[0]
+        
+        try:
+            cached = caching.CachedContent.create(
+                model=f"models/{model_name}",
+                system_instruction=system_instruction,
+                ttl=timedelta(seconds=CONTEXT_CACHE_TTL),
+            )
+            model = genai.GenerativeModel.from_cached_content(
+                cached,
+                generation_config=genai.types.GenerationConfig(**GENERATION_SETTINGS),
+                safety_settings=get_safety_settings(),
+            )
+            entry = (model, now + CONTEXT_CACHE_TTL)
+            log.info("context_cache_created", model=model_name, cache=cached.name)
+        except Exception as e:
+            log.warning("context_cache_unavailable", model=model_name, error=type(e).__name__, detail=str(e)[:100])
+            entry = (None, now + CONTEXT_CACHE_RETRY)
+        
+        # Buang entry yang sudah kedaluwarsa (versi data lama)
+        for old_key in [k for k, (_, expires) in _CONTEXT_CACHE.items() if expires <= now]:
+            del _CONTEXT_CACHE[old_key]
+        _CONTEXT_CACHE[key] = entry
+    
+    return entry[0]
+
+
+def _resolve_model(model_name: str, prompt: Union[str, "ChatRequest"]) -> Tuple[Any, Any]:
+    # (instance model, contents) untuk prompt teks atau ChatRequest
+    if isinstance(prompt, ChatRequest):
+        model = get_context_cached_model(model_name, prompt.system_instruction)
+        if model is None:
+            model = get_gemini_model(model_name, system_instruction=prompt.system_instruction)
+        return model, prompt.contents
+    
+    return get_gemini_model(model_name), prompt
+
+
+def generate_with_model(model_name: str, prompt: Union[str, "ChatRequest"], stream: bool = False):
+    """
+    Mengirim prompt teks atau ChatRequest ke satu model
+    
+    Args:
+        model_name: Nama model Gemini
+        prompt: Prompt teks (build_prompt) atau ChatRequest (build_chat_request)
+        stream: Minta jawaban secara streaming
+        
+    Returns:
+        Response dari generate_content
+    """
+    model, contents = _resolve_model(model_name, prompt)
+    return model.generate_content(contents, stream=stream)
+
+
+async def generate_with_model_async(model_name: str, prompt: Union[str, "ChatRequest"], stream: bool = False):
+    """
+    Versi async dari generate_with_model (generate_content_async)
+    
+    Returns:
+        Response dari generate_content_async (async iterable jika stream=True)
+    """
+    if isinstance(prompt, ChatRequest) and CONTEXT_CACHING and estimate_tokens(prompt.system_instruction) >= CONTEXT_CACHE_MIN_TOKENS:
+        # Pembuatan context cache memanggil API secara sinkron, jangan blokir event loop
+        model, contents = await asyncio.to_thread(_resolve_model, model_name, prompt)
+    else:
+        model, contents = _resolve_model(model_name, prompt)
+    return await model.generate_content_async(contents, stream=stream)
+
+
+def build_prompt(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    retrieval: bool = RETRIEVAL_PROMPT,
+    conversation_summary: str = "",
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+) -> Tuple[str, Dict]:
+    """
+    Menyusun prompt lengkap dalam batas token: system prompt, history percakapan, dan pesan user
+    
+    Pada mode retrieval, katalog lengkap diganti ringkasan + mobil, promo,
+    dan paket pembiayaan yang relevan dengan pesan (lihat retrieve_context),
+    sehingga ukuran prompt tidak ikut membesar seiring jumlah mobil.
+    
+    Jika melebihi token_budget, yang dikorbankan lebih dulu adalah history
+    lama (diringkas lalu dibuang), lalu ringkasan percakapan, promo, dan
+    paket; instruksi dan pesan user selalu ada (pesan user dipotong jika
+    terlalu panjang).
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        conversation_history: History percakapan sebelumnya
+        retrieval: Pakai retrieval-augmented prompt (False = katalog lengkap)
+        conversation_summary: Ringkasan percakapan lama yang sudah keluar dari history
+        token_budget: Batas estimasi token untuk seluruh prompt
+        
+    Returns:
+        Tuple (prompt, laporan token dari PromptBuilder)
+    """
+    builder = _build_prompt_sections(user_message, showroom_data, conversation_history, retrieval, conversation_summary, token_budget)
+    prompt = builder.build()
+    return prompt, builder.report
+
+
+class ChatRequest:
+    """Request terstruktur untuk Gemini: system instruction statis + giliran chat"""
+    
+    def __init__(self, system_instruction: str, contents: List[Dict], report: Dict):
+        self.system_instruction = system_instruction
+        self.contents = contents
+        self.report = report
+
+
+def build_chat_request(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    retrieval: bool = RETRIEVAL_PROMPT,
+    conversation_summary: str = "",
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+) -> ChatRequest:
+    """
+    Menyusun request chat native Gemini (system_instruction + contents)
+    
+    Instruksi dan info showroom (bagian statis, sama untuk semua pesan pada
+    versi data yang sama) dikirim sebagai system instruction sehingga bisa
+    dipakai ulang lewat context caching. History dikirim sebagai giliran
+    user/model; data yang relevan untuk pesan ini ditempelkan ke giliran
+    user terakhir. Budget token sama dengan build_prompt.
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        conversation_history: History percakapan sebelumnya
+        retrieval: Pakai retrieval-augmented prompt (False = katalog lengkap)
+        conversation_summary: Ringkasan percakapan lama yang sudah keluar dari history
+        token_budget: Batas estimasi token untuk seluruh request
+        
+    Returns:
+        ChatRequest siap dikirim
+    """
+    builder = _build_prompt_sections(user_message, showroom_data, conversation_history, retrieval, conversation_summary, token_budget)
+    builder.build()
+    
+    system_instruction = ""
+    context = []
+    contents = []
+    
+    for section in builder.kept_sections():
+        if section.role == "system":
+            system_instruction = section.text
+        elif section.role == "context":
+            context.append(section.text.strip())
+        elif section.role in ("user", "model", "question"):
+            role = "model" if section.role == "model" else "user"
+            text = section.text
+            if section.role == "question" and context:
+                text = "DATA SHOWROOM UNTUK PERTANYAAN INI:\n" + "\n\n".join(context) + f"\n\nPERTANYAAN: {text}"
+            
+            if contents and contents[-1]["role"] == role:
+                # Giliran dengan role yang sama berturut-turut digabung
+                contents[-1]["parts"][0] += "\n\n" + text
+            elif contents or role == "user":
+                # Percakapan harus diawali giliran user (salam pembuka assistant dilewati)
+                contents.append({"role": role, "parts": [text]})
+    
+    return ChatRequest(system_instruction, contents, builder.report)
+
+
+def prepare_prompt(user_message: str, showroom_data: Dict, conversation_history: List[Dict], conversation_summary: str = "") -> Tuple[Union[str, ChatRequest], Dict]:
+    """
+    Menyusun prompt sesuai mode NATIVE_CHAT (ChatRequest atau satu prompt teks)
+    
+    Returns:
+        Tuple (prompt untuk generate_with_model, laporan token)
+    """
+    with STAGE_SECONDS.time(stage="prompt_build"):
+        if NATIVE_CHAT:
+            request = build_chat_request(user_message, showroom_data, conversation_history, conversation_summary=conversation_summary)
+            prompt, report = request, request.report
+        else:
+            prompt, report = build_prompt(user_message, showroom_data, conversation_history, conversation_summary=conversation_summary)
+    
+    PROMPT_TOKENS.observe(report["tokens"])
+    log.debug("prompt_built", tokens=report["tokens"], budget=report["budget"], shrunk=report["shrunk"])
+    return prompt, report
+
+
+def _build_prompt_sections(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    retrieval: bool,
+    conversation_summary: str,
+    token_budget: int,
+) -> PromptBuilder:
+    builder = PromptBuilder(token_budget)
+    
+    if retrieval:
+        context = retrieve_context(showroom_data, user_message, conversation_history, top_k=RETRIEVAL_TOP_K)
+        builder.add("instruksi", create_retrieval_base_prompt(showroom_data).rstrip(), 0, required=True, role="system")
+        
+        if context['mobil']:
+            renderer = get_memory_renderer(showroom_data['daftar_mobil'])
+            info = [format_mobil_info(mobil, renderer) for mobil in context['mobil']]
+            builder.add(
+                "mobil",
+                "MOBIL YANG RELEVAN:\n" + "\n\n".join(info),
+                1,
+                fallback="MOBIL YANG RELEVAN:\n" + "\n\n".join(info[:2]),
+            )
+        if context['promosi']:
+            builder.add("promosi", "PROMOSI YANG RELEVAN:\n" + format_promosi(context['promosi']), 5, truncatable=True)
+        if context['paket_pembiayaan']:
+            builder.add("paket", format_paket_pembiayaan(context['paket_pembiayaan']), 4)
+            if context['mobil']:
+                # Angka cicilan dihitung sistem, model tidak perlu berhitung sendiri
+                simulasi = get_simulasi_kredit(user_message, showroom_data, context['mobil'][:3])
+                builder.add(
+                    "simulasi",
+                    "SIMULASI CICILAN (hasil hitung sistem, gunakan angka ini apa adanya, jangan menghitung sendiri):\n"
+                    + "\n".join(format_simulasi_ringkas(m, sim) for m, sim, _ in simulasi)
+                    + "".join(f"\nCatatan (sampaikan ke user): {catatan}" for catatan in get_catatan_kredit(user_message, showroom_data)),
+                    1,
+                )
+    else:
+        # Buat system prompt dengan konteks showroom
+        builder.add("instruksi", create_system_prompt(showroom_data).rstrip(), 0, required=True, role="system")
+    
+    if conversation_summary:
+        builder.add("ringkasan", f"--- RINGKASAN PERCAKAPAN SEBELUMNYA ---\n{conversation_summary}", 6, truncatable=True)
+    
+    # History: pesan terbaru paling penting; pesan lama diringkas dulu sebelum dibuang
+    builder.add("history", "--- CONVERSATION HISTORY ---", 0, required=True, suffix="\n", role="header")
+    total = len(conversation_history)
+    for pos, msg in enumerate(conversation_history):
+        is_user = msg["role"] == "user"
+        age = total - 1 - pos
+        builder.add(
+            f"history[-{age + 1}]",
+            msg['content'],
+            (2 if age < 2 else 7) + age,
+            fallback=compact_text(msg['content'], 200),
+            prefix="👤 User: " if is_user else "🤖 Assistant: ",
+            suffix="\n",
+            role="user" if is_user else "model",
+        )
+    
+    if not retrieval:
+        # Detail mobil yang disebut user (spesifikasi & cicilan tidak ada di daftar ringkas)
+        relevant_mobil = get_catalog_index(showroom_data['daftar_mobil']).match_text(user_message, limit=5)
+        if relevant_mobil:
+            renderer = get_memory_renderer(showroom_data['daftar_mobil'])
+            builder.add(
+                "detail_mobil",
+                "\n--- DETAIL MOBIL YANG DITANYAKAN ---\n" + "\n\n".join(format_mobil_info(mobil, renderer) for mobil in relevant_mobil),
+                1,
+                suffix="\n",
+            )
+    
+    # Pesan user terbaru (pesan yang sangat panjang dipotong di tengah)
+    builder.add(
+        "user",
+        truncate_to_tokens(user_message, MAX_USER_MESSAGE_TOKENS, keep_tail=True),
+        0,
+        required=True,
+        truncatable=True,
+        prefix="\n👤 User: ",
+        suffix="\n\nJawab dalam Bahasa Indonesia dengan ramah dan profesional:",
+        role="question",
+    )
+    
+    return builder
+
+
+def get_all_models_failed_message(showroom_data: Dict) -> str:
+    """
+    Pesan untuk user jika semua model Gemini gagal dicoba
+    
+    Args:
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        String pesan error yang informatif
+    """
+    return f"""😔 **Maaf, layanan chatbot sedang tidak dapat diakses.**
+
+**Yang terjadi:** Sistem tidak dapat memproses pertanyaan Anda saat ini.
+
+**Yang bisa Anda lakukan:**
+1. ⏳ Tunggu beberapa saat dan coba lagi
+2. 🔄 Refresh halaman browser Anda
+3. 🌐 Pastikan koneksi internet Anda stabil
+
+Jika masalah berlanjut, silakan hubungi kami langsung:
+📱 WhatsApp: {showroom_data['whatsapp']}
+📧 Email: {showroom_data['email']}
+
+Kami siap membantu Anda! 🚗"""
+
+
+def get_fast_fallback_answer(user_message: str, showroom_data: Dict, data_version: Optional[str] = None) -> str:
+    """
+    Jawaban cepat dari data lokal saat model terlalu lama menjawab
+    
+    Urutan: jawaban tersimpan untuk pertanyaan yang mirip (tanpa melihat
+    konteks percakapan), jawaban filter katalog, simulasi cicilan, lalu
+    info mobil yang disebut di pertanyaan. Selalu diakhiri kontak showroom.
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        data_version: Versi data showroom (None = dihitung)
+        
+    Returns:
+        String jawaban
+    """
+    answer = RESPONSE_CACHE.get(user_message, [], data_version or get_data_version(showroom_data), get_catalog_index(showroom_data['daftar_mobil']))
+    if answer is None:
+        answer = answer_filter_query(user_message, showroom_data) or answer_financing_query(user_message, showroom_data)
+    if answer is None:
+        mobil = get_catalog_index(showroom_data['daftar_mobil']).match_text(user_message, limit=3)
+        if mobil:
+            renderer = get_memory_renderer(showroom_data['daftar_mobil'])
+            answer = "Berikut info mobil yang Anda tanyakan:\n\n" + "\n\n".join(format_mobil_info(m, renderer) for m in mobil)
+    
+    contact = f"📱 WhatsApp: {showroom_data['whatsapp']}\n📧 Email: {showroom_data['email']}"
+    if answer is None:
+        return f"""⏱️ **Maaf, asisten kami sedang sangat sibuk sehingga belum bisa menjawab.**
+
+Silakan coba tanyakan lagi dalam beberapa saat, atau hubungi kami langsung:
+{contact}"""
+    
+    return f"""⏱️ *Asisten AI sedang sibuk, jawaban berikut diambil langsung dari data showroom.*
+
+{answer}
+
+Untuk pertanyaan lebih lanjut, hubungi kami:
+{contact}"""
+
+
+def get_error_message(error_msg: str, showroom_data: Dict) -> str:
+    """
+    Pesan untuk user berdasarkan jenis error yang terjadi
+    
+    Args:
+        error_msg: Pesan error asli
+        showroom_data: Dictionary berisi data showroom
+        
+    Returns:
+        String pesan error yang sesuai dengan jenis error
+    """
+    # Detect specific error types dan berikan response yang sesuai
+    if "api_key" in error_msg.lower() or "authentication" in error_msg.lower() or "invalid" in error_msg.lower() or "unauthorized" in error_msg.lower():
+        return f"""😔 **Maaf, layanan chatbot sedang mengalami masalah teknis.**
+
+**Yang terjadi:** Sistem tidak dapat terhubung dengan layanan AI saat ini.
+
+**Yang bisa Anda lakukan:**
+1. ⏳ Tunggu beberapa saat dan coba lagi
+2. 🔄 Refresh halaman browser Anda
+
+Jika masalah berlanjut, silakan hubungi kami:
+📱 WhatsApp: {showroom_data['whatsapp']}
+📧 Email: {showroom_data['email']}
+
+Kami akan segera memperbaikinya! 🚗"""
+    
+    elif "quota" in error_msg.lower() or "rate limit" in error_msg.lower() or "too many" in error_msg.lower() or "resource exhausted" in error_msg.lower():
+        return f"""⏳ **Layanan chatbot sedang sibuk.**
+
+**Yang terjadi:** Terlalu banyak pengguna yang menggunakan layanan ini secara bersamaan.
+
+**Yang bisa Anda lakukan:**
+1. ⏰ Tunggu 30 detik - 1 menit, lalu coba lagi
+2. 🔄 Refresh halaman dan kirim ulang pertanyaan Anda
+
+Atau, jika pertanyaan Anda mendesak, silakan hubungi kami langsung:
+📱 WhatsApp: {showroom_data['whatsapp']}
+
+Kami siap membantu Anda! 🚗"""
+    
+    elif "not found" in error_msg.lower() or "404" in error_msg or "does not exist" in error_msg.lower() or "model not found" in error_msg.lower():
+        return f"""😔 **Maaf, layanan chatbot sedang tidak tersedia.**
+
+**Yang terjadi:** Sistem AI sedang mengalami gangguan teknis.
+
+**Yang bisa Anda lakukan:**
+1. ⏳ Tunggu beberapa saat dan coba lagi
+2. 🔄 Refresh halaman browser Anda
+
+Atau hubungi kami langsung untuk bantuan:
+📱 WhatsApp: {showroom_data['whatsapp']}
+📧 Email: {showroom_data['email']}
+
+Kami akan segera memperbaikinya! 🚗"""
+    
+    elif "blocked" in error_msg.lower() or "safety" in error_msg.lower():
+        return f"""🤔 **Pertanyaan Anda tidak dapat diproses.**
+
+**Yang terjadi:** Sistem tidak dapat memahami atau memproses pertanyaan Anda.
+
+**Yang bisa Anda lakukan:**
+1. 📝 Coba tanyakan dengan kata-kata yang berbeda
+2. 🎯 Fokus pada pertanyaan tentang mobil, harga, promo, atau layanan kami
+3. 💬 Gunakan bahasa yang lebih sederhana dan jelas
+
+**Contoh pertanyaan yang bisa ditanyakan:**
+- "Berapa harga Toyota Avanza?"
+- "Ada promo apa bulan ini?"
+- "Jam operasional showroom?"
+- "Bagaimana cara menghubungi showroom?"
+
+Jika masih mengalami masalah, hubungi kami:
+📱 WhatsApp: {showroom_data['whatsapp']}"""
+    
+    else:
+        return f"""😔 **Maaf, terjadi kesalahan saat memproses pertanyaan Anda.**
+
+**Yang terjadi:** Sistem mengalami gangguan saat ini.
+
+**Yang bisa Anda lakukan:**
+1. 🔄 Refresh halaman browser Anda
+2. 🌐 Pastikan koneksi internet Anda stabil
+3. ⏳ Tunggu 1-2 menit dan coba lagi
+
+Jika masalah berlanjut, silakan hubungi kami langsung:
+📱 WhatsApp: {showroom_data['whatsapp']}
+📧 Email: {showroom_data['email']}
+
+Kami akan segera membantu Anda! 🚗"""
+
+
+def get_model_timeout(model_name: str, deadline: Optional[float] = None) -> float:
+    """
+    Batas waktu satu percobaan model, dipersingkat agar tidak melewati deadline
+    
+    Args:
+        model_name: Nama model
+        deadline: Batas akhir (time.monotonic()) dari latency budget, None = tanpa batas
+        
+    Returns:
+        Timeout dalam detik
+    """
+    timeout = MODEL_TIMEOUTS.get(model_name, GEMINI_REQUEST_TIMEOUT)
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.monotonic())
+    return timeout
+
+
+def _timeout_error(model_name: str, timeout: float) -> Tuple[str, str]:
+    # Timeout yang dipersingkat latency budget bukan kesalahan model (tidak membuka circuit, lihat classify_error)
+    if timeout < MODEL_TIMEOUTS.get(model_name, GEMINI_REQUEST_TIMEOUT):
+        return "budget", f"Timeout: latency budget habis, model {model_name} belum menjawab dalam {timeout:.3g} detik"
+    return "timeout", f"Timeout: model {model_name} tidak menjawab dalam {timeout:.3g} detik"
+
+
+def _budget_left(deadline: float) -> bool:
+    # Masih cukup waktu untuk memulai percobaan model baru
+    return deadline - time.monotonic() >= MIN_ATTEMPT_TIME
+
+
+async def acquire_model(models: List[str], ticket: Optional[QueueTicket] = None, deadline: Optional[float] = None) -> Optional[str]:
+    """
+    Mengambil kuota model dari RATE_LIMITER (menunggu di antrian jika semua habis)
+    
+    Args:
+        models: Model yang masih boleh dicoba, sesuai urutan prioritas
+        ticket: Status antrian untuk ditampilkan ke user
+        deadline: Batas akhir latency budget; antrian ditinggalkan jika
+            model tidak didapat dengan sisa waktu minimal MIN_ATTEMPT_TIME
+        
+    Returns:
+        Nama model yang boleh dipanggil, None jika budget habis saat mengantri
+    """
+    with STAGE_SECONDS.time(stage="queue"):
+        if deadline is None:
+            model_name = await RATE_LIMITER.acquire(models, ticket)
+        else:
+            try:
+                model_name = await asyncio.wait_for(RATE_LIMITER.acquire(models, ticket), deadline - time.monotonic() - MIN_ATTEMPT_TIME)
+            except asyncio.TimeoutError:
+                log.warning("budget_exhausted", stage="queue")
+                return None
+    
+    if model_name != models[0]:
+        log.info("quota_overflow", model=models[0], routed_to=model_name)
+    return model_name
+
+
+def _record_attempt(model_name: str, outcome: str, start: float):
+    # Metrik satu percobaan model: jumlah per hasil + durasi
+    MODEL_ATTEMPTS.inc(model=model_name, outcome=outcome)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="model_attempt", model=model_name)
+
+
+def _finish_request(mode: str, source: str, start: float, **fields: Any):
+    # Metrik + log satu jawaban yang selesai (source: cache, model, fallback, failed, error)
+    elapsed = time.perf_counter() - start
+    REQUEST_SECONDS.observe(elapsed, mode=mode, source=source)
+    RESPONSES.inc(source=source)
+    log.info("response", mode=mode, source=source, latency=round(elapsed, 3), **fields)
+
+
+def try_gemini_model(model_name: str, prompt: Union[str, ChatRequest], showroom_data: Dict) -> Tuple[bool, str]:
+    """
+    Versi sinkron dari try_gemini_model_async (dijalankan di event loop bersama)
+    
+    Returns:
+        Tuple (success: bool, response: str)
+    """
+    return ASYNC_RUNNER.run(try_gemini_model_async(model_name, prompt, showroom_data))
+
+
+async def try_gemini_model_async(model_name: str, prompt: Union[str, ChatRequest], showroom_data: Dict, timeout: Optional[float] = None) -> Tuple[bool, str]:
+    """
+    Mencoba menggunakan satu model Gemini tertentu
+    
+    Generate hanya berjalan setelah mendapat slot concurrency dari
+    ASYNC_RUNNER; waktu menunggu slot tidak dihitung dalam timeout.
+    
+    Args:
+        model_name: Nama model yang akan dicoba
+        prompt: Prompt untuk dikirim ke model (teks atau ChatRequest)
+        showroom_data: Data showroom (untuk error handling)
+        timeout: Batas waktu (detik) untuk satu request ke model, None = MODEL_TIMEOUTS
+        
+    Returns:
+        Tuple (success: bool, response: str)
+    """
+    if timeout is None:
+        timeout = get_model_timeout(model_name)
+    
+    start = time.perf_counter()
+    try:
+        log.debug("model_attempt", model=model_name, timeout=round(timeout, 2))
+        
+        async with ASYNC_RUNNER.slot():
+            # Durasi percobaan dihitung setelah slot didapat
+            start = time.perf_counter()
+            # Generate content (instance model diambil dari pool)
+            response = await asyncio.wait_for(generate_with_model_async(model_name, prompt), timeout)
+        
+        text = response.text.strip()
+        _record_attempt(model_name, "ok", start)
+        log.debug("model_ok", model=model_name, latency=round(time.perf_counter() - start, 3), chars=len(text))
+        
+        return True, text
+    
+    except asyncio.TimeoutError:
+        outcome, error_msg = _timeout_error(model_name, timeout)
+        _record_attempt(model_name, outcome, start)
+        log.warning("model_timeout", model=model_name, timeout=round(timeout, 2), budget=outcome == "budget")
+        return False, error_msg
+    
+    except Exception as e:
+        # ValueError/TypeError biasanya jawaban diblokir safety filter atau response kosong
+        error_msg = str(e)
+        error_class = classify_error(error_msg)
+        _record_attempt(model_name, error_class, start)
+        log.warning("model_error", model=model_name, error=type(e).__name__, error_class=error_class, detail=error_msg[:100])
+        return False, error_msg
+
+
+def race_gemini_models(models: List[str], prompt: Union[str, ChatRequest], showroom_data: Dict, hedge_delay: float) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Versi sinkron dari race_gemini_models_async
+    
+    Returns:
+        Tuple (model_name, response), atau (None, None) jika semua model gagal
+    """
+    return ASYNC_RUNNER.run(race_gemini_models_async(models, prompt, showroom_data, hedge_delay))
+
+
+async def race_gemini_models_async(
+    models: List[str],
+    prompt: Union[str, ChatRequest],
+    showroom_data: Dict,
+    hedge_delay: float,
+    ticket: Optional[QueueTicket] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Menjalankan beberapa model secara paralel dengan strategi hedged request
+    
+    Model pertama langsung dijalankan. Model berikutnya ikut dijalankan jika
+    model yang sedang berjalan belum selesai setelah hedge_delay detik, atau
+    segera setelah ada model yang gagal. Jawaban sukses pertama yang dipakai,
+    sisanya dibatalkan agar slot concurrency langsung dilepas.
+    
+    Model cadangan hanya ikut berlomba jika kuotanya masih ada; request
+    hanya menunggu antrian RATE_LIMITER jika tidak ada model yang berjalan.
+    
+    Args:
+        models: Daftar nama model sesuai urutan prioritas
+        prompt: Prompt untuk dikirim ke model
+        showroom_data: Data showroom (untuk error handling)
+        hedge_delay: Jeda (detik) sebelum model berikutnya ikut dijalankan, 0 = semua langsung paralel
+        ticket: Status antrian jika semua model kehabisan kuota
+        deadline: Batas akhir latency budget (time.monotonic()), model baru tidak dijalankan setelahnya
+        
+    Returns:
+        Tuple (model_name, response), atau (None, None) jika semua model gagal
+    """
+    queue = list(models)
+    running = {}
+    
+    async def start_next(wait: bool) -> bool:
+        if deadline is not None and not _budget_left(deadline):
+            return False
+        if wait:
+            model_name = await acquire_model(queue, ticket, deadline)
+            if model_name is None:
+                return False
+        else:
+            model_name = RATE_LIMITER.try_acquire(queue)
+            if model_name is None:
+                log.debug("hedge_skipped", reason="quota")
+                return False
+        queue.remove(model_name)
+        log.debug("hedge_start", model=model_name, running=len(running) + 1)
+        timeout = get_model_timeout(model_name, deadline)
+        task = asyncio.ensure_future(MODEL_HEALTH.call_async(model_name, try_gemini_model_async, model_name, prompt, showroom_data, timeout))
+        running[task] = model_name
+        return True
+    
+    try:
+        if not await start_next(wait=True):
+            return None, None
+        while hedge_delay <= 0 and queue and await start_next(wait=False):
+            pass
+        
+        while running:
+            done, _ = await asyncio.wait(running, timeout=hedge_delay if queue else None, return_when=asyncio.FIRST_COMPLETED)
+            
+            if not done:
+                # Model yang berjalan terlalu lama, jalankan model cadangan berikutnya
+                await start_next(wait=False)
+                continue
+            
+            for task in done:
+                model_name = running.pop(task)
+                success, response = task.result()
+                if success:
+                    return model_name, response
+            
+            # Ada model yang gagal, langsung coba model berikutnya tanpa menunggu jeda
+            if queue:
+                await start_next(wait=not running)
+        
+        return None, None
+    
+    finally:
+        for task in running:
+            task.cancel()
+
+
+def _queue_notifier(ticket: QueueTicket, on_queue: Optional[Callable[[int, float], None]]) -> Optional[Callable[[], None]]:
+    # on_wait untuk ASYNC_RUNNER: laporkan posisi antrian hanya selama request mengantri
+    if on_queue is None:
+        return None
+    
+    def notify():
+        if ticket.position:
+            on_queue(ticket.position, ticket.wait_estimate)
+    
+    return notify
+
+
+def get_response_from_gemini(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    hedge_delay: Optional[float] = None,
+    conversation_summary: str = "",
+    session_id: str = "",
+    on_queue: Optional[Callable[[int, float], None]] = None,
+    latency_budget: Optional[float] = None,
+) -> str:
+    """
+    Versi sinkron dari get_response_from_gemini_async untuk script Streamlit
+    
+    Request dijalankan di event loop bersama (ASYNC_RUNNER), sehingga thread
+    session hanya menunggu hasil tanpa membuat thread tambahan.
+    
+    Args:
+        session_id: Id session untuk antrian yang adil (lihat RATE_LIMITER)
+        on_queue: Dipanggil dengan (posisi antrian, perkiraan detik) selama
+            request menunggu kuota model, dari thread pemanggil
+        latency_budget: Lihat get_response_from_gemini_async
+        
+    Returns:
+        Response dari Gemini atau error message
+    """
+    ticket = QueueTicket(session_id)
+    return ASYNC_RUNNER.run(
+        get_response_from_gemini_async(
+            user_message,
+            showroom_data,
+            conversation_history,
+            hedge_delay,
+            conversation_summary,
+            ticket=ticket,
+            latency_budget=latency_budget,
+        ),
+        on_wait=_queue_notifier(ticket, on_queue),
+    )
+
+
+async def get_response_from_gemini_async(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    hedge_delay: Optional[float] = None,
+    conversation_summary: str = "",
+    ticket: Optional[QueueTicket] = None,
+    latency_budget: Optional[float] = None,
+) -> str:
+    """
+    Mendapatkan response dari Google Gemini API dengan multi-model fallback
+    
+    Strategi:
+    1. Coba model Gemini secara berurutan sesuai GEMINI_MODELS, diurutkan
+       ulang oleh MODEL_HEALTH (model dengan circuit terbuka dilewati)
+    2. Model yang kuota per menitnya habis tidak dipanggil: request dialihkan
+       ke model murah, atau menunggu di antrian RATE_LIMITER
+    3. Jika satu model gagal (atau melewati MODEL_TIMEOUTS), otomatis try
+       model berikutnya
+    4. Jika latency budget habis, model tidak dicoba lagi dan user langsung
+       dijawab dari data lokal (get_fast_fallback_answer)
+    5. Jika semua gagal, return error message yang informatif
+    
+    Jawaban yang berhasil untuk pertanyaan pertama sebuah percakapan
+    disimpan di RESPONSE_CACHE, sehingga pertanyaan yang sama atau mirip
+    dijawab langsung tanpa memanggil model.
+    
+    Jika hedge_delay diisi, model tidak dicoba satu per satu melainkan
+    berlomba (hedged request) lewat race_gemini_models_async.
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        conversation_history: History percakapan sebelumnya
+        hedge_delay: Jeda (detik) sebelum model cadangan ikut dijalankan, None = berurutan
+        conversation_summary: Ringkasan percakapan lama (lihat ConversationMemory.summary)
+        ticket: Status antrian jika semua model kehabisan kuota (lihat RATE_LIMITER)
+        latency_budget: Batas total waktu tunggu (detik), None = RESPONSE_LATENCY_BUDGET
+        
+    Returns:
+        Response dari Gemini atau error message
+    """
+    deadline = time.monotonic() + (RESPONSE_LATENCY_BUDGET if latency_budget is None else latency_budget)
+    request_start = time.perf_counter()
+    
+    try:
+        log.debug("request_start", mode="sync", message=user_message[:100], history=len(conversation_history))
+        
+        # Pertanyaan yang sama/mirip sudah pernah dijawab untuk versi data ini
+        data_version = get_data_version(showroom_data)
+        catalog_index = get_catalog_index(showroom_data['daftar_mobil'])
+        cached = RESPONSE_CACHE.get(user_message, conversation_history, data_version, catalog_index)
+        if cached is not None:
+            _finish_request("sync", "cache", request_start)
+            return cached
+        
+        full_prompt, _ = prepare_prompt(user_message, showroom_data, conversation_history, conversation_summary)
+        
+        # Urutkan model berdasarkan kesehatan, model dengan circuit terbuka dilewati
+        models = MODEL_HEALTH.order_models(GEMINI_MODELS)
+        log.debug("model_order", models=models, skipped=[model for model in GEMINI_MODELS if model not in models])
+        
+        if hedge_delay is not None:
+            # Hedged request: model cadangan ikut berlomba, jawaban pertama yang berhasil dipakai
+            try:
+                model_name, response = await asyncio.wait_for(
+                    race_gemini_models_async(models, full_prompt, showroom_data, hedge_delay, ticket, deadline),
+                    deadline - time.monotonic(),
+                )
+            except asyncio.TimeoutError:
+                model_name, response = None, None
+            if model_name is not None:
+                FALLBACK_DEPTH.observe(models.index(model_name) + 1)
+                _finish_request("sync", "model", request_start, model=model_name, hedged=True)
+                RESPONSE_CACHE.put(user_message, conversation_history, data_version, response, catalog_index)
+                return response
+        else:
+            # Coba setiap model secara berurutan (fallback strategy)
+            remaining = list(models)
+            for idx in range(1, len(models) + 1):
+                if not _budget_left(deadline):
+                    break
+                model_name = await acquire_model(remaining, ticket, deadline)
+                if model_name is None:
+                    break
+                remaining.remove(model_name)
+                try:
+                    success, response = await asyncio.wait_for(
+                        MODEL_HEALTH.call_async(model_name, try_gemini_model_async, model_name, full_prompt, showroom_data, get_model_timeout(model_name, deadline)),
+                        deadline - time.monotonic(),
+                    )
+                except asyncio.TimeoutError:
+                    # Budget habis saat menunggu slot concurrency
+                    break
+                
+                if success:
+                    FALLBACK_DEPTH.observe(idx)
+                    _finish_request("sync", "model", request_start, model=model_name, attempts=idx)
+                    RESPONSE_CACHE.put(user_message, conversation_history, data_version, response, catalog_index)
+                    return response
+        
+        if not _budget_left(deadline):
+            # Latency budget habis, jawab dari data lokal
+            _finish_request("sync", "fallback", request_start)
+            return get_fast_fallback_answer(user_message, showroom_data, data_version)
+        
+        # Jika semua model gagal
+        _finish_request("sync", "failed", request_start)
+        return get_all_models_failed_message(showroom_data)
+    
+    except Exception as e:
+        error_msg = str(e)
+        log.exception("unhandled_error", mode="sync", error=type(e).__name__)
+        _finish_request("sync", "error", request_start)
+        
+        return get_error_message(error_msg, showroom_data)
+
+
+def stream_response_from_gemini(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    conversation_summary: str = "",
+    session_id: str = "",
+    on_queue: Optional[Callable[[int, float], None]] = None,
+    latency_budget: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    Versi sinkron dari stream_response_from_gemini_async (iterator biasa untuk script Streamlit)
+    
+    Args:
+        session_id: Id session untuk antrian yang adil (lihat RATE_LIMITER)
+        on_queue: Lihat get_response_from_gemini
+        latency_budget: Lihat stream_response_from_gemini_async
+        
+    Yields:
+        Potongan teks response (atau pesan error jika semua model gagal)
+    """
+    ticket = QueueTicket(session_id)
+    yield from ASYNC_RUNNER.iterate(
+        stream_response_from_gemini_async(
+            user_message,
+            showroom_data,
+            conversation_history,
+            conversation_summary,
+            ticket=ticket,
+            latency_budget=latency_budget,
+        ),
+        on_wait=_queue_notifier(ticket, on_queue),
+    )
+
+
+async def stream_response_from_gemini_async(
+    user_message: str,
+    showroom_data: Dict,
+    conversation_history: List[Dict],
+    conversation_summary: str = "",
+    ticket: Optional[QueueTicket] = None,
+    latency_budget: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Versi streaming dari get_response_from_gemini: menghasilkan potongan teks
+    segera setelah diterima dari model (jawaban dari cache dikirim sekaligus)
+    
+    Fallback tetap berlaku: jika sebuah model gagal (atau tidak mengirim
+    potongan baru dalam MODEL_TIMEOUTS) sebelum token pertama, model
+    berikutnya langsung dicoba. Jika gagal setelah teks mulai dikirim,
+    jawaban diakhiri dengan catatan singkat.
+    
+    Latency budget berlaku sampai token pertama: jika habis sebelum ada
+    model yang mulai menjawab, user dijawab dari data lokal.
+    
+    Args:
+        user_message: Pesan dari user
+        showroom_data: Dictionary berisi data showroom
+        conversation_history: History percakapan sebelumnya
+        conversation_summary: Ringkasan percakapan lama (lihat ConversationMemory.summary)
+        ticket: Status antrian jika semua model kehabisan kuota (lihat RATE_LIMITER)
+        latency_budget: Batas waktu sampai token pertama (detik), None = RESPONSE_LATENCY_BUDGET
+        
+    Yields:
+        Potongan teks response (atau pesan error jika semua model gagal)
+    """
+    deadline = time.monotonic() + (RESPONSE_LATENCY_BUDGET if latency_budget is None else latency_budget)
+    request_start = time.perf_counter()
+    
+    try:
+        log.debug("request_start", mode="stream", message=user_message[:100], history=len(conversation_history))
+        
+        data_version = get_data_version(showroom_data)
+        catalog_index = get_catalog_index(showroom_data['daftar_mobil'])
+        cached = RESPONSE_CACHE.get(user_message, conversation_history, data_version, catalog_index)
+        if cached is not None:
+            _finish_request("stream", "cache", request_start)
+            yield cached
+            return
+        
+        full_prompt, _ = prepare_prompt(user_message, showroom_data, conversation_history, conversation_summary)
+        models = MODEL_HEALTH.order_models(GEMINI_MODELS)
+        log.debug("model_order", models=models, skipped=[model for model in GEMINI_MODELS if model not in models])
+        
+        remaining = list(models)
+        for idx in range(1, len(models) + 1):
+            if not _budget_left(deadline):
+                break
+            model_name = await acquire_model(remaining, ticket, deadline)
+            if model_name is None:
+                break
+            remaining.remove(model_name)
+            log.debug("model_attempt", model=model_name, attempt=idx, stream=True)
+            start = time.monotonic()
+            attempt_start = time.perf_counter()
+            started = False
+            in_slot = False
+            parts = []
+            
+            try:
+                async with ASYNC_RUNNER.slot(timeout=deadline - time.monotonic()):
+                    in_slot = True
+                    # Sama seperti MODEL_HEALTH.call_async: percobaan half-open hanya satu
+                    MODEL_HEALTH.begin_attempt(model_name)
+                    attempt_start = time.perf_counter()
+                    timeout = get_model_timeout(model_name, deadline)
+                    response = await asyncio.wait_for(generate_with_model_async(model_name, full_prompt, stream=True), timeout)
+                    chunks = response.__aiter__()
+                    
+                    while True:
+                        # Sebelum token pertama, timeout juga dibatasi sisa latency budget
+                        timeout = get_model_timeout(model_name, None if started else deadline)
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            break
+                        
+                        text = chunk.text
+                        if not text:
+                            continue
+                        
+                        if not started:
+                            # Token pertama diterima, model dianggap sehat
+                            started = True
+                            MODEL_HEALTH.record(model_name, True, time.monotonic() - start)
+                            STAGE_SECONDS.observe(time.perf_counter() - request_start, stage="first_token", model=model_name)
+                            log.debug("first_token", model=model_name, latency=round(time.monotonic() - start, 3))
+                        
+                        parts.append(text)
+                        yield text
+                
+                if started:
+                    _record_attempt(model_name, "ok", attempt_start)
+                    FALLBACK_DEPTH.observe(idx)
+                    _finish_request("stream", "model", request_start, model=model_name, attempts=idx)
+                    RESPONSE_CACHE.put(user_message, conversation_history, data_version, "".join(parts).strip(), catalog_index)
+                    return
+                
+                raise ValueError("Response kosong dari model")
+            
+            except asyncio.CancelledError:
+                # Request dibatalkan sebelum token pertama, hasil percobaan tidak dicatat
+                if in_slot and not started:
+                    MODEL_HEALTH.release_attempt(model_name)
+                raise
+            
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and not in_slot:
+                    # Budget habis saat menunggu slot concurrency, bukan kesalahan model
+                    break
+                if isinstance(e, asyncio.TimeoutError):
+                    error_class, error_msg = _timeout_error(model_name, timeout)
+                else:
+                    error_class, error_msg = classify_error(str(e)), str(e)
+                
+                if started:
+                    # Teks sudah tampil ke user, tidak bisa diganti dengan model lain
+                    _record_attempt(model_name, "interrupted", attempt_start)
+                    log.warning("stream_interrupted", model=model_name, error=type(e).__name__, detail=error_msg[:100])
+                    _finish_request("stream", "interrupted", request_start, model=model_name)
+                    yield "\n\n⚠️ *Jawaban terpotong karena gangguan koneksi. Silakan tanyakan kembali.*"
+                    return
+                
+                _record_attempt(model_name, error_class, attempt_start)
+                log.warning("model_error", model=model_name, error=type(e).__name__, error_class=error_class, detail=error_msg[:100])
+                MODEL_HEALTH.record(model_name, False, time.monotonic() - start, error_msg)
+        
+        if not _budget_left(deadline):
+            # Latency budget habis, jawab dari data lokal
+            _finish_request("stream", "fallback", request_start)
+            yield get_fast_fallback_answer(user_message, showroom_data, data_version)
+            return
+        
+        _finish_request("stream", "failed", request_start)
+        yield get_all_models_failed_message(showroom_data)
+    
+    except Exception as e:
+        error_msg = str(e)
+        log.exception("unhandled_error", mode="stream", error=type(e).__name__)
+        _finish_request("stream", "error", request_start)
+        
+        yield get_error_message(error_msg, showroom_data)
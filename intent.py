@@ -0,0 +1,411 @@
+"""
+intent.py - Klasifikasi intent pesan user secara offline (aturan kata kunci + Naive Bayes kecil)
+
+Pesan dengan intent deterministik (jam buka, kontak, promo, katalog, harga,
+pembiayaan) bisa dijawab langsung dari data showroom; hanya pesan "open"
+yang perlu dikirim ke model Gemini.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Iterable, Optional, Tuple
+
+from catalog import FILTER_VOCABULARY, tokenize
+from financing import SIMULATION_KEYWORDS
+
+# Label intent (nama sama dengan helper.LOCAL_INTENTS, ditambah harga dan open)
+INTENTS = ("jam_operasional", "kontak", "promo", "daftar_mobil", "harga", "pembiayaan", "open")
+OPEN = "open"
+
+# Probabilitas minimal agar intent dari model (tanpa aturan yang cocok) dipakai
+MODEL_CONFIDENCE_THRESHOLD = 0.85
+
+# Intent dari aturan kata kunci hanya dipakai jika model juga memilihnya dengan probabilitas ini
+RULE_CONFIDENCE_THRESHOLD = 0.3
+
+# Pesan panjang biasanya pertanyaan bernuansa, selalu dikirim ke model
+MAX_LOCAL_TOKENS = 14
+
+# Kata kunci per intent (token hasil catalog.tokenize)
+RULE_KEYWORDS = {
+    "jam_operasional": {"jam", "buka", "tutup", "operasional", "libur"},
+    "kontak": {
+        "alamat", "lokasi", "dimana", "maps", "wa", "whatsapp", "nomor", "nomer", "telepon", "telp", "hp",
+        "email", "instagram", "ig", "hubungi", "menghubungi", "kontak", "cs",
+    },
+    "promo": {"promo", "promosi", "diskon", "cashback", "potongan", "hadiah", "bonus"},
+    "daftar_mobil": {"daftar", "katalog", "stok", "stock", "koleksi", "list"},
+    # "berapa" saja tidak cukup ("garansi berapa tahun"), diserahkan ke model
+    "harga": {"harga", "harganya", "berapaan", "otr", "price", "pricelist"},
+    "pembiayaan": set(SIMULATION_KEYWORDS) | {"bunga", "bank"},
+}
+
+# Frasa yang tidak tertangkap sebagai token tunggal
+RULE_PHRASES = {
+    "jam_operasional": ("jam berapa", "hari minggu", "tanggal merah"),
+    "kontak": ("di mana", "no wa", "no hp", "call center"),
+    "daftar_mobil": ("mobil apa saja", "mobil apa aja", "ada mobil apa", "unit apa", "pilihan mobil"),
+    "pembiayaan": ("uang muka",),
+}
+
+# Kata yang menandakan pertanyaan terbuka (perbandingan, opini, rekomendasi)
+OPEN_SIGNALS = {
+    "beda", "bedanya", "perbedaan", "banding", "dibanding", "dibandingkan", "vs", "versus", "rekomendasi",
+    "rekomendasiin", "saran", "cocok", "bagus", "bagusan", "mending", "kelebihan", "kekurangan", "irit",
+    "review", "pengalaman", "kenapa", "mengapa", "tukar", "trade", "mudik", "keluarga", "usaha",
+    "suka", "kecewa", "komplain", "keluhan", "kirim", "dikirim",
+}
+
+# Atribut mobil yang tidak ada di data showroom (hanya harga, cicilan, spesifikasi singkat)
+UNKNOWN_ATTRIBUTES = {
+    "warna", "warnanya", "rangka", "mesin", "mesinnya", "foto", "fotonya", "gambar", "video", "interior",
+    "eksterior", "kondisi", "kondisinya", "kilometer", "odometer", "pajak", "pajaknya", "stnk", "bpkb",
+    "plat", "nopol", "sisa", "tersisa", "inden",
+}
+
+# Negasi di tengah kalimat mengubah makna ("tidak suka promo", "kredit tanpa dp");
+# di akhir kalimat biasanya hanya penegas pertanyaan ("buka nggak?")
+NEGATIONS = {"tidak", "tak", "bukan", "ga", "gak", "nggak", "enggak", "engga", "belum", "tanpa", "jangan"}
+
+# Kata rujukan ke percakapan sebelumnya ("yang tadi", "mobil itu"); jawaban lokal tidak tahu konteksnya
+REFERENCE_WORDS = {"itu", "tersebut", "tsb", "tadi", "sebelumnya", "barusan", "sama", "juga"}
+
+# Kata kunci yang biasanya diikuti nama mobil ("harga xpander", "cicilan brio", "stok agya")
+CAR_SLOT_KEYWORDS = RULE_KEYWORDS["harga"] | RULE_KEYWORDS["pembiayaan"] | RULE_KEYWORDS["promo"] | {"stok", "stock"}
+
+# Jumlah kata setelah kata kunci yang diperiksa sebagai nama mobil
+CAR_SLOT_WINDOW = 3
+
+# Kata pengisi antara kata kunci dan nama mobil ("harga mobil xpander", "cicilan untuk brio")
+SLOT_FILLERS = {"mobil", "unit", "untuk", "buat", "utk", "kak", "dong", "min", "gan", "sih", "ya", "yg", "yang"}
+
+# Kata umum yang bukan nama mobil walaupun muncul setelah kata kunci ("harga terbaru", "promo akhir tahun")
+GENERAL_WORDS = (
+    FILTER_VOCABULARY | OPEN_SIGNALS | UNKNOWN_ATTRIBUTES | NEGATIONS | REFERENCE_WORDS
+    | set().union(*RULE_KEYWORDS.values()) | SLOT_FILLERS | {
+        "brp", "brapa", "berapakah", "sekarang", "skrg", "ini", "lama", "persen", "syarat", "pengajuan",
+        "showroom", "kalian", "sini", "disini", "akhir", "awal", "hari", "minggu", "spesial", "lengkap",
+        "beli", "pembelian", "berlaku", "masih", "lagi", "bisa", "boleh", "gimana", "bagaimana", "kapan",
+        "mulai", "naik", "turun", "ready", "tersedia", "semua", "total", "muka", "kemarin",
+        "kalau", "kalo", "jika", "kok", "dapat", "dapet",
+    }
+)
+
+_NUMBER_RE = re.compile(r"^\d+(?:[.,]\d+)*$")
+
+# Contoh pesan berlabel untuk melatih Naive Bayes (gaya chat user showroom)
+TRAINING_SAMPLES = [
+    ("jam buka showroom", "jam_operasional"),
+    ("jam berapa buka?", "jam_operasional"),
+    ("showroom buka jam berapa ya", "jam_operasional"),
+    ("tutup jam berapa kak", "jam_operasional"),
+    ("hari minggu buka nggak?", "jam_operasional"),
+    ("jam operasional showroom", "jam_operasional"),
+    ("sabtu buka sampai jam berapa", "jam_operasional"),
+    ("tanggal merah libur ga?", "jam_operasional"),
+    ("sekarang masih buka?", "jam_operasional"),
+    ("besok buka jam berapa", "jam_operasional"),
+    ("kapan showroom tutup", "jam_operasional"),
+    ("kapan buka", "jam_operasional"),
+    ("alamat showroom dimana", "kontak"),
+    ("lokasinya di mana ya", "kontak"),
+    ("nomor wa berapa", "kontak"),
+    ("kontak", "kontak"),
+    ("minta kontak sales", "kontak"),
+    ("bagaimana cara menghubungi showroom?", "kontak"),
+    ("ada instagram?", "kontak"),
+    ("email showroom apa", "kontak"),
+    ("share lokasi maps dong", "kontak"),
+    ("bisa telepon ke nomor berapa", "kontak"),
+    ("hubungi cs lewat whatsapp", "kontak"),
+    ("alamat", "kontak"),
+    ("alamat dimana", "kontak"),
+    ("alamat lengkap showroom", "kontak"),
+    ("promo", "promo"),
+    ("promo apa", "promo"),
+    ("ada promo bulan ini?", "promo"),
+    ("apa promo terbaru bulan ini?", "promo"),
+    ("lagi ada diskon ga", "promo"),
+    ("cashback berapa sekarang", "promo"),
+    ("promo akhir tahun ada?", "promo"),
+    ("ada potongan harga?", "promo"),
+    ("promosi spesial apa saja", "promo"),
+    ("dapat hadiah apa kalau beli", "promo"),
+    ("bonus pembelian apa aja", "promo"),
+    ("apa saja daftar mobil yang tersedia?", "daftar_mobil"),
+    ("mobil apa aja yang ready", "daftar_mobil"),
+    ("ada mobil apa saja", "daftar_mobil"),
+    ("katalog", "daftar_mobil"),
+    ("lihat katalog mobil", "daftar_mobil"),
+    ("stok mobil sekarang apa", "daftar_mobil"),
+    ("list unit yang tersedia", "daftar_mobil"),
+    ("koleksi mobil showroom", "daftar_mobil"),
+    ("unit apa saja yang dijual", "daftar_mobil"),
+    ("pilihan mobil yang ada", "daftar_mobil"),
+    ("jual mobil apa aja", "daftar_mobil"),
+    ("harga avanza berapa", "harga"),
+    ("berapa harga brio", "harga"),
+    ("harga xpander sekarang", "harga"),
+    ("harganya pajero berapa ya", "harga"),
+    ("brp harga innova", "harga"),
+    ("harga otr fortuner", "harga"),
+    ("price list rush", "harga"),
+    ("berapaan ertiga", "harga"),
+    ("kisaran harga jazz", "harga"),
+    ("harga terbaru civic", "harga"),
+    ("bagaimana simulasi kredit mobil di showroom ini?", "pembiayaan"),
+    ("bisa kredit?", "pembiayaan"),
+    ("bisa kredit ga", "pembiayaan"),
+    ("bisa cicil?", "pembiayaan"),
+    ("cicilan avanza berapa", "pembiayaan"),
+    ("dp minimal berapa", "pembiayaan"),
+    ("tenor paling lama berapa tahun", "pembiayaan"),
+    ("bunga leasing berapa persen", "pembiayaan"),
+    ("kredit avanza dp 30% 48 bulan", "pembiayaan"),
+    ("simulasi angsuran xpander", "pembiayaan"),
+    ("uang muka berapa untuk rush", "pembiayaan"),
+    ("syarat pengajuan kredit apa saja", "pembiayaan"),
+    ("apa bedanya avanza dan xenia", "open"),
+    ("rekomendasi mobil untuk keluarga besar", "open"),
+    ("mobil yang irit buat harian apa", "open"),
+    ("mending brio atau agya", "open"),
+    ("kelebihan xpander dibanding ertiga", "open"),
+    ("mobil apa yang cocok untuk mudik", "open"),
+    ("saya mau tukar tambah mobil lama bisa?", "open"),
+    ("kenapa harga fortuner lebih mahal dari pajero", "open"),
+    ("mobil bekas ada garansi?", "open"),
+    ("bisa test drive kapan", "open"),
+    ("suv yang bagus buat jalan rusak apa", "open"),
+    ("saya mau mobil buat usaha katering cocoknya apa", "open"),
+    ("halo", "open"),
+    ("terima kasih infonya", "open"),
+    ("mobilnya bisa dikirim ke luar kota?", "open"),
+    ("pengalaman servis di sini gimana", "open"),
+    ("apakah bisa inden warna merah", "open"),
+    ("surat-suratnya lengkap?", "open"),
+    ("berapa lama proses pengiriman", "open"),
+    ("garansi berapa tahun", "open"),
+    ("mesinnya berapa cc", "open"),
+    ("berapa kapasitas tangki", "open"),
+    ("servis berkala berapa kilometer sekali", "open"),
+    ("stok avanza warna putih ada?", "open"),
+    ("nomor rangka avanza?", "open"),
+    ("bisa kirim foto interior fortuner lewat wa?", "open"),
+    ("saya tidak suka promo kalian", "open"),
+    ("apakah bisa kredit tanpa dp?", "open"),
+    ("stok xpander tinggal berapa unit", "open"),
+    ("pajak tahunan innova berapa", "open"),
+    ("promo kemarin kok tidak berlaku", "open"),
+    ("kenapa tidak bisa dihubungi", "open"),
+    ("bisa bayar pakai kartu kredit?", "open"),
+    ("pembayaran bisa transfer bank?", "open"),
+]
+
+
+def _features(text: str) -> List[str]:
+    # Unigram + bigram; angka disamakan agar "30%" dan "48 bulan" tidak jadi kata baru
+    tokens = ["<angka>" if _NUMBER_RE.match(token) else token for token in tokenize(text)]
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class NaiveBayesIntentModel:
+    """
+    Multinomial Naive Bayes dengan Laplace smoothing (murni Python, cukup untuk CPU)
+
+    Fitur yang tidak pernah muncul saat training diabaikan, sehingga nama
+    mobil atau kata baru tidak menggeser prediksi.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.priors: Dict[str, float] = {}
+        self.likelihoods: Dict[str, Dict[str, float]] = {}
+        self.unseen: Dict[str, float] = {}
+        self.vocabulary: set = set()
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "NaiveBayesIntentModel":
+        """
+        Melatih model
+
+        Args:
+            samples: Pasangan (teks, intent)
+
+        Returns:
+            Model yang sama (bisa dirangkai)
+        """
+        counts: Dict[str, Counter] = {}
+        docs: Counter = Counter()
+        for text, intent in samples:
+            docs[intent] += 1
+            counts.setdefault(intent, Counter()).update(_features(text))
+
+        self.vocabulary = {feature for counter in counts.values() for feature in counter}
+        size = len(self.vocabulary)
+        for intent, counter in counts.items():
+            total = sum(counter.values()) + self.alpha * size
+            # Prior seragam: contoh "open" sengaja lebih banyak (contoh negatif), bukan cerminan traffic
+            self.priors[intent] = -math.log(len(docs))
+            self.likelihoods[intent] = {feature: math.log((count + self.alpha) / total) for feature, count in counter.items()}
+            self.unseen[intent] = math.log(self.alpha / total)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """
+        Probabilitas tiap intent untuk satu pesan
+
+        Returns:
+            Dictionary intent -> probabilitas (jumlah = 1)
+        """
+        features = [feature for feature in _features(text) if feature in self.vocabulary]
+        scores = {}
+        for intent, prior in self.priors.items():
+            likelihood = self.likelihoods[intent]
+            unseen = self.unseen[intent]
+            scores[intent] = prior + sum(likelihood.get(feature, unseen) for feature in features)
+
+        top = max(scores.values())
+        weights = {intent: math.exp(score - top) for intent, score in scores.items()}
+        total = sum(weights.values())
+        return {intent: weight / total for intent, weight in weights.items()}
+
+
+class IntentResult:
+    """Hasil klasifikasi: intent, keyakinan (0-1), dan asal keputusan (rule / model)"""
+
+    __slots__ = ("intent", "confidence", "source")
+
+    def __init__(self, intent: str, confidence: float, source: str):
+        self.intent = intent
+        self.confidence = confidence
+        self.source = source
+
+    @property
+    def is_local(self) -> bool:
+        return self.intent != OPEN
+
+    def __repr__(self) -> str:
+        return f"IntentResult({self.intent!r}, {self.confidence:.2f}, {self.source!r})"
+
+
+class IntentClassifier:
+    """
+    Klasifikasi intent: aturan kata kunci sebagai kandidat, Naive Bayes sebagai penentu
+
+    - Pesan panjang, berisi kata perbandingan/opini (OPEN_SIGNALS), atribut
+      mobil yang tidak ada di data (UNKNOWN_ATTRIBUTES), atau negasi di tengah
+      kalimat -> open
+    - Pesan lanjutan yang merujuk percakapan sebelumnya ("yang tadi") -> open
+    - Ada aturan yang cocok -> intent itu hanya jika model juga memilihnya
+      (intent teratas, probabilitas >= RULE_CONFIDENCE_THRESHOLD)
+    - Tidak ada aturan cocok -> intent model jika probabilitasnya >= MODEL_CONFIDENCE_THRESHOLD
+    """
+
+    def __init__(
+        self,
+        model: NaiveBayesIntentModel,
+        threshold: float = MODEL_CONFIDENCE_THRESHOLD,
+        rule_threshold: float = RULE_CONFIDENCE_THRESHOLD,
+    ):
+        self.model = model
+        self.threshold = threshold
+        self.rule_threshold = rule_threshold
+
+    def rule_matches(self, text: str, tokens: List[str]) -> List[str]:
+        """Intent yang kata kunci atau frasanya ada di pesan"""
+        token_set = set(tokens)
+        lowered = text.lower()
+        return [
+            intent for intent in INTENTS
+            if token_set & RULE_KEYWORDS.get(intent, set()) or any(phrase in lowered for phrase in RULE_PHRASES.get(intent, ()))
+        ]
+
+    def classify(self, text: str, follow_up: bool = False) -> IntentResult:
+        """
+        Menentukan intent satu pesan
+
+        Args:
+            text: Pesan user
+            follow_up: True jika pesan adalah lanjutan percakapan (ada history)
+
+        Returns:
+            IntentResult (intent OPEN jika pesan perlu dijawab model)
+        """
+        tokens = tokenize(text)
+        if not tokens or len(tokens) > MAX_LOCAL_TOKENS:
+            return IntentResult(OPEN, 1.0, "rule")
+        token_set = set(tokens)
+        if token_set & OPEN_SIGNALS or token_set & UNKNOWN_ATTRIBUTES or set(tokens[:-1]) & NEGATIONS:
+            return IntentResult(OPEN, 1.0, "rule")
+        if follow_up and token_set & REFERENCE_WORDS:
+            return IntentResult(OPEN, 1.0, "rule")
+
+        proba = self.model.predict_proba(text)
+        top = max(proba, key=proba.get)
+        matches = self.rule_matches(text, tokens)
+
+        if matches:
+            if top in matches and proba[top] >= self.rule_threshold:
+                return IntentResult(top, proba[top], "rule")
+            return IntentResult(OPEN, proba.get(OPEN, 0.0), "model")
+
+        if top != OPEN and proba[top] >= self.threshold:
+            return IntentResult(top, proba[top], "model")
+        return IntentResult(OPEN, proba.get(OPEN, 0.0), "model")
+
+
+def car_name_candidates(text: str) -> List[str]:
+    """
+    Kata di posisi nama mobil yang bukan kata umum
+
+    Posisi nama mobil adalah kata pertama yang bukan kata umum/angka dalam
+    CAR_SLOT_WINDOW kata setelah kata kunci harga, pembiayaan, promo, atau
+    stok ("harga terbaru xpander", "cicilan untuk brio").
+    Caller mencocokkan hasilnya dengan katalog; yang tidak dikenal berarti
+    user menanyakan mobil yang tidak ada di data ("cicilan xpander").
+
+    Args:
+        text: Pesan user
+
+    Returns:
+        List kata kandidat nama mobil (bisa kosong)
+    """
+    tokens = tokenize(text)
+    candidates = []
+    for pos, token in enumerate(tokens):
+        if token not in CAR_SLOT_KEYWORDS:
+            continue
+        for following in tokens[pos + 1:pos + 1 + CAR_SLOT_WINDOW]:
+            if len(following) >= 3 and following.isalpha() and following not in GENERAL_WORDS:
+                candidates.append(following)
+                break
+    return list(dict.fromkeys(candidates))
+
+
+_CLASSIFIER: Optional[IntentClassifier] = None
+_CLASSIFIER_LOCK = threading.Lock()
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Classifier bersama (dilatih sekali per proses dari TRAINING_SAMPLES)"""
+    global _CLASSIFIER
+    if _CLASSIFIER is None:
+        with _CLASSIFIER_LOCK:
+            if _CLASSIFIER is None:
+                _CLASSIFIER = IntentClassifier(NaiveBayesIntentModel().fit(TRAINING_SAMPLES))
+    return _CLASSIFIER
+
+
+def classify_intent(text: str, follow_up: bool = False) -> IntentResult:
+    """
+    Menentukan intent pesan user dengan classifier bersama
+
+    Args:
+        text: Pesan user
+        follow_up: True jika pesan adalah lanjutan percakapan (ada history)
+
+    Returns:
+        IntentResult
+    """
+    return get_intent_classifier().classify(text, follow_up)
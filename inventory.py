@@ -0,0 +1,329 @@
+"""
+inventory.py - Backend inventori mobil di SQLite (untuk katalog ribuan unit)
+
+Membuat database dari file data showroom:
+
+    python inventory.py showroom_data.json inventory.sqlite3
+
+Lalu aktifkan dengan env SHOWROOM_INVENTORY_DB=inventory.sqlite3; daftar_mobil
+di data showroom diganti SQLiteInventory yang membaca baris per halaman.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import Sequence
+from typing import List, Dict, Optional, Iterator, Collection
+
+from catalog import CarFilter, NUMERIC_FIELDS, tokenize, _TOKEN_RE
+from data import get_data_version
+
+# Jumlah baris per halaman saat iterasi
+DEFAULT_PAGE_SIZE = 500
+
+_COLUMNS = ("id", "merek", "model", "tahun", "kategori", "harga", "cicilan", "spesifikasi")
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM mobil"
+
+_SCHEMA = """
+CREATE TABLE mobil (
+    id INTEGER PRIMARY KEY,
+    merek TEXT NOT NULL,
+    model TEXT NOT NULL,
+    tahun INTEGER NOT NULL,
+    kategori TEXT NOT NULL,
+    harga INTEGER NOT NULL,
+    cicilan INTEGER NOT NULL,
+    spesifikasi TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX idx_mobil_merek ON mobil (merek COLLATE NOCASE);
+CREATE INDEX idx_mobil_kategori ON mobil (kategori COLLATE NOCASE);
+CREATE INDEX idx_mobil_harga ON mobil (harga);
+CREATE INDEX idx_mobil_tahun ON mobil (tahun);
+CREATE INDEX idx_mobil_cicilan ON mobil (cicilan);
+CREATE VIRTUAL TABLE mobil_fts USING fts5 (
+    kata, spesifikasi, tokenize = "unicode61 tokenchars '-.'"
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def build_inventory_db(daftar_mobil: List[Dict], path: str):
+    """
+    Membuat database inventori dari list mobil
+
+    Database ditulis ke file sementara lalu di-rename, sehingga proses yang
+    sedang membaca file lama tidak pernah melihat database setengah jadi.
+
+    Args:
+        daftar_mobil: List mobil (format sama dengan showroom_data.json)
+        path: Lokasi file database
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(_SCHEMA)
+        db.executemany(
+            f"INSERT INTO mobil ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            ([mobil[column] if column != "spesifikasi" else mobil.get(column, "") for column in _COLUMNS] for mobil in daftar_mobil),
+        )
+        # Kolom "kata" berisi token merek/model/kategori termasuk bentuk gabungan ("cr-v" -> cr, v, crv)
+        db.executemany(
+            "INSERT INTO mobil_fts (rowid, kata, spesifikasi) VALUES (?, ?, ?)",
+            (
+                (mobil["id"], " ".join(tokenize(f"{mobil['merek']} {mobil['model']} {mobil['kategori']}")), mobil.get("spesifikasi", ""))
+                for mobil in daftar_mobil
+            ),
+        )
+        db.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", (get_data_version(list(daftar_mobil)),))
+        db.commit()
+    finally:
+        db.close()
+
+    os.replace(tmp_path, path)
+
+
+def _fts_query(text: str, operator: str) -> str:
+    terms = [f'"{token}"*' for token in _TOKEN_RE.findall(text.lower())]
+    return f" {operator} ".join(terms)
+
+
+class SQLiteInventory(Sequence):
+    """
+    daftar_mobil yang dibaca dari SQLite secara lazy (read-only)
+
+    - Bisa dipakai seperti list (len, iterasi, index), baris diambil per halaman
+    - Index di merek, kategori, harga, cicilan, dan tahun untuk filter terstruktur
+    - FTS5 untuk pencarian nama mobil dan teks spesifikasi
+    - Menyediakan interface yang sama dengan CatalogIndex (search, filter,
+      match_text, labels), sehingga get_catalog_index tidak membangun index
+      di memori untuk backend ini
+    """
+
+    def __init__(self, path: str, page_size: int = DEFAULT_PAGE_SIZE):
+        self.path = path
+        self.page_size = page_size
+        self._local = threading.local()
+        self._summary: Optional[List[Dict]] = None
+
+        db = self._db()
+        self.version = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        self._count = db.execute("SELECT COUNT(*) FROM mobil").fetchone()[0]
+
+        # Nama merek/kategori (lowercase -> jumlah mobil) untuk parse_filter_query
+        self.by_merek = dict(db.execute("SELECT LOWER(merek), COUNT(*) FROM mobil GROUP BY LOWER(merek)"))
+        self.by_kategori = dict(db.execute("SELECT LOWER(kategori), COUNT(*) FROM mobil GROUP BY LOWER(kategori)"))
+        self.labels: Dict[str, str] = {}
+        for (name,) in db.execute("SELECT DISTINCT merek FROM mobil UNION SELECT DISTINCT kategori FROM mobil"):
+            self.labels[name.lower()] = name
+
+        # Token nama mobil (sama dengan CatalogIndex.name_terms)
+        self.name_terms = frozenset(
+            token for row in db.execute("SELECT DISTINCT merek, model, kategori FROM mobil") for token in tokenize(" ".join(row))
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        # Satu koneksi read-only per thread (sqlite3 tidak boleh dipakai lintas thread)
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def _rows(self, sql: str, params=()) -> List[Dict]:
+        return [dict(row) for row in self._db().execute(sql, params)]
+
+    def __repr__(self) -> str:
+        # Dipakai juga oleh hash versi data showroom (json.dumps default=str)
+        return f"SQLiteInventory({self.path!r}, version={self.version!r})"
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._count)
+            if step != 1:
+                return list(self)[item]
+            return self._rows(f"{_SELECT} ORDER BY id LIMIT ? OFFSET ?", (max(stop - start, 0), start))
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("index mobil di luar jangkauan")
+        return self._rows(f"{_SELECT} ORDER BY id LIMIT 1 OFFSET ?", (item,))[0]
+
+    def __iter__(self) -> Iterator[Dict]:
+        for page in self.iter_pages():
+            yield from page
+
+    def iter_pages(self, page_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Mengambil semua mobil per halaman (keyset pagination berdasarkan id)
+
+        Args:
+            page_size: Jumlah baris per halaman (default self.page_size)
+
+        Yields:
+            List mobil per halaman
+        """
+        page_size = page_size or self.page_size
+        last_id = None
+        while True:
+            if last_id is None:
+                page = self._rows(f"{_SELECT} ORDER BY id LIMIT ?", (page_size,))
+            else:
+                page = self._rows(f"{_SELECT} WHERE id > ? ORDER BY id LIMIT ?", (last_id, page_size))
+            if not page:
+                return
+            yield page
+            last_id = page[-1]["id"]
+
+    def get_by_id(self, mobil_id: int) -> Optional[Dict]:
+        """Mengambil mobil berdasarkan id"""
+        rows = self._rows(f"{_SELECT} WHERE id = ?", (mobil_id,))
+        return rows[0] if rows else None
+
+    def search(self, keyword: str) -> List[Dict]:
+        """
+        Mencari mobil yang cocok dengan semua kata pada keyword (FTS5, prefix)
+
+        Berbeda dengan CatalogIndex, backend ini tidak mentoleransi typo.
+
+        Args:
+            keyword: Kata kunci (merek, model, kategori, atau spesifikasi)
+
+        Returns:
+            List mobil yang cocok, sesuai urutan katalog
+        """
+        query = _fts_query(keyword, "AND")
+        if not query:
+            return []
+        return self._rows(
+            f"{_SELECT} WHERE id IN (SELECT rowid FROM mobil_fts WHERE mobil_fts MATCH ?) ORDER BY id",
+            (query,),
+        )
+
+    def match_text(self, text: str, limit: int = 5, min_ratio: float = 0.5, ignore: Collection[str] = ()) -> List[Dict]:
+        """
+        Mencari mobil yang disebut dalam kalimat bebas (ranking bm25 FTS5)
+
+        Args:
+            text: Kalimat bebas
+            limit: Jumlah maksimal mobil yang dikembalikan
+            min_ratio: Skor minimal relatif terhadap skor tertinggi
+            ignore: Token yang tidak dihitung (misalnya merek/kategori yang sudah jadi filter)
+
+        Returns:
+            List mobil paling relevan, skor tertinggi di depan
+        """
+        tokens = [
+            token for token in set(_TOKEN_RE.findall(text.lower()))
+            if len(token) >= 3 and any(ch.isalpha() for ch in token) and token not in ignore
+        ]
+        if not tokens:
+            return []
+
+        # Hanya kolom nama (merek/model/kategori), sama seperti CatalogIndex.match_text
+        query = " OR ".join(f'kata : "{token}"' + ("*" if len(token) >= 4 else "") for token in sorted(tokens))
+        ranked = self._db().execute(
+            "SELECT rowid, bm25(mobil_fts) AS score FROM mobil_fts WHERE mobil_fts MATCH ? ORDER BY score, rowid LIMIT ?",
+            (query, limit * 4),
+        ).fetchall()
+        if not ranked:
+            return []
+
+        # bm25 di SQLite bernilai negatif (lebih kecil = lebih relevan)
+        cutoff = ranked[0]["score"] * min_ratio
+        ids = [row["rowid"] for row in ranked if row["score"] <= cutoff][:limit]
+        by_id = {mobil["id"]: mobil for mobil in self._rows(f"{_SELECT} WHERE id IN ({', '.join('?' * len(ids))})", ids)}
+        return [by_id[mobil_id] for mobil_id in ids]
+
+    def _where(self, car_filter: CarFilter):
+        clauses, params = [], []
+        for field in NUMERIC_FIELDS:
+            low = getattr(car_filter, f"{field}_min")
+            high = getattr(car_filter, f"{field}_max")
+            if low is not None:
+                clauses.append(f"{field} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{field} <= ?")
+                params.append(high)
+
+        if car_filter.kategori:
+            clauses.append(f"kategori COLLATE NOCASE IN ({', '.join('?' * len(car_filter.kategori))})")
+            params.extend(car_filter.kategori)
+        if car_filter.merek:
+            clauses.append(f"merek COLLATE NOCASE IN ({', '.join('?' * len(car_filter.merek))})")
+            params.extend(car_filter.merek)
+        if car_filter.bekas is not None:
+            clauses.append("kategori LIKE '%bekas%'" if car_filter.bekas else "kategori NOT LIKE '%bekas%'")
+
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def filter(self, car_filter: CarFilter, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Menjalankan filter terstruktur di SQLite (memakai index kolom)
+
+        Args:
+            car_filter: Hasil parse_filter_query
+            limit: Jumlah maksimal hasil (None = semua)
+
+        Returns:
+            List mobil yang memenuhi semua batasan
+        """
+        where, params = self._where(car_filter)
+        direction = "DESC" if car_filter.descending else "ASC"
+        sql = f"{_SELECT}{where} ORDER BY {car_filter.sort_by} {direction}, id {direction}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        return self._rows(sql, params)
+
+    def count(self, car_filter: CarFilter) -> int:
+        """Jumlah mobil yang memenuhi filter"""
+        where, params = self._where(car_filter)
+        return self._db().execute(f"SELECT COUNT(*) FROM mobil{where}", params).fetchone()[0]
+
+    def category_summary(self) -> List[Dict]:
+        """
+        Ringkasan per kategori (GROUP BY di SQLite, sama dengan CatalogIndex.category_summary)
+
+        Returns:
+            List dictionary kategori, jumlah, termurah (mobil), harga_max
+        """
+        if self._summary is None:
+            termurah = {
+                mobil["kategori"]: mobil for mobil in self._rows(
+                    f"SELECT {', '.join(_COLUMNS)} FROM ("
+                    f"SELECT *, ROW_NUMBER() OVER (PARTITION BY kategori ORDER BY harga, id) AS urutan FROM mobil"
+                    f") WHERE urutan = 1"
+                )
+            }
+            self._summary = [
+                {"kategori": kategori, "jumlah": jumlah, "termurah": termurah[kategori], "harga_max": harga_max}
+                for kategori, jumlah, harga_max in self._db().execute(
+                    "SELECT kategori, COUNT(*), MAX(harga) FROM mobil GROUP BY kategori ORDER BY MIN(id)"
+                )
+            ]
+        return self._summary
+
+    def as_catalog_index(self) -> "SQLiteInventory":
+        """Dipakai get_catalog_index: backend ini sudah berfungsi sebagai index"""
+        return self
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Pemakaian: python inventory.py <showroom_data.json> <inventory.sqlite3>")
+        sys.exit(1)
+
+    with open(sys.argv[1], encoding="utf-8") as f:
+        source = json.load(f)
+    build_inventory_db(source["daftar_mobil"], sys.argv[2])
+    print(f"✅ {len(source['daftar_mobil'])} mobil ditulis ke {sys.argv[2]}")
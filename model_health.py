@@ -0,0 +1,306 @@
+"""
+model_health.py - Pelacakan kesehatan model Gemini (circuit breaker) untuk fallback chain
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Tuple, Callable, Awaitable
+
+from telemetry import METRICS
+
+# Status circuit breaker
+CLOSED = "closed"        # Model sehat, request berjalan normal
+OPEN = "open"            # Model dilewati sampai masa cooldown habis
+HALF_OPEN = "half_open"  # Cooldown habis, satu request percobaan diizinkan
+
+# Kelas error yang bukan kesalahan model: diblokir safety filter (isi prompt user),
+# API key bermasalah (berlaku untuk semua model), dan timeout yang dipersingkat latency budget
+UNCOUNTED_ERRORS = {"blocked", "auth", "budget"}
+
+
+def classify_error(error_msg: str) -> str:
+    """
+    Mengelompokkan pesan error dari model menjadi kelas error
+
+    Args:
+        error_msg: Pesan error dari try_gemini_model
+
+    Returns:
+        Salah satu dari "not_found", "quota", "auth", "blocked", "budget", atau "other"
+    """
+    msg = error_msg.lower()
+    if "latency budget" in msg:
+        return "budget"
+    if "404" in msg or "not found" in msg or "does not exist" in msg:
+        return "not_found"
+    if "429" in msg or "quota" in msg or "rate limit" in msg or "resource exhausted" in msg or "too many" in msg:
+        return "quota"
+    if "api_key" in msg or "api key" in msg or "unauthorized" in msg or "permission" in msg:
+        return "auth"
+    if "blocked" in msg or "safety" in msg:
+        return "blocked"
+    return "other"
+
+
+class ModelHealth:
+    """Statistik rolling dan status circuit breaker untuk satu model"""
+
+    def __init__(self, window: int):
+        self.results = deque(maxlen=window)  # (success, latency_detik)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.trial_in_flight = False
+        self.last_error = ""
+
+    @property
+    def error_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return sum(1 for success, _ in self.results if not success) / len(self.results)
+
+    @property
+    def avg_latency(self) -> float:
+        latencies = [latency for success, latency in self.results if success]
+        if not latencies:
+            return 0.0
+        return sum(latencies) / len(latencies)
+
+
+class ModelHealthRegistry:
+    """
+    Registry kesehatan model yang dipakai bersama oleh semua session dalam satu proses
+
+    - Mencatat error rate dan latency rolling per model
+    - Membuka circuit setelah kegagalan beruntun (404 dan quota langsung membuka circuit)
+    - Error di UNCOUNTED_ERRORS (safety, auth, timeout karena budget) tidak dihitung
+    - Melewati model yang circuit-nya terbuka
+    - Setelah cooldown, mengizinkan satu request percobaan (half-open)
+    - Mengurutkan fallback chain berdasarkan error rate dan latency yang teramati
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        window: int = 20,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        not_found_cooldown: float = 3600.0,
+        slow_latency: float = 10.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.not_found_cooldown = not_found_cooldown
+        self.slow_latency = slow_latency
+        self._models: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model_name: str) -> ModelHealth:
+        health = self._models.get(model_name)
+        if health is None:
+            health = self._models[model_name] = ModelHealth(self.window)
+        return health
+
+    def _refresh_state(self, health: ModelHealth, now: float):
+        # Cooldown habis: pindah ke half-open dan mulai statistik baru untuk percobaan
+        if health.state == OPEN and now - health.opened_at >= health.cooldown:
+            health.state = HALF_OPEN
+            health.trial_in_flight = False
+            health.results.clear()
+
+    def order_models(self, models: List[str]) -> List[str]:
+        """
+        Menyusun ulang fallback chain berdasarkan kesehatan model
+
+        Args:
+            models: Daftar model sesuai urutan prioritas awal
+
+        Returns:
+            Daftar model yang boleh dicoba, model paling sehat di depan.
+            Jika semua circuit terbuka, berisi satu model dengan cooldown
+            paling cepat habis agar request tetap punya kesempatan.
+        """
+        now = time.monotonic()
+        available = []
+
+        with self._lock:
+            for idx, model_name in enumerate(models):
+                health = self._get(model_name)
+                self._refresh_state(health, now)
+
+                if health.state == OPEN:
+                    continue
+                if health.state == HALF_OPEN and health.trial_in_flight:
+                    continue
+
+                # Error rate dibulatkan per 25% agar urutan tidak berubah karena satu kegagalan acak
+                error_bucket = round(health.error_rate * 4)
+                is_slow = health.avg_latency > self.slow_latency
+                available.append((error_bucket, is_slow, idx, model_name))
+
+            if not available and models:
+                soonest = min(
+                    models,
+                    key=lambda m: self._models[m].opened_at + self._models[m].cooldown,
+                )
+                return [soonest]
+
+        return [entry[-1] for entry in sorted(available)]
+
+    def call(self, model_name: str, fn: Callable[..., Tuple[bool, str]], *args: Any) -> Tuple[bool, str]:
+        """
+        Menjalankan satu percobaan model sambil mencatat hasil dan latency-nya
+
+        Args:
+            model_name: Nama model yang dicoba
+            fn: Fungsi percobaan yang mengembalikan (success, response)
+            *args: Argumen untuk fn
+
+        Returns:
+            Tuple (success, response) dari fn
+        """
+        self.begin_attempt(model_name)
+        start = time.monotonic()
+        success, response = fn(*args)
+        self.record(model_name, success, time.monotonic() - start, "" if success else response)
+        return success, response
+
+    async def call_async(self, model_name: str, fn: Callable[..., Awaitable[Tuple[bool, str]]], *args: Any) -> Tuple[bool, str]:
+        """
+        Versi async dari call untuk fungsi percobaan berupa coroutine
+
+        Percobaan yang dibatalkan (misalnya kalah di hedged request) tidak
+        dicatat sebagai hasil, tetapi slot percobaan half-open dilepas.
+
+        Returns:
+            Tuple (success, response) dari fn
+        """
+        self.begin_attempt(model_name)
+        start = time.monotonic()
+        try:
+            success, response = await fn(*args)
+        except asyncio.CancelledError:
+            self.release_attempt(model_name)
+            raise
+        self.record(model_name, success, time.monotonic() - start, "" if success else response)
+        return success, response
+
+    def begin_attempt(self, model_name: str):
+        """
+        Menandai awal satu percobaan model (dipanggil sebelum request dikirim)
+
+        Saat circuit half-open, model tidak ditawarkan lagi oleh order_models
+        sampai hasil percobaan ini dicatat lewat record atau release_attempt.
+
+        Args:
+            model_name: Nama model yang dicoba
+        """
+        with self._lock:
+            health = self._get(model_name)
+            if health.state == HALF_OPEN:
+                health.trial_in_flight = True
+
+    def release_attempt(self, model_name: str):
+        """Melepas slot percobaan half-open tanpa mencatat hasil (percobaan dibatalkan)"""
+        with self._lock:
+            self._get(model_name).trial_in_flight = False
+
+    def record(self, model_name: str, success: bool, latency: float, error_msg: str = ""):
+        """
+        Mencatat hasil satu request dan memperbarui status circuit breaker
+
+        Args:
+            model_name: Nama model
+            success: Apakah request berhasil
+            latency: Durasi request dalam detik
+            error_msg: Pesan error jika gagal
+        """
+        now = time.monotonic()
+
+        error_class = "" if success else classify_error(error_msg)
+
+        with self._lock:
+            health = self._get(model_name)
+
+            if error_class in UNCOUNTED_ERRORS:
+                # Bukan kesalahan model: status circuit tidak berubah, percobaan half-open diulang
+                health.last_error = error_msg[:200]
+                health.trial_in_flight = False
+                return
+
+            health.results.append((success, latency))
+
+            if success:
+                health.state = CLOSED
+                health.consecutive_failures = 0
+                health.cooldown = 0.0
+                health.trial_in_flight = False
+                return
+
+            health.consecutive_failures += 1
+            health.last_error = error_msg[:200]
+
+            if error_class == "not_found":
+                # Model tidak ada, tidak perlu dicoba lagi dalam waktu dekat
+                self._open(health, now, self.not_found_cooldown)
+            elif health.state == HALF_OPEN:
+                # Percobaan gagal, buka lagi dengan cooldown yang lebih panjang
+                self._open(health, now, min(max(health.cooldown, self.base_cooldown) * 2, self.max_cooldown))
+            elif error_class == "quota" or health.consecutive_failures >= self.failure_threshold:
+                self._open(health, now, self.base_cooldown)
+
+    def _open(self, health: ModelHealth, now: float, cooldown: float):
+        health.state = OPEN
+        health.opened_at = now
+        health.cooldown = cooldown
+        health.trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Ringkasan kesehatan semua model yang pernah dicoba
+
+        Returns:
+            Dictionary nama model -> status, error rate, latency, dan error terakhir
+        """
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for model_name, health in self._models.items():
+                self._refresh_state(health, now)
+                result[model_name] = {
+                    "state": health.state,
+                    "error_rate": round(health.error_rate, 2),
+                    "avg_latency": round(health.avg_latency, 3),
+                    "samples": len(health.results),
+                    "consecutive_failures": health.consecutive_failures,
+                    "cooldown_remaining": round(max(0.0, health.opened_at + health.cooldown - now), 1) if health.state == OPEN else 0.0,
+                    "last_error": health.last_error,
+                }
+            return result
+
+    def reset(self):
+        """Menghapus semua statistik (misalnya setelah API key diganti)"""
+        with self._lock:
+            self._models.clear()
+
+
+# Registry global, dipakai bersama oleh semua session Streamlit dalam satu proses
+MODEL_HEALTH = ModelHealthRegistry()
+
+
+def _health_gauge(field: str) -> Callable[[], List[Tuple[Dict[str, Any], float]]]:
+    return lambda: [({"model": m}, h[field]) for m, h in MODEL_HEALTH.snapshot().items()]
+
+
+# Status circuit breaker per model dibaca saat metrik diekspor
+METRICS.gauge("chatbot_model_state", "Status model, bernilai 1 (label: model, state = closed / open / half_open)",
+              lambda: [({"model": m, "state": h["state"]}, 1) for m, h in MODEL_HEALTH.snapshot().items()])
+METRICS.gauge("chatbot_model_error_rate", "Error rate jendela terakhir (label: model)", _health_gauge("error_rate"))
+METRICS.gauge("chatbot_model_avg_latency_seconds", "Rata-rata latency jendela terakhir (label: model)", _health_gauge("avg_latency"))
+METRICS.gauge("chatbot_model_consecutive_failures", "Kegagalan berturut-turut (label: model)", _health_gauge("consecutive_failures"))
+METRICS.gauge("chatbot_model_cooldown_seconds", "Sisa cooldown model yang dilewati (label: model)", _health_gauge("cooldown_remaining"))
@@ -0,0 +1,232 @@
+"""
+prompt_builder.py - Menyusun prompt dalam batas token (estimasi murah, isi berdasarkan prioritas)
+"""
+
+import math
+from typing import List, Dict, Optional, Tuple
+
+# Bagian yang dipotong minimal sepanjang ini (lebih pendek dari ini tidak berguna bagi model)
+MIN_TRUNCATED_TOKENS = 16
+
+# Rata-rata karakter per token (teks Bahasa Indonesia + angka; sengaja sedikit melebihkan jumlah token)
+CHARS_PER_TOKEN = 3.5
+
+_TRUNCATION_MARK = " … [dipotong] … "
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimasi jumlah token tanpa memanggil tokenizer/API
+
+    Args:
+        text: Teks yang akan dihitung
+
+    Returns:
+        Perkiraan jumlah token
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """
+    Memotong teks agar muat dalam jumlah token tertentu
+
+    Args:
+        text: Teks asli
+        max_tokens: Batas token
+        keep_tail: Simpan juga bagian akhir teks (untuk pesan user yang panjang)
+
+    Returns:
+        Teks yang sudah dipotong (atau teks asli jika sudah muat)
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    max_chars = max(int(max_tokens * CHARS_PER_TOKEN) - len(_TRUNCATION_MARK), 0)
+    if keep_tail:
+        head = max_chars * 2 // 3
+        return text[:head].rstrip() + _TRUNCATION_MARK + text[len(text) - (max_chars - head):].lstrip()
+    return text[:max_chars].rstrip() + _TRUNCATION_MARK.rstrip()
+
+
+class PromptSection:
+    """
+    Satu bagian prompt beserta prioritas dan cara memperkecilnya
+
+    prefix/suffix hanya dipakai saat prompt disusun sebagai satu teks;
+    role menandai jenis bagian untuk prompt terstruktur (system, context,
+    user, model, question, header).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        text: str,
+        priority: int,
+        required: bool = False,
+        fallback: Optional[str] = None,
+        truncatable: bool = False,
+        prefix: str = "",
+        suffix: str = "\n\n",
+        role: str = "context",
+    ):
+        self.name = name
+        self.text = text
+        self.original = text
+        self.prefix = prefix
+        self.role = role
+        self.priority = priority
+        self.required = required
+        self.fallback = fallback
+        self.truncatable = truncatable
+        self.suffix = suffix
+        self.state = "full"   # full, fallback, truncated, dropped
+
+    def _overhead(self) -> int:
+        return estimate_tokens(self.prefix + self.suffix)
+
+    def candidates(self, max_tokens: int) -> List[Tuple[str, str]]:
+        """
+        Versi bagian yang muat dalam max_tokens, dari yang paling lengkap
+
+        Args:
+            max_tokens: Batas token bagian (termasuk prefix/suffix)
+
+        Returns:
+            List tuple (state, text)
+        """
+        options = [("full", self.original)]
+        base = self.original
+        if self.fallback is not None and len(self.fallback) < len(self.original):
+            options.append(("fallback", self.fallback))
+            base = self.fallback
+        if self.truncatable:
+            # Estimasi dibulatkan ke atas per bagian, jadi target dikurangi sampai benar-benar muat
+            target = max_tokens - self._overhead()
+            while target >= MIN_TRUNCATED_TOKENS:
+                text = truncate_to_tokens(base, target, keep_tail=self.required)
+                if estimate_tokens(self.prefix + text + self.suffix) <= max_tokens:
+                    options.append(("truncated", text))
+                    break
+                target -= 1
+        return [
+            (state, text) for state, text in options
+            if estimate_tokens(self.prefix + text + self.suffix) <= max_tokens
+        ]
+
+    @property
+    def tokens(self) -> int:
+        if self.state == "dropped":
+            return 0
+        return estimate_tokens(self.prefix + self.text + self.suffix)
+
+
+class PromptBuilder:
+    """
+    Menyusun prompt dari beberapa bagian tanpa melewati budget token
+
+    Bagian ditambahkan sesuai urutan tampil di prompt. Jika total melebihi
+    budget, bagian dengan prioritas paling rendah (angka priority terbesar)
+    diperkecil lebih dulu: diganti versi ringkas (fallback) atau dipotong
+    (truncatable). Jika semua sudah diperkecil dan masih melebihi budget,
+    bagian dibuang dengan urutan yang sama. Bagian required tidak pernah dibuang.
+
+    Pengecilan berjalan bertahap sehingga bisa berlebihan (misalnya promo
+    sudah dipotong habis sebelum daftar mobil diganti versi ringkasnya).
+    Setelah itu sisa budget dibagikan lagi ke bagian yang sudah diperkecil,
+    mulai dari prioritas tertinggi, agar budget terpakai semaksimal mungkin.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.sections: List[PromptSection] = []
+        self.report: Dict = {}
+
+    def add(self, name: str, text: str, priority: int, **options) -> "PromptBuilder":
+        """
+        Menambahkan bagian prompt (lihat PromptSection untuk opsi)
+
+        Args:
+            name: Nama bagian (untuk laporan)
+            text: Isi bagian
+            priority: 0 = paling penting, makin besar makin cepat dikorbankan
+
+        Returns:
+            PromptBuilder yang sama (bisa dirangkai)
+        """
+        if text:
+            self.sections.append(PromptSection(name, text, priority, **options))
+        return self
+
+    def kept_sections(self) -> List[PromptSection]:
+        """Bagian yang tidak dibuang (setelah build), sesuai urutan tampil"""
+        return [section for section in self.sections if section.state != "dropped"]
+
+    def total_tokens(self) -> int:
+        return sum(section.tokens for section in self.sections)
+
+    def _shrink(self, section: PromptSection, overflow: int, allow_drop: bool) -> bool:
+        # Mengembalikan True jika bagian berhasil diperkecil
+        if section.state == "full" and section.fallback is not None and len(section.fallback) < len(section.text):
+            section.text, section.state = section.fallback, "fallback"
+            return True
+        if section.truncatable and section.state != "truncated":
+            target = max(section.tokens - overflow, MIN_TRUNCATED_TOKENS)
+            if target < section.tokens:
+                section.text = truncate_to_tokens(section.text, target, keep_tail=section.required)
+                section.state = "truncated"
+                return True
+        if allow_drop and not section.required and section.state != "dropped":
+            section.state = "dropped"
+            return True
+        return False
+
+    def _expand(self, section: PromptSection, slack: int) -> None:
+        # Pakai versi paling lengkap yang muat dalam token bagian sekarang + sisa budget
+        current = section.tokens
+        for state, text in section.candidates(current + slack):
+            if state == section.state and text == section.text:
+                return
+            if estimate_tokens(section.prefix + text + section.suffix) > current or section.state == "dropped":
+                section.text, section.state = text, state
+                return
+
+    def build(self) -> str:
+        """
+        Menyusun prompt akhir dan mengisi self.report
+
+        Returns:
+            String prompt (estimasi token <= budget, kecuali bagian required saja sudah melebihi)
+        """
+        # Urutan pengorbanan: prioritas terendah dulu, bagian yang tampil lebih akhir dulu jika sama
+        order = sorted(range(len(self.sections)), key=lambda i: (-self.sections[i].priority, -i))
+
+        for allow_drop in (False, True):
+            for i in order:
+                overflow = self.total_tokens() - self.budget
+                if overflow <= 0:
+                    break
+                # Satu bagian bisa diperkecil bertahap (fallback lalu dipotong)
+                while overflow > 0 and self._shrink(self.sections[i], overflow, allow_drop):
+                    overflow = self.total_tokens() - self.budget
+
+        # Sisa budget dikembalikan ke bagian yang diperkecil, prioritas tertinggi dulu
+        for i in reversed(order):
+            slack = self.budget - self.total_tokens()
+            if slack <= 0:
+                break
+            if self.sections[i].state != "full":
+                self._expand(self.sections[i], slack)
+
+        text = "".join(section.prefix + section.text + section.suffix for section in self.kept_sections())
+        self.report = {
+            "budget": self.budget,
+            "tokens": estimate_tokens(text),
+            "sections": {section.name: section.tokens for section in self.sections if section.state != "dropped"},
+            "shrunk": [
+                (section.name, section.state) for section in self.sections if section.state != "full"
+            ],
+        }
+        return text
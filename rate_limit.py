@@ -0,0 +1,275 @@
+"""
+rate_limit.py - Token bucket per model Gemini + antrian adil antar session
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict, Optional, Tuple
+
+from telemetry import METRICS
+
+# Batas request per menit (RPM) per model, sesuai kuota free tier Gemini API
+# (ditimpa per model lewat GEMINI_RATE_LIMITS, 0 = tanpa batas)
+DEFAULT_RATE_LIMITS = {
+    'gemini-2.5-flash': 10,
+    'gemini-2.5-flash-lite': 15,
+    'gemini-2.5-pro': 5,
+    'gemini-3-pro': 5,
+}
+
+# Model murah yang didahulukan saat model utama kehabisan kuota
+OVERFLOW_MODELS = ('gemini-2.5-flash-lite',)
+
+# Jeda maksimal antar pengecekan antrian (detik)
+_MAX_DISPATCH_SLEEP = 1.0
+
+
+def parse_rate_limits(value: str) -> Dict[str, int]:
+    """
+    Membaca batas RPM dari teks konfigurasi
+
+    Contoh: "gemini-2.5-flash=1000,gemini-2.5-pro=150" (0 = tanpa batas untuk model itu)
+
+    Args:
+        value: Pasangan model=rpm dipisah koma
+
+    Returns:
+        Dictionary nama model -> RPM
+    """
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model_name, rpm = item.split("=", 1)
+            limits[model_name.strip()] = int(rpm)
+    return limits
+
+
+class TokenBucket:
+    """
+    Token bucket untuk satu model
+
+    Kapasitas burst diambil dari RPM dan laju isi ulang dikurangi sebesar
+    burst itu, sehingga dalam jendela 60 detik mana pun jumlah request tidak
+    pernah melebihi RPM (request tidak dikirim jika pasti kena 429).
+    """
+
+    def __init__(self, rpm: int):
+        self.rpm = rpm
+        self.capacity = max(1, rpm // 5)
+        self.rate = max(rpm - self.capacity, 1) / 60.0   # token per detik
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def peek(self) -> float:
+        """Token tersedia saat ini tanpa mengubah state (aman dibaca dari thread lain)"""
+        return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+    def try_take(self) -> bool:
+        """Mengambil satu token jika tersedia"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self) -> float:
+        """Detik sampai satu token tersedia (0 jika sudah tersedia)"""
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class QueueTicket:
+    """
+    Status antrian satu request, dibaca oleh UI selama request menunggu
+
+    position 0 berarti request tidak (lagi) mengantri.
+    """
+
+    def __init__(self, session_id: str = ""):
+        self.session_id = session_id
+        self.position = 0
+        self.wait_estimate = 0.0
+
+
+class _Waiter:
+    def __init__(self, models: List[str], future: asyncio.Future, ticket: QueueTicket):
+        self.models = models
+        self.future = future
+        self.ticket = ticket
+
+
+class RateLimiter:
+    """
+    Pembatas request ke Gemini yang dipakai bersama oleh semua session
+
+    - Satu token bucket per model (model tanpa batas selalu diizinkan)
+    - Model pertama di daftar didahulukan; jika kuotanya habis, request
+      dialihkan ke model murah (OVERFLOW_MODELS) lalu model lain
+    - Jika semua model di daftar kehabisan kuota, request menunggu di
+      antrian yang adil: giliran berputar antar session sehingga satu
+      session yang mengirim banyak pesan tidak menahan session lain
+
+    Semua method async harus dipanggil dari event loop bersama (ASYNC_RUNNER).
+    """
+
+    def __init__(self, limits: Dict[str, int], overflow_models: Tuple[str, ...] = OVERFLOW_MODELS):
+        self.buckets = {model_name: TokenBucket(rpm) for model_name, rpm in limits.items() if rpm > 0}
+        self.overflow_models = overflow_models
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()   # session -> waiter
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _candidates(self, models: List[str]) -> List[str]:
+        # Model utama dulu, lalu model overflow, lalu sisanya sesuai urutan
+        if not models:
+            return []
+        rest = models[1:]
+        return [models[0]] + [m for m in rest if m in self.overflow_models] + [m for m in rest if m not in self.overflow_models]
+
+    def try_acquire(self, models: List[str]) -> Optional[str]:
+        """
+        Mengambil kuota dari model pertama yang masih punya token, tanpa menunggu
+
+        Args:
+            models: Daftar model sesuai urutan prioritas
+
+        Returns:
+            Nama model yang boleh dipanggil, None jika semua kuota habis
+        """
+        for model_name in self._candidates(models):
+            bucket = self.buckets.get(model_name)
+            if bucket is None or bucket.try_take():
+                return model_name
+        return None
+
+    async def acquire(self, models: List[str], ticket: Optional[QueueTicket] = None) -> str:
+        """
+        Mengambil kuota salah satu model, menunggu di antrian jika semua habis
+
+        Args:
+            models: Daftar model sesuai urutan prioritas (tidak boleh kosong)
+            ticket: Status antrian yang diperbarui selama menunggu
+
+        Returns:
+            Nama model yang boleh dipanggil
+        """
+        ticket = ticket or QueueTicket()
+
+        # Request baru tidak boleh menyalip antrian yang sudah ada
+        if not self._queues:
+            model_name = self.try_acquire(models)
+            if model_name is not None:
+                return model_name
+
+        waiter = _Waiter(list(models), asyncio.get_running_loop().create_future(), ticket)
+        self._queues.setdefault(ticket.session_id, deque()).append(waiter)
+        self._update_positions()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        try:
+            return await waiter.future
+        finally:
+            ticket.position, ticket.wait_estimate = 0, 0.0
+            # Dibatalkan saat menunggu (user meninggalkan halaman / timeout): keluar dari antrian
+            self._remove(waiter)
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.ticket.session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.ticket.session_id]
+            self._update_positions()
+
+    def _round_robin(self) -> List[_Waiter]:
+        # Urutan giliran: waiter pertama tiap session, lalu waiter kedua tiap session, dst.
+        order = []
+        depth = 0
+        while True:
+            layer = [queue[depth] for queue in self._queues.values() if len(queue) > depth]
+            if not layer:
+                return order
+            order.extend(layer)
+            depth += 1
+
+    def _update_positions(self):
+        for position, waiter in enumerate(self._round_robin(), 1):
+            models = set(waiter.models)
+            buckets = [self.buckets[m] for m in models if m in self.buckets]
+            waiter.ticket.position = position
+            if len(buckets) < len(models):
+                # Ada model tanpa batas, request segera dilayani
+                waiter.ticket.wait_estimate = 0.0
+            else:
+                ready = min(bucket.time_until_available() for bucket in buckets)
+                waiter.ticket.wait_estimate = ready + (position - 1) / sum(bucket.rate for bucket in buckets)
+
+    async def _dispatch(self):
+        while self._queues:
+            granted = False
+            for waiter in self._round_robin():
+                if waiter.future.done():
+                    continue
+                model_name = self.try_acquire(waiter.models)
+                if model_name is None:
+                    continue
+                waiter.future.set_result(model_name)
+                session_id = waiter.ticket.session_id
+                queue = self._queues[session_id]
+                queue.remove(waiter)
+                # Session yang baru dilayani pindah ke belakang giliran
+                del self._queues[session_id]
+                if queue:
+                    self._queues[session_id] = queue
+                granted = True
+                break
+
+            self._update_positions()
+            if granted:
+                continue
+
+            # Tidur sampai token terdekat tersedia untuk salah satu waiter
+            needed = {m for queue in self._queues.values() for waiter in queue for m in waiter.models}
+            delays = [self.buckets[m].time_until_available() for m in needed if m in self.buckets]
+            await asyncio.sleep(min(min(delays, default=_MAX_DISPATCH_SLEEP), _MAX_DISPATCH_SLEEP) + 0.01)
+
+    @property
+    def queue_length(self) -> int:
+        """Jumlah request yang sedang mengantri"""
+        return sum(len(queue) for queue in list(self._queues.values()))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Sisa kuota per model
+
+        Returns:
+            Dictionary nama model -> rpm, token tersisa, dan detik sampai token berikutnya
+        """
+        # Dibaca juga dari thread exporter metrik, jadi bucket tidak di-refill di sini
+        snapshot = {}
+        for model_name, bucket in list(self.buckets.items()):
+            tokens = bucket.peek()
+            snapshot[model_name] = {
+                "rpm": bucket.rpm,
+                "tokens": round(tokens, 2),
+                "next_in": round(max(0.0, (1 - tokens) / bucket.rate), 1),
+            }
+        return snapshot
+
+
+# Limiter global, dipakai bersama oleh semua session Streamlit dalam satu proses
+RATE_LIMITER = RateLimiter({**DEFAULT_RATE_LIMITS, **parse_rate_limits(os.getenv("GEMINI_RATE_LIMITS", ""))})
+
+# Antrian dan sisa kuota dibaca saat metrik diekspor (/metrics, /metrics.json, file JSON)
+METRICS.gauge("chatbot_rate_limit_queue_length", "Request yang sedang menunggu kuota",
+              lambda: [({}, RATE_LIMITER.queue_length)])
+METRICS.gauge("chatbot_rate_limit_tokens", "Token tersisa per model (label: model)",
+              lambda: [({"model": m}, s["tokens"]) for m, s in RATE_LIMITER.snapshot().items()])
+METRICS.gauge("chatbot_rate_limit_next_token_seconds", "Detik sampai token berikutnya (label: model)",
+              lambda: [({"model": m}, s["next_in"]) for m, s in RATE_LIMITER.snapshot().items()])
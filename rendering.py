@@ -0,0 +1,255 @@
+"""
+rendering.py - Teks katalog & promo yang disusun sekali per versi data (fragmen per mobil + cache per kategori)
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from data import get_data_version
+
+LIST_TITLE = "📋 **DAFTAR MOBIL KAMI:**"
+PROMO_TITLE = "🎉 **PROMOSI SPESIAL BULAN INI:**"
+PROMO_FOOTER = "⏰ *Tawaran terbatas! Jangan lewatkan kesempatan ini.* 🚗"
+
+
+def format_currency(amount: int) -> str:
+    """
+    Format angka menjadi currency Rupiah
+
+    Args:
+        amount: Jumlah dalam rupiah
+
+    Returns:
+        String dengan format Rp X.XXX.XXX
+    """
+    return f"Rp {amount:,.0f}".replace(",", ".")
+
+
+def _format_memo(amount: int, memo: Dict[int, str]) -> str:
+    # Harga/cicilan katalog banyak yang sama (dibulatkan per juta / ratus ribu), cukup diformat sekali
+    text = memo.get(amount)
+    if text is None:
+        text = memo[amount] = format_currency(amount)
+    return text
+
+
+def _signature(mobil: Dict) -> Tuple:
+    # Field yang tampil di fragmen; fragmen lama dipakai ulang selama nilainya sama
+    return (mobil['id'], mobil['merek'], mobil['model'], mobil['tahun'], mobil['kategori'], mobil['harga'], mobil['cicilan'])
+
+
+class CarFragments:
+    """Potongan teks satu mobil yang sudah diformat (harga, cicilan, judul)"""
+
+    __slots__ = ("signature", "header", "price", "installment")
+
+    def __init__(self, mobil: Dict, signature: Optional[Tuple] = None, currency: Optional[Dict[int, str]] = None):
+        self.signature = signature or _signature(mobil)
+        self.header = f"{mobil['merek']} {mobil['model']} ({mobil['tahun']})"
+        if currency is None:
+            self.price = format_currency(mobil['harga'])
+            self.installment = format_currency(mobil['cicilan'])
+        else:
+            self.price = _format_memo(mobil['harga'], currency)
+            self.installment = _format_memo(mobil['cicilan'], currency)
+
+    def list_line(self) -> str:
+        """Baris daftar mobil: "Merek Model (tahun) - Rp ..." """
+        return f"{self.header} - {self.price}"
+
+    def filter_line(self) -> str:
+        """Baris hasil filter: harga dan cicilan promo katalog"""
+        return f"{self.header} - {self.price} | cicilan promo {self.installment}/bulan"
+
+    def info(self, mobil: Dict) -> str:
+        """Blok detail mobil (lihat helper.format_mobil_info)"""
+        return (
+            f"🚗 **{mobil['merek']} {mobil['model']}** ({mobil['tahun']})\n\n"
+            f"Spesifikasi: {mobil['spesifikasi']}\n"
+            f"Harga: {self.price}\n"
+            # Field cicilan adalah angka promo dari data katalog, bukan hasil FinancingMatrix;
+            # DP & tenor-nya tidak tercatat sehingga tidak diklaim di sini
+            f"Cicilan promo: {self.installment}/bulan (angka katalog, hitungan per DP & tenor lewat simulasi kredit)"
+        )
+
+
+class CatalogRenderer:
+    """
+    Teks katalog untuk satu versi daftar_mobil
+
+    - Fragmen tiap mobil (judul, harga, cicilan) dibuat sekali saat renderer
+      dibangun; fragmen dari renderer versi sebelumnya dipakai ulang untuk
+      mobil yang tidak berubah
+    - Teks per kategori disusun sekali (satu join) saat pertama dibutuhkan,
+      dan kategori yang isinya sama dengan versi sebelumnya langsung dipakai ulang
+    - Daftar lengkap disusun dari teks per kategori dan disimpan, sehingga
+      render berikutnya hanya berupa lookup
+    """
+
+    def __init__(self, daftar_mobil: List[Dict], previous: Optional["CatalogRenderer"] = None):
+        reusable = previous._by_signature if previous is not None else {}
+        self._by_signature: Dict[Tuple, CarFragments] = {}
+        self._by_id: Dict[Any, CarFragments] = {}
+        categories: Dict[str, List[CarFragments]] = {}
+        currency: Dict[int, str] = {}
+
+        for mobil in daftar_mobil:
+            signature = _signature(mobil)
+            fragments = reusable.get(signature)
+            if fragments is None:
+                fragments = CarFragments(mobil, signature, currency)
+            self._by_signature[signature] = fragments
+            self._by_id[mobil['id']] = fragments
+            categories.setdefault(mobil['kategori'], []).append(fragments)
+
+        # Urutan kategori sesuai kemunculan pertama di daftar_mobil
+        self.categories: Dict[str, Tuple[CarFragments, ...]] = {kategori: tuple(items) for kategori, items in categories.items()}
+        self._sections: Dict[str, str] = {}
+        self._list_text: Optional[str] = None
+
+        if previous is not None:
+            for kategori, items in self.categories.items():
+                # Fragmen yang sama (objek yang sama) dengan urutan yang sama berarti teksnya juga sama
+                if kategori in previous._sections and previous.categories.get(kategori) == items:
+                    self._sections[kategori] = previous._sections[kategori]
+
+    def fragment(self, mobil: Dict) -> CarFragments:
+        """
+        Fragmen untuk satu mobil (dibuat baru jika mobil bukan dari versi katalog ini)
+
+        Args:
+            mobil: Dictionary data mobil
+
+        Returns:
+            CarFragments mobil tersebut
+        """
+        fragments = self._by_id.get(mobil['id'])
+        if fragments is None or fragments.signature != _signature(mobil):
+            fragments = CarFragments(mobil)
+        return fragments
+
+    def section(self, kategori: str) -> str:
+        """Teks satu kategori: judul kategori + daftar mobil bernomor"""
+        text = self._sections.get(kategori)
+        if text is None:
+            lines = [f"**{kategori}:**"]
+            lines.extend(f"{i}. {fragments.list_line()}" for i, fragments in enumerate(self.categories.get(kategori, ()), 1))
+            text = self._sections[kategori] = "\n".join(lines)
+        return text
+
+    def render_list(self) -> str:
+        """Daftar mobil lengkap per kategori (sama dengan helper.format_daftar_mobil)"""
+        text = self._list_text
+        if text is None:
+            if not self.categories:
+                text = LIST_TITLE
+            else:
+                text = LIST_TITLE + "\n\n" + "\n\n".join(self.section(kategori) for kategori in self.categories)
+            self._list_text = text
+        return text
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+
+# Cache renderer per versi daftar_mobil, dipakai bersama oleh semua session
+_RENDERER_CACHE: Dict[str, CatalogRenderer] = {}
+_RENDERER_CACHE_LOCK = threading.Lock()
+_RENDERER_CACHE_MAX_ENTRIES = 2
+
+
+def get_catalog_renderer(daftar_mobil: List[Dict]) -> CatalogRenderer:
+    """
+    Mengambil CatalogRenderer untuk daftar_mobil (dibangun ulang hanya jika isinya berubah)
+
+    Saat katalog berubah, renderer baru memakai ulang fragmen dan teks
+    kategori dari versi terakhir untuk mobil/kategori yang tidak berubah.
+
+    Args:
+        daftar_mobil: List dari semua mobil
+
+    Returns:
+        CatalogRenderer siap pakai
+    """
+    version = get_data_version(daftar_mobil)
+
+    renderer = _RENDERER_CACHE.get(version)
+    if renderer is not None:
+        return renderer
+
+    with _RENDERER_CACHE_LOCK:
+        renderer = _RENDERER_CACHE.get(version)
+        if renderer is not None:
+            return renderer
+
+        previous = next(reversed(_RENDERER_CACHE.values()), None)
+        renderer = CatalogRenderer(daftar_mobil, previous)
+        while len(_RENDERER_CACHE) >= _RENDERER_CACHE_MAX_ENTRIES:
+            _RENDERER_CACHE.pop(next(iter(_RENDERER_CACHE)))
+        _RENDERER_CACHE[version] = renderer
+
+    return renderer
+
+
+def get_memory_renderer(daftar_mobil: List[Dict]) -> Optional[CatalogRenderer]:
+    """
+    CatalogRenderer untuk katalog di memori, None untuk inventori SQLite
+
+    Inventori SQLite dibaca per halaman; membangun fragmen semua mobil hanya
+    untuk menampilkan beberapa mobil justru lebih mahal.
+
+    Args:
+        daftar_mobil: List dari semua mobil
+
+    Returns:
+        CatalogRenderer, atau None jika daftar_mobil bukan list di memori
+    """
+    if not isinstance(daftar_mobil, (list, tuple)):
+        return None
+    return get_catalog_renderer(daftar_mobil)
+
+
+def render_promosi(promosi: List[Dict]) -> str:
+    """Daftar promosi bernomor (tanpa cache, lihat get_section_text)"""
+    parts = [PROMO_TITLE]
+    parts.extend(f"{i}. **{promo['judul']}**\n   {promo['deskripsi']}" for i, promo in enumerate(promosi, 1))
+    parts.append(PROMO_FOOTER)
+    return "\n\n".join(parts)
+
+
+# Teks bagian data lain (promo, jam, kontak) per (jenis, versi data)
+_SECTION_CACHE: Dict[Tuple[str, str], str] = {}
+_SECTION_CACHE_LOCK = threading.Lock()
+_SECTION_CACHE_MAX_ENTRIES = 16
+
+
+def get_section_text(kind: str, data: Any, builder: Callable[[Any], str]) -> str:
+    """
+    Teks satu bagian data showroom, disusun sekali per versi data
+
+    Hanya data beku (freeze_data) yang di-cache karena versinya sudah
+    tersedia; data biasa (misalnya subset hasil retrieval) langsung disusun.
+
+    Args:
+        kind: Jenis teks (promosi, jam_operasional, kontak, ...)
+        data: Bagian data showroom
+        builder: Fungsi penyusun teks
+
+    Returns:
+        Teks bagian data
+    """
+    version = getattr(data, "version", None)
+    if version is None:
+        return builder(data)
+
+    key = (kind, version)
+    text = _SECTION_CACHE.get(key)
+    if text is not None:
+        return text
+
+    text = builder(data)
+    with _SECTION_CACHE_LOCK:
+        while len(_SECTION_CACHE) >= _SECTION_CACHE_MAX_ENTRIES:
+            _SECTION_CACHE.pop(next(iter(_SECTION_CACHE)))
+        _SECTION_CACHE[key] = text
+    return text
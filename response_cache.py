@@ -0,0 +1,372 @@
+"""
+response_cache.py - Cache jawaban chatbot untuk pertanyaan yang sama atau mirip
+"""
+
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, List, Dict, Optional, Set, Tuple
+
+from telemetry import get_logger
+
+log = get_logger("response_cache")
+
+# Lokasi default file cache di disk (bertahan walaupun aplikasi di-restart)
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite3")
+
+# Kata yang tidak mengubah makna pertanyaan (diabaikan saat normalisasi)
+STOPWORDS = {
+    "apa", "apakah", "berapa", "berapakah", "yang", "ada", "adakah", "dong", "ya", "yah", "kak", "kakak",
+    "min", "admin", "gan", "sis", "bro", "sih", "nih", "deh", "kah", "itu", "ini", "saya", "aku", "mau",
+    "ingin", "tanya", "nanya", "tolong", "mohon", "bisa", "boleh", "info", "informasi", "dengan", "dan",
+    "atau", "untuk", "buat", "pak", "bu", "halo", "hai", "hi", "selamat", "pagi", "siang", "sore", "malam",
+    "terima", "kasih", "please", "the", "punya", "tentang", "mengenai", "jadi", "kalau", "kalo",
+    "brp", "brapa", "berapaan",
+}
+
+# Kata yang membalik atau mempersempit makna; harus sama persis agar pertanyaan dianggap mirip
+NEGATIONS = {"tidak", "tak", "bukan", "ga", "gak", "nggak", "enggak", "engga", "belum", "tanpa", "jangan", "kurang"}
+QUALIFIERS = {
+    "bekas", "second", "seken", "baru", "murah", "mahal", "termurah", "termahal", "matic", "manual",
+    "otomatis", "diesel", "bensin", "hybrid", "listrik",
+}
+
+# Kata yang menandakan user menyebut data pribadi (jawaban bisa mengulangnya)
+PERSONAL_WORDS = {"nama", "namaku", "panggil", "ktp", "nik", "rumahku", "alamatku", "nomorku"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+
+def tokenize_question(text: str) -> List[str]:
+    """
+    Memecah pertanyaan menjadi token yang sudah dinormalisasi
+
+    Args:
+        text: Teks pertanyaan
+
+    Returns:
+        List token tanpa stopword (akhiran "-nya" dibuang)
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) > 5 and token.endswith("nya"):
+            token = token[:-3]
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normalisasi pertanyaan agar variasi kata pengisi dan huruf besar dianggap sama
+
+    Urutan kata dipertahankan ("avanza dibanding xenia" berbeda dengan
+    "xenia dibanding avanza").
+
+    Contoh: "harga Avanza berapa?" dan "Berapa harga avanza" -> "harga avanza"
+
+    Args:
+        text: Teks pertanyaan
+
+    Returns:
+        String token unik sesuai urutan kemunculan pertama
+    """
+    return " ".join(dict.fromkeys(tokenize_question(text)))
+
+
+def is_cacheable(question: str, conversation_history: List[Dict]) -> bool:
+    """
+    Apakah jawaban untuk pertanyaan ini boleh dipakai bersama semua session
+
+    Cache dibagi lintas session dan disimpan ke disk, jadi hanya pertanyaan
+    pertama (belum ada pesan user sebelumnya) yang tidak menyebut data
+    pribadi yang di-cache. Jawaban pertanyaan lanjutan bergantung pada
+    percakapan dan bisa mengulang data user lain.
+
+    Args:
+        question: Pertanyaan user
+        conversation_history: History percakapan sebelumnya
+
+    Returns:
+        True jika jawaban boleh disimpan dan diambil dari cache
+    """
+    if any(msg["role"] == "user" for msg in conversation_history):
+        return False
+    return not PERSONAL_WORDS.intersection(_TOKEN_RE.findall(question.lower()))
+
+
+def _trigram_vector(text: str) -> Counter:
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
+
+def _strict_tokens(tokens: List[str]) -> Tuple[str, ...]:
+    # Angka (harga, tahun, tenor), negasi, dan kualifier harus sama persis, tidak boleh dianggap "mirip"
+    return tuple(
+        token for token in tokens
+        if token in NEGATIONS or token in QUALIFIERS or any(ch.isdigit() for ch in token)
+    )
+
+
+def question_key(question: str, catalog: Optional[Any] = None) -> Tuple[str, str]:
+    """
+    Key cache sebuah pertanyaan: mobil yang disebut + sisa pertanyaan ternormalisasi
+
+    Mobil dikenali lewat catalog.match_text dan disimpan sebagai himpunan id,
+    sehingga "harga Avanza berapa?" dan "Berapa harga Toyota Avanza?"
+    menghasilkan key yang sama. Nama mobil (catalog.name_terms) dibuang dari
+    sisa pertanyaan, kecuali angka, negasi, dan kualifier.
+
+    Args:
+        question: Pertanyaan user
+        catalog: CatalogIndex atau SQLiteInventory (None = tanpa pengenalan mobil)
+
+    Returns:
+        Tuple (id mobil terurut dipisah koma, sisa pertanyaan)
+    """
+    tokens = normalize_question(question).split()
+    if catalog is None:
+        return "", " ".join(tokens)
+
+    ids = sorted({mobil["id"] for mobil in catalog.match_text(question, limit=10)})
+    strict = set(_strict_tokens(tokens))
+    rest = [token for token in tokens if token not in catalog.name_terms or token in strict]
+    return ",".join(str(mobil_id) for mobil_id in ids), " ".join(rest)
+
+
+class ResponseCache:
+    """
+    Cache jawaban dengan lookup exact + near-duplicate (n-gram), TTL, LRU, dan penyimpanan SQLite
+
+    Key: (versi data showroom, mobil yang disebut, sisa pertanyaan
+    ternormalisasi; lihat question_key). Pertanyaan yang mirip (cosine
+    trigram >= similarity_threshold) juga dianggap hit, asalkan versi data,
+    mobil, dan token ketat (angka, negasi, kualifier) sama. Kandidat near-duplicate diindeks per kombinasi itu, sehingga
+    lookup tidak bertambah lambat seiring isi cache.
+
+    Tulis ke SQLite dijalankan oleh thread writer terpisah, sehingga put()
+    dari event loop bersama tidak menunggu commit ke disk.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl: float = 6 * 3600,
+        max_entries: int = 1000,
+        similarity_threshold: float = 0.9,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        # (versi data, mobil, token ketat) -> key entry, kandidat near-duplicate
+        self._buckets: Dict[Tuple, Set[Tuple[str, str, str]]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes: "queue.Queue[Tuple[str, Any, bool]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+        if path:
+            try:
+                self._open_db(path)
+            except (OSError, sqlite3.Error) as e:
+                # Cache disk opsional, tetap jalan dengan cache memori saja
+                log.warning("disk_cache_unavailable", path=path, error=str(e))
+                self._db = None
+
+    def _open_db(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Tabel lama (key dengan konteks percakapan) tidak kompatibel dengan key sekarang
+        self._db.execute("DROP TABLE IF EXISTS responses")
+        self._db.execute("DROP TABLE IF EXISTS answers")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS shared_answers (
+                data_version TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                question TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (data_version, subject, question)
+            )
+            """
+        )
+        self._db.execute("DELETE FROM shared_answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT data_version, subject, question, response, created_at FROM shared_answers "
+            "ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for data_version, subject, question, response, created_at in reversed(rows):
+            self._store((data_version, subject, question), response, created_at)
+
+    @staticmethod
+    def _bucket(key: Tuple[str, str, str]) -> Tuple:
+        return key[:2] + (_strict_tokens(key[2].split()),)
+
+    def _store(self, key: Tuple[str, str, str], response: str, created_at: float):
+        self._entries[key] = {
+            "response": response,
+            "created_at": created_at,
+            "vector": _trigram_vector(key[2]),
+        }
+        self._entries.move_to_end(key)
+        self._buckets[self._bucket(key)].add(key)
+
+    def _write(self, sql: str, params: Any = (), many: bool = False):
+        # Dipanggil dengan self._lock dipegang; diserahkan ke thread writer dengan urutan yang sama
+        if self._db is None:
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+            self._writer.start()
+        self._writes.put((sql, params, many))
+
+    def _write_loop(self):
+        while True:
+            # Tulis yang sudah mengantri digabung dalam satu commit
+            batch = [self._writes.get()]
+            while not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                for sql, params, many in batch:
+                    if many:
+                        self._db.executemany(sql, params)
+                    else:
+                        self._db.execute(sql, params)
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning("disk_cache_write_failed", error=str(e))
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def flush(self):
+        """Menunggu semua tulis ke disk yang mengantri selesai"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        return now - entry["created_at"] > self.ttl
+
+    def _delete(self, keys: List[Tuple[str, str, str]]):
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                bucket = self._bucket(key)
+                self._buckets[bucket].discard(key)
+                if not self._buckets[bucket]:
+                    del self._buckets[bucket]
+        if keys:
+            self._write(
+                "DELETE FROM shared_answers WHERE data_version = ? AND subject = ? AND question = ?",
+                keys, many=True,
+            )
+
+    def get(self, question: str, conversation_history: List[Dict], data_version: str, catalog: Optional[Any] = None) -> Optional[str]:
+        """
+        Mencari jawaban tersimpan untuk pertanyaan yang sama atau mirip
+
+        Args:
+            question: Pertanyaan user
+            conversation_history: History percakapan sebelumnya
+            data_version: Versi data showroom (lihat helper.get_data_version)
+            catalog: Index katalog untuk mengenali mobil yang disebut (lihat question_key)
+
+        Returns:
+            Jawaban dari cache, atau None jika tidak ada
+        """
+        if not is_cacheable(question, conversation_history):
+            return None
+        subject, normalized = question_key(question, catalog)
+        if not subject and not normalized:
+            return None
+
+        key = (data_version, subject, normalized)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                # Cari pertanyaan mirip hanya di antara entry dengan mobil dan token ketat yang sama
+                vector = _trigram_vector(normalized)
+                best_score = self.similarity_threshold
+                for candidate_key in self._buckets.get(self._bucket(key), ()):
+                    candidate = self._entries[candidate_key]
+                    score = _cosine(vector, candidate["vector"])
+                    if score >= best_score:
+                        best_score, key, entry = score, candidate_key, candidate
+
+            if entry is None:
+                return None
+
+            if self._expired(entry, now):
+                self._delete([key])
+                return None
+
+            self._entries.move_to_end(key)
+            return entry["response"]
+
+    def put(self, question: str, conversation_history: List[Dict], data_version: str, response: str, catalog: Optional[Any] = None):
+        """
+        Menyimpan jawaban yang berhasil dari model
+
+        Args:
+            question: Pertanyaan user
+            conversation_history: History percakapan sebelumnya
+            data_version: Versi data showroom
+            response: Jawaban model
+            catalog: Index katalog, harus sama dengan yang dipakai get()
+        """
+        if not is_cacheable(question, conversation_history):
+            return
+        subject, normalized = question_key(question, catalog)
+        if not subject and not normalized:
+            return
+
+        key = (data_version, subject, normalized)
+        now = time.time()
+
+        with self._lock:
+            self._store(key, response, now)
+            self._write(
+                "INSERT OR REPLACE INTO shared_answers (data_version, subject, question, response, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, response, now),
+            )
+
+            # LRU: buang entry yang paling lama tidak dipakai
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._delete(list(self._entries.keys())[:overflow])
+
+    def clear(self):
+        """Menghapus semua isi cache (memori dan disk)"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._write("DELETE FROM shared_answers")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Cache global, dipakai bersama oleh semua session Streamlit dalam satu proses
+RESPONSE_CACHE = ResponseCache()
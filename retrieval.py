@@ -0,0 +1,154 @@
+"""
+retrieval.py - Memilih data showroom yang relevan dengan pertanyaan user (retrieval-augmented prompt)
+"""
+
+import math
+import threading
+from collections import Counter
+from typing import List, Dict, Tuple
+
+from catalog import get_catalog_index, parse_filter_query, tokenize
+from data import get_data_version
+
+# Kata yang menandakan pertanyaan tentang promo
+PROMO_KEYWORDS = {"promo", "promosi", "diskon", "potongan", "cashback", "hadiah", "gratis", "spesial", "penawaran"}
+
+# Kata yang menandakan pertanyaan tentang kredit/pembiayaan
+FINANCING_KEYWORDS = {
+    "kredit", "cicilan", "cicil", "angsuran", "dp", "uang", "muka", "tenor", "bunga", "leasing",
+    "pembiayaan", "financing", "bulan", "bulanan", "nyicil",
+}
+
+
+def _normalize_tokens(text: str) -> List[str]:
+    tokens = []
+    for token in tokenize(text):
+        if len(token) > 5 and token.endswith("nya"):
+            token = token[:-3]
+        tokens.append(token)
+    return tokens
+
+
+class LexicalIndex:
+    """Index BM25 sederhana untuk sekumpulan dokumen pendek (promo, paket, dll)"""
+
+    def __init__(self, documents: List[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_tokens = [Counter(_normalize_tokens(doc)) for doc in documents]
+        self.doc_lengths = [sum(tokens.values()) for tokens in self.doc_tokens]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if documents else 0.0
+        document_frequency = Counter()
+        for tokens in self.doc_tokens:
+            document_frequency.update(tokens.keys())
+        total = len(documents)
+        self.idf = {
+            token: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for token, df in document_frequency.items()
+        }
+
+    def rank(self, query_tokens: List[str]) -> List[Tuple[int, float]]:
+        """
+        Mengurutkan dokumen berdasarkan skor BM25 terhadap token query
+
+        Args:
+            query_tokens: Token query yang sudah dinormalisasi
+
+        Returns:
+            List (posisi dokumen, skor) dengan skor > 0, skor tertinggi di depan
+        """
+        query = set(query_tokens)
+        scores = []
+        for pos, tokens in enumerate(self.doc_tokens):
+            score = 0.0
+            for token in query:
+                tf = tokens.get(token)
+                if not tf:
+                    continue
+                norm = 1 - self.b + self.b * self.doc_lengths[pos] / (self.avg_length or 1)
+                score += self.idf[token] * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+            if score > 0:
+                scores.append((pos, score))
+        return sorted(scores, key=lambda item: (-item[1], item[0]))
+
+
+# Cache index promo per versi data promosi
+_PROMO_INDEX_CACHE: Dict[str, LexicalIndex] = {}
+_PROMO_INDEX_LOCK = threading.Lock()
+
+
+def _get_promo_index(promosi: List[Dict]) -> LexicalIndex:
+    version = get_data_version(promosi)
+    index = _PROMO_INDEX_CACHE.get(version)
+    if index is None:
+        index = LexicalIndex([f"{promo['judul']} {promo['deskripsi']}" for promo in promosi])
+        with _PROMO_INDEX_LOCK:
+            _PROMO_INDEX_CACHE.clear()
+            _PROMO_INDEX_CACHE[version] = index
+    return index
+
+
+def _last_user_message(conversation_history: List[Dict]) -> str:
+    for msg in reversed(conversation_history):
+        if msg["role"] == "user":
+            return msg["content"]
+    return ""
+
+
+def retrieve_context(showroom_data: Dict, user_message: str, conversation_history: List[Dict], top_k: int = 5) -> Dict[str, List[Dict]]:
+    """
+    Memilih mobil, promo, dan paket pembiayaan yang relevan untuk pesan user
+
+    Mobil yang disebut namanya selalu diambil lebih dulu. Jika pesan juga
+    berisi batasan (harga, cicilan, tahun, kategori, merek), mobil yang
+    disebut dan memenuhi batasan didahulukan; filter terstruktur hanya
+    dipakai jika tidak ada mobil yang disebut, atau untuk menambah pilihan
+    jika mobil yang disebut tidak memenuhi batasan ("Civic bekas ada?").
+    Jika tidak ada mobil maupun batasan (pertanyaan lanjutan seperti
+    "cicilannya berapa?"), pesan user sebelumnya dipakai.
+
+    Args:
+        showroom_data: Dictionary berisi data showroom
+        user_message: Pesan dari user
+        conversation_history: History percakapan sebelumnya
+        top_k: Jumlah maksimal mobil/promo yang diambil
+
+    Returns:
+        Dictionary dengan key "mobil", "promosi", dan "paket_pembiayaan"
+    """
+    catalog_index = get_catalog_index(showroom_data['daftar_mobil'])
+    previous_message = _last_user_message(conversation_history)
+
+    car_filter = parse_filter_query(user_message, catalog_index)
+    if car_filter.is_empty:
+        mobil = catalog_index.match_text(user_message, limit=top_k)
+        if not mobil and previous_message:
+            mobil = catalog_index.match_text(previous_message, limit=top_k)
+    else:
+        # Merek/kategori yang sudah jadi batasan tidak dihitung sebagai nama mobil,
+        # agar "SUV di bawah 300 juta" tidak mengembalikan semua SUV
+        named = catalog_index.match_text(user_message, limit=top_k, ignore=car_filter.terms)
+        mobil = [m for m in named if car_filter.matches(m)]
+        if not mobil:
+            mobil = named + [m for m in catalog_index.filter(car_filter, limit=top_k) if m not in named]
+            mobil = mobil[:max(top_k, len(named))]
+
+    query_tokens = _normalize_tokens(user_message)
+    query_set = set(query_tokens)
+
+    # Promo: yang menyebut mobil terkait, atau semua promo jika user menanyakan promo
+    promo_query = query_tokens + [token for m in mobil for token in tokenize(f"{m['merek']} {m['model']}")]
+    promosi = showroom_data['promosi']
+    ranked = _get_promo_index(promosi).rank(promo_query)
+    selected = [promosi[pos] for pos, _ in ranked[:top_k]]
+    if query_set & PROMO_KEYWORDS:
+        selected += [promo for promo in promosi if promo not in selected]
+
+    # Paket pembiayaan hanya relevan untuk pertanyaan kredit/cicilan
+    paket = list(showroom_data['paket_pembiayaan']) if query_set & FINANCING_KEYWORDS else []
+
+    return {
+        "mobil": mobil,
+        "promosi": selected,
+        "paket_pembiayaan": paket,
+    }
@@ -0,0 +1,452 @@
+"""
+telemetry.py - Logging terstruktur dan metrik latency (counter, histogram, timer per tahap)
+"""
+
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable
+
+# Level log (DEBUG menampilkan detail tiap percobaan model, termasuk potongan pesan user)
+LOG_LEVEL = os.getenv("CHATBOT_LOG_LEVEL", "INFO").upper()
+
+# Format log: "text" (mudah dibaca) atau "json" (satu objek per baris, untuk agregasi)
+LOG_FORMAT = os.getenv("CHATBOT_LOG_FORMAT", "text").lower()
+
+# File log (kosong = stderr)
+LOG_FILE = os.getenv("CHATBOT_LOG_FILE", "")
+
+# Metrik dimatikan dengan CHATBOT_METRICS=false (semua pencatatan menjadi no-op)
+METRICS_ENABLED = os.getenv("CHATBOT_METRICS", "true").lower() not in ("0", "false", "no")
+
+# Ekspor metrik: port HTTP lokal (/metrics format Prometheus, /metrics.json) dan/atau file JSON berkala
+METRICS_PORT = int(os.getenv("CHATBOT_METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("CHATBOT_METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.getenv("CHATBOT_METRICS_INTERVAL", "30"))
+
+# Batas bucket histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0)
+TOKEN_BUCKETS = (250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000)
+DEPTH_BUCKETS = (1, 2, 3, 4, 5)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formatter untuk log event + field (key=value atau JSON satu baris)"""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", {})
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+
+        if self.json:
+            payload = {"ts": timestamp, "level": record.levelname, "logger": record.name, "event": record.getMessage(), **fields}
+            if record.exc_info:
+                payload["exc"] = self.formatException(record.exc_info)
+            return json.dumps(payload, ensure_ascii=False, default=str)
+
+        text = f"{timestamp} {record.levelname:<7} {record.name} {record.getMessage()}"
+        if fields:
+            text += " " + " ".join(f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class StructuredLogger:
+    """
+    Logger dengan event + field terstruktur
+
+    Field hanya diformat jika level-nya aktif, dan penulisan ke stderr/file
+    dilakukan thread terpisah (QueueHandler), sehingga log di jalur request
+    tidak menunggu I/O.
+
+    Contoh:
+        log = get_logger("helper")
+        log.info("model_ok", model="gemini-2.5-flash", latency=1.23)
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info: bool = False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event: str, **fields: Any):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields: Any):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields: Any):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields: Any):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields: Any):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+class _StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler yang tidak memformat record di thread pemanggil
+
+    prepare bawaan menggabungkan traceback ke pesan dan menghapus exc_info,
+    sehingga field "exc" di log JSON tidak pernah terisi. Di sini hanya
+    pesan yang diisi argumennya; exc_info dan fields dibiarkan utuh untuk
+    diformat StructuredFormatter di thread listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_LOGGING_LOCK = threading.Lock()
+_LOG_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+
+def _configure_logging():
+    global _LOG_LISTENER
+    with _LOGGING_LOCK:
+        if _LOG_LISTENER is not None:
+            return
+
+        handler = logging.FileHandler(LOG_FILE, encoding="utf-8") if LOG_FILE else logging.StreamHandler(sys.stderr)
+        handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+
+        # Logger hanya menaruh record ke antrian, thread listener yang menulis ke stderr/file
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger("chatbot")
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.addHandler(_StructuredQueueHandler(log_queue))
+        root.propagate = False
+
+        _LOG_LISTENER = logging.handlers.QueueListener(log_queue, handler)
+        _LOG_LISTENER.start()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """
+    Mengambil logger terstruktur untuk satu modul
+
+    Args:
+        name: Nama modul (menjadi "chatbot.<name>")
+
+    Returns:
+        StructuredLogger
+    """
+    _configure_logging()
+    return StructuredLogger(f"chatbot.{name}")
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, histogram: "Histogram", labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+
+class Counter:
+    """Counter per kombinasi label"""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any):
+        if not self.registry.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """
+    Gauge yang nilainya dibaca saat metrik diekspor
+
+    collect mengembalikan pasangan (label, nilai), misalnya dari snapshot
+    rate limiter atau kesehatan model, sehingga jalur request tidak perlu
+    memperbarui apa pun.
+    """
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str,
+                 collect: Callable[[], Iterable[Tuple[Dict[str, Any], float]]]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.collect = collect
+
+    def values(self) -> Dict[Tuple, float]:
+        if not self.registry.enabled:
+            return {}
+        return {_label_key(labels): value for labels, value in self.collect()}
+
+
+class Histogram:
+    """Histogram dengan bucket tetap per kombinasi label (count, sum, dan estimasi persentil)"""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}   # label -> [counts per bucket (+inf di akhir), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        if not self.registry.enabled:
+            return
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels: Any):
+        """
+        Context manager untuk mengukur durasi blok kode (detik)
+
+        Contoh:
+            with STAGE_SECONDS.time(stage="prompt_build"):
+                prompt = build_prompt(...)
+        """
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def series(self) -> Dict[Tuple, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def percentile(self, q: float, counts: List[int], count: int) -> float:
+        """Estimasi persentil (batas atas bucket tempat persentil jatuh)"""
+        if not count:
+            return 0.0
+        target = q * count
+        running = 0
+        for index, bucket_count in enumerate(counts):
+            running += bucket_count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Kumpulan metrik proses (dipakai bersama oleh semua session)
+
+    Jika enabled False, inc/observe/time langsung kembali tanpa mengunci
+    atau mengalokasikan apa pun.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(self, name, help_text)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help_text: str = "", buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(self, name, help_text, buckets)
+            return self._metrics[name]
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Iterable[Tuple[Dict[str, Any], float]]]) -> Gauge:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Gauge(self, name, help_text, collect)
+            return self._metrics[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Nilai semua metrik dalam bentuk dictionary (untuk JSON)
+
+        Returns:
+            Dictionary nama metrik -> list series (label + nilai/ringkasan histogram)
+        """
+        result = {}
+        for name, metric in list(self._metrics.items()):
+            if isinstance(metric, (Counter, Gauge)):
+                result[name] = [{"labels": dict(key), "value": value} for key, value in metric.values().items()]
+            else:
+                result[name] = [
+                    {
+                        "labels": dict(key),
+                        "count": count,
+                        "sum": round(total, 6),
+                        "p50": metric.percentile(0.50, counts, count),
+                        "p95": metric.percentile(0.95, counts, count),
+                        "p99": metric.percentile(0.99, counts, count),
+                        "buckets": dict(zip([str(b) for b in metric.buckets] + ["+Inf"], counts)),
+                    }
+                    for key, (counts, total, count) in metric.series().items()
+                ]
+        return result
+
+    def render_prometheus(self) -> str:
+        """Semua metrik dalam format teks Prometheus"""
+        lines = []
+        for name, metric in list(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            if isinstance(metric, (Counter, Gauge)):
+                lines.append(f"# TYPE {name} {'counter' if isinstance(metric, Counter) else 'gauge'}")
+                for key, value in metric.values().items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+                continue
+
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count) in metric.series().items():
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric.buckets) + ["+Inf"], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        """Menulis snapshot metrik ke file JSON (atomik: file sementara lalu rename)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "metrics": self.snapshot()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def _format_labels(key: Tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{str(value)}"' for name, value in key) + "}"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = METRICS.render_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(METRICS.snapshot(), ensure_ascii=False), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+_EXPORTERS_STARTED = False
+
+
+def start_exporters(port: int = METRICS_PORT, path: str = METRICS_FILE, interval: float = METRICS_FILE_INTERVAL):
+    """
+    Menjalankan ekspor metrik sekali per proses (aman dipanggil setiap rerun Streamlit)
+
+    Args:
+        port: Port HTTP lokal untuk /metrics dan /metrics.json (0 = tidak aktif)
+        path: File JSON yang diperbarui berkala (kosong = tidak aktif)
+        interval: Jeda penulisan file (detik)
+    """
+    global _EXPORTERS_STARTED
+    if _EXPORTERS_STARTED or not METRICS.enabled:
+        return
+
+    with _LOGGING_LOCK:
+        if _EXPORTERS_STARTED:
+            return
+        _EXPORTERS_STARTED = True
+
+    log = get_logger("telemetry")
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError as e:
+            log.warning("metrics_server_failed", port=port, error=str(e))
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            log.info("metrics_server_started", url=f"http://127.0.0.1:{port}/metrics")
+
+    if path:
+        def write_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    METRICS.write_json(path)
+                except OSError as e:
+                    log.warning("metrics_file_failed", path=path, error=str(e))
+
+        threading.Thread(target=write_loop, name="metrics-file", daemon=True).start()
+        log.info("metrics_file_started", path=path, interval=interval)
+
+
+# Registry global dan metrik standar chatbot
+METRICS = MetricsRegistry(enabled=METRICS_ENABLED)
+
+REQUEST_SECONDS = METRICS.histogram("chatbot_request_seconds", "Waktu total satu jawaban (label: mode, source)")
+STAGE_SECONDS = METRICS.histogram("chatbot_stage_seconds", "Durasi per tahap (label: stage, model)")
+MODEL_ATTEMPTS = METRICS.counter("chatbot_model_attempts_total", "Percobaan model (label: model, outcome = ok / kelas error)")
+FALLBACK_DEPTH = METRICS.histogram("chatbot_fallback_depth", "Jumlah percobaan model sampai berhasil", DEPTH_BUCKETS)
+PROMPT_TOKENS = METRICS.histogram("chatbot_prompt_tokens", "Estimasi token prompt per request", TOKEN_BUCKETS)
+RESPONSES = METRICS.counter("chatbot_responses_total", "Jawaban per sumber (label: source)")
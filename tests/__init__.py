@@ -0,0 +1,3 @@
+"""
+tests - Test perilaku modul chatbot (jalankan dengan: python -m pytest -q)
+"""
@@ -0,0 +1,29 @@
+"""
+conftest.py - Setup bersama test: path repo dan API key tiruan (tidak ada request ke Gemini)
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+DATA_PATH = os.path.join(ROOT, "showroom_data.json")
+
+
+@pytest.fixture
+def showroom_data():
+    """Data showroom bawaan (showroom_data.json), dibaca ulang untuk tiap test"""
+    with open(DATA_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def catalog_index(showroom_data):
+    """CatalogIndex dari data showroom bawaan"""
+    from catalog import get_catalog_index
+    return get_catalog_index(showroom_data["daftar_mobil"])
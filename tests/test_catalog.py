@@ -0,0 +1,75 @@
+"""
+test_catalog.py - Parsing pertanyaan filter dan pencocokan nama mobil
+"""
+
+import pytest
+
+from catalog import CarFilter, parse_filter_query
+
+
+def test_price_upper_bound_and_category(catalog_index):
+    car_filter = parse_filter_query("SUV di bawah 300 juta", catalog_index)
+
+    assert car_filter.harga_max == 300_000_000
+    assert car_filter.harga_min is None
+    assert car_filter.kategori == ["suv"]
+    assert car_filter.is_pure
+
+
+def test_installment_range(catalog_index):
+    car_filter = parse_filter_query("cicilan antara 5 - 7 juta", catalog_index)
+
+    assert (car_filter.cicilan_min, car_filter.cicilan_max) == (5_000_000, 7_000_000)
+    assert car_filter.harga_min is None and car_filter.harga_max is None
+    assert car_filter.sort_by == "cicilan"
+
+
+@pytest.mark.parametrize("text, tahun_min, tahun_max", [
+    ("Toyota tahun 2024 termurah", 2024, 2024),
+    ("mobil tahun 2019 ke atas", 2019, None),
+    ("mobil tahun 2020 ke bawah", None, 2020),
+])
+def test_year(catalog_index, text, tahun_min, tahun_max):
+    car_filter = parse_filter_query(text, catalog_index)
+
+    assert (car_filter.tahun_min, car_filter.tahun_max) == (tahun_min, tahun_max)
+
+
+def test_around_gives_ten_percent_band(catalog_index):
+    car_filter = parse_filter_query("mobil sekitar 200 juta", catalog_index)
+
+    assert (car_filter.harga_min, car_filter.harga_max) == (180_000_000, 220_000_000)
+
+
+def test_used_category_and_brand(catalog_index):
+    car_filter = parse_filter_query("honda mpv bekas", catalog_index)
+
+    assert car_filter.merek == ["honda"]
+    assert car_filter.kategori == ["mpv bekas"]
+    assert car_filter.bekas is True
+    assert car_filter.terms == {"honda", "mpv", "bekas", "second"}
+
+
+def test_open_question_is_not_pure(catalog_index):
+    car_filter = parse_filter_query("SUV di bawah 300 juta yang irit untuk keluarga", catalog_index)
+
+    assert not car_filter.is_empty
+    assert not car_filter.is_pure
+
+
+def test_small_numbers_are_not_prices(catalog_index):
+    assert parse_filter_query("mobil untuk 7 orang", catalog_index).is_empty
+
+
+def test_matches_agrees_with_filter(catalog_index):
+    car_filter = parse_filter_query("mobil bekas di bawah 200 juta", catalog_index)
+    expected = {m["id"] for m in catalog_index.filter(car_filter)}
+
+    assert expected == {10}
+    assert {m["id"] for m in catalog_index.mobil if car_filter.matches(m)} == expected
+
+
+def test_match_text_ignores_filter_terms(catalog_index):
+    assert [m["model"] for m in catalog_index.match_text("pajero termasuk suv", ignore={"suv"})] == ["Pajero Sport 2.4 AT"]
+    assert catalog_index.match_text("suv toyota", ignore={"suv", "toyota"}) == []
+    assert CarFilter().terms == set()
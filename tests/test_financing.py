@@ -0,0 +1,99 @@
+"""
+test_financing.py - Matriks cicilan dibanding hitungan manual, dan pembacaan DP/tenor dari pesan user
+"""
+
+import math
+
+import pytest
+
+import helper
+from financing import FinancingMatrix, get_financing_matrix, parse_financing_request, unparsed_dp_text
+
+PAKET = [
+    {"tenor": "12 Bulan", "bunga": "3.5%", "dp_minimum": "20%", "catatan": "Mobil baru"},
+    {"tenor": "36 Bulan", "bunga": "4.8%", "dp_minimum": "10%", "catatan": "Mobil baru & bekas"},
+    {"tenor": "48 Bulan", "bunga": "5.5%", "dp_minimum": "10%", "catatan": "Mobil baru saja"},
+]
+MOBIL = [
+    {"id": 1, "merek": "Toyota", "model": "Avanza", "harga": 181_000_000, "kategori": "MPV"},
+    {"id": 9, "merek": "Toyota", "model": "Innova", "harga": 285_000_000, "kategori": "MPV Bekas"},
+]
+
+
+def manual(harga, dp, bunga, tenor):
+    # Bunga flat per tahun, dibulatkan ke atas per Rp 1.000
+    return math.ceil(harga * (1 - dp) * (1 + bunga * tenor / 12) / tenor / 1000) * 1000
+
+
+def by_tenor(rows):
+    return {row["tenor"]: row["cicilan"] for row in rows}
+
+
+def test_avanza_dp20_36_bulan():
+    # 181.000.000 x 0,8 x (1 + 4,8% x 3) / 36 = 4.601.422 -> 4.602.000
+    rows = by_tenor(FinancingMatrix(MOBIL, PAKET).simulasi(1, 0.20))
+
+    assert rows[36] == 4_602_000
+    assert rows[12] == manual(181_000_000, 0.20, 0.035, 12) == 12_489_000
+    assert rows[48] == manual(181_000_000, 0.20, 0.055, 48) == 3_681_000
+
+
+def test_dp_minimum_and_used_car_rules():
+    matrix = FinancingMatrix(MOBIL, PAKET)
+
+    # DP 15% di bawah minimum tenor 12 bulan (20%)
+    assert by_tenor(matrix.simulasi(1, 0.15))[12] is None
+    # Tenor 12 & 48 bulan khusus mobil baru
+    assert by_tenor(matrix.simulasi(9, 0.30)) == {12: None, 36: manual(285_000_000, 0.30, 0.048, 36), 48: None}
+
+
+def test_custom_dp_matches_matrix_and_sqlite_path():
+    matrix = FinancingMatrix(MOBIL, PAKET)
+    dp = 50_000_000 / 181_000_000
+
+    assert by_tenor(matrix.simulasi(1, dp))[36] == manual(181_000_000, dp, 0.048, 36) == 4_163_000
+    assert matrix.simulasi(1, 0.30) == matrix.hitung(1, 0.30)
+
+
+def test_shipped_data_matches_hand_computed(showroom_data):
+    matrix = get_financing_matrix(showroom_data["daftar_mobil"], showroom_data["paket_pembiayaan"])
+
+    assert by_tenor(matrix.simulasi(1, 0.20))[36] == 4_602_000
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("kredit avanza dp 30% 48 bulan", (0.30, None, 48)),
+    ("uang muka 50 juta tenor 3 tahun", (None, 50_000_000, 36)),
+    ("dpnya 1,5 jt", (None, 1_500_000, None)),
+    ("dp 0", (0.0, None, None)),
+    ("dp 0%", (0.0, None, None)),
+    ("dp 50000000", (None, 50_000_000, None)),
+    ("dp 50.000.000 tenor 4", (None, 50_000_000, 48)),
+    ("tenor 36", (None, None, 36)),
+    ("dp 12 bulan", (None, None, 12)),
+])
+def test_parse_financing_request(text, expected):
+    assert parse_financing_request(text) == expected
+    assert unparsed_dp_text(text) is None
+
+
+def test_ambiguous_dp_is_reported(showroom_data):
+    assert parse_financing_request("kredit avanza dp 30") == (None, None, None)
+    assert unparsed_dp_text("kredit avanza dp 30") == "dp 30"
+
+    response, source = helper.route_local_answer("kredit avanza dp 30", showroom_data)
+    assert source == "financing"
+    assert '"dp 30" belum bisa kami baca sebagai DP' in response
+
+
+def test_unavailable_tenor_is_reported(showroom_data):
+    response, _ = helper.route_local_answer("kredit avanza dp 20% 30 bulan", showroom_data)
+
+    assert "Tenor 30 bulan tidak ada di paket kami" in response
+
+
+def test_catalog_card_does_not_claim_tenor(showroom_data):
+    card = helper.format_mobil_info(showroom_data["daftar_mobil"][0])
+
+    assert "36 bulan" not in card
+    assert "Cicilan promo: Rp 5.800.000/bulan" in card
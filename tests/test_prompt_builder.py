@@ -0,0 +1,53 @@
+"""
+test_prompt_builder.py - Prompt tetap dalam budget dan sisa budget dipakai lagi oleh bagian yang diperkecil
+"""
+
+import helper
+from prompt_builder import MIN_TRUNCATED_TOKENS, PromptBuilder, estimate_tokens
+
+
+def test_overshrunk_sections_are_reexpanded():
+    builder = PromptBuilder(400)
+    builder.add("instruksi", "i" * 700, 0, required=True)                                   # ~200 token
+    builder.add("mobil", "m" * 1400, 1, fallback="ringkas " * 10)                            # ~400 -> ~23 token
+    builder.add("promosi", "p" * 700, 5, truncatable=True)                                  # ~200 token
+    builder.add("ringkasan", "r" * 700, 6, truncatable=True)                                # ~200 token
+
+    prompt = builder.build()
+    sections = builder.report["sections"]
+
+    # Promo & ringkasan sempat dipotong ke batas minimum sebelum daftar mobil diringkas
+    assert builder.total_tokens() <= 400
+    assert estimate_tokens(prompt) >= 400 - 5
+    assert sections["promosi"] > MIN_TRUNCATED_TOKENS * 4
+    assert sections["promosi"] >= sections["ringkasan"]
+
+
+def test_dropped_section_comes_back_when_budget_allows():
+    builder = PromptBuilder(300)
+    builder.add("instruksi", "i" * 350, 0, required=True)        # ~100 token
+    builder.add("promosi", "p" * 175, 5)                         # ~50 token, tidak bisa dipotong
+    builder.add("mobil", "m" * 1400, 1, fallback="m" * 350)       # ~400 -> ~100 token
+
+    builder.build()
+
+    assert builder.report["shrunk"] == [("mobil", "fallback")]
+    assert "promosi" in builder.report["sections"]
+    assert builder.total_tokens() <= 300
+
+
+def test_budget_is_used_for_long_conversation(showroom_data):
+    history = [{"role": "assistant", "content": "Halo! Ada yang bisa dibantu?"}]
+    for i in range(12):
+        history.append({"role": "user", "content": f"pertanyaan {i} soal kredit fortuner " + "tolong jelaskan detailnya ya " * 20})
+        history.append({"role": "assistant", "content": "Penjelasannya: " + "cicilan dan promo berlaku sesuai syarat. " * 40})
+    summary = "User tertarik SUV keluarga, membandingkan Fortuner dan Pajero. " * 30
+
+    _, report = helper.build_prompt(
+        "ada promo dan kredit suv dp 30%?", showroom_data, history,
+        retrieval=True, conversation_summary=summary, token_budget=3000,
+    )
+
+    assert 3000 - 50 <= report["tokens"] <= 3000
+    assert ("promosi", "truncated") not in report["shrunk"]
+    assert report["sections"]["ringkasan"] > MIN_TRUNCATED_TOKENS * 4
@@ -0,0 +1,109 @@
+"""
+test_rate_limit.py - Token bucket, overflow model murah, dan antrian adil antar session
+"""
+
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import DEFAULT_RATE_LIMITS, QueueTicket, RateLimiter, TokenBucket, parse_rate_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(10)   # burst 2, sisa 8 token per 60 detik
+
+    assert bucket.try_take() and bucket.try_take()
+    assert not bucket.try_take()
+    assert bucket.time_until_available() == pytest.approx(7.5)
+
+    clock.now += 7.5
+    assert bucket.try_take()
+    assert not bucket.try_take()
+
+
+def test_bucket_never_exceeds_rpm_in_any_window(clock):
+    bucket = TokenBucket(10)
+    taken = []
+    for _ in range(240):   # coba tiap 0,5 detik selama 2 menit
+        if bucket.try_take():
+            taken.append(clock.now)
+        clock.now += 0.5
+
+    for start in taken:
+        assert sum(1 for t in taken if start <= t < start + 60) <= 10
+
+
+def test_parse_rate_limits_overrides_defaults():
+    limits = {**DEFAULT_RATE_LIMITS, **parse_rate_limits("gemini-2.5-flash=1000, gemini-2.5-pro=0")}
+    limiter = RateLimiter(limits)
+
+    assert limiter.buckets["gemini-2.5-flash"].rpm == 1000
+    assert "gemini-2.5-pro" not in limiter.buckets      # 0 = tanpa batas
+    assert limiter.buckets["gemini-2.5-flash-lite"].rpm == DEFAULT_RATE_LIMITS["gemini-2.5-flash-lite"]
+
+
+def test_overflow_to_cheap_model_before_other_fallbacks(clock):
+    limiter = RateLimiter({"gemini-2.5-flash": 10, "gemini-2.5-flash-lite": 15, "gemini-2.5-pro": 5})
+    models = ["gemini-2.5-flash", "gemini-2.5-pro", "gemini-2.5-flash-lite"]
+
+    granted = [limiter.try_acquire(models) for _ in range(6)]
+
+    assert granted == [
+        "gemini-2.5-flash", "gemini-2.5-flash",
+        "gemini-2.5-flash-lite", "gemini-2.5-flash-lite", "gemini-2.5-flash-lite",
+        "gemini-2.5-pro",
+    ]
+
+
+def test_fair_queue_rotates_between_sessions():
+    limiter = RateLimiter({"m": 6000})   # 80 token per detik setelah burst
+    limiter.buckets["m"].tokens = 0.0
+    served = []
+
+    async def request(session_id: str, name: str):
+        await limiter.acquire(["m"], QueueTicket(session_id))
+        served.append(name)
+
+    async def scenario():
+        # Session A mengirim 3 pesan sebelum session B mengirim 1
+        await asyncio.gather(request("A", "a1"), request("A", "a2"), request("A", "a3"), request("B", "b1"))
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+    assert served == ["a1", "b1", "a2", "a3"]
+    assert limiter.queue_length == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    limiter = RateLimiter({"m": 5})
+    limiter.buckets["m"].tokens = 0.0
+
+    async def scenario():
+        ticket = QueueTicket("A")
+        task = asyncio.ensure_future(limiter.acquire(["m"], ticket))
+        await asyncio.sleep(0.05)
+        assert limiter.queue_length == 1 and ticket.position == 1 and ticket.wait_estimate > 0
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return ticket
+
+    ticket = asyncio.run(scenario())
+    assert limiter.queue_length == 0
+    assert ticket.position == 0
@@ -0,0 +1,110 @@
+"""
+test_response_cache.py - Pasangan pertanyaan yang harus hit / miss di cache jawaban
+"""
+
+import pytest
+
+from response_cache import ResponseCache, question_key
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(path=None)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("harga Avanza berapa?", "Berapa harga Toyota Avanza?"),
+    ("harga Avanza berapa?", "Harga avanza brp"),
+    ("harga Avanza berapa?", "avanza harganya?"),
+    ("avanza vs xenia mana yang lebih irit", "xenia vs avanza mana lebih irit?"),
+    ("jam buka showroom kapan?", "Kapan jam buka showroomnya ya kak?"),
+])
+def test_hit(cache, catalog_index, stored, asked):
+    cache.put(stored, [], "v1", "jawaban", catalog_index)
+
+    assert cache.get(asked, [], "v1", catalog_index) == "jawaban"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("harga Avanza berapa?", "harga Xenia berapa?"),           # mobil lain
+    ("harga Avanza berapa?", "harga Avanza bekas berapa?"),    # kualifier
+    ("harga Avanza 2024", "harga Avanza 2023"),                # angka
+    ("cicilan avanza dp 20 juta", "cicilan avanza dp 30 juta"),
+    ("apakah avanza irit?", "apakah avanza tidak irit?"),      # negasi
+    ("harga xpander berapa?", "harga pajero berapa?"),         # mobil di luar katalog
+])
+def test_miss(cache, catalog_index, stored, asked):
+    cache.put(stored, [], "v1", "jawaban", catalog_index)
+
+    assert cache.get(asked, [], "v1", catalog_index) is None
+
+
+def test_data_version_change_misses(cache, catalog_index):
+    cache.put("harga avanza", [], "v1", "jawaban", catalog_index)
+
+    assert cache.get("harga avanza", [], "v2", catalog_index) is None
+
+
+def test_question_key_is_unordered_car_set(catalog_index):
+    assert question_key("Berapa harga Toyota Avanza?", catalog_index) == ("1", "harga")
+    assert question_key("xenia atau avanza", catalog_index)[0] == question_key("avanza atau xenia", catalog_index)[0] == "1,2"
+
+
+def test_near_duplicate_only_scans_same_bucket(cache, catalog_index):
+    for i in range(200):
+        cache.put(f"pertanyaan umum nomor {i}", [], "v1", str(i), catalog_index)
+    cache.put("harga avanza", [], "v1", "avanza", catalog_index)
+
+    # Entry tanpa mobil dan dengan angka berbeda tidak pernah menjadi kandidat near-duplicate
+    assert len(cache._buckets[("v1", "1", ())]) == 1
+    assert cache.get("harga avanza kak", [], "v1", catalog_index) == "avanza"
+
+
+def test_ttl_and_lru(catalog_index):
+    cache = ResponseCache(path=None, ttl=0, max_entries=2)
+    cache.put("harga avanza", [], "v1", "a", catalog_index)
+    assert cache.get("harga avanza", [], "v1", catalog_index) is None
+    assert len(cache) == 0
+
+    cache = ResponseCache(path=None, max_entries=2)
+    for name in ("avanza", "xenia", "rush"):
+        cache.put(f"harga {name}", [], "v1", name, catalog_index)
+    assert len(cache) == 2
+    assert cache.get("harga avanza", [], "v1", catalog_index) is None
+    assert cache._buckets.get(("v1", "1", ())) is None
+
+
+def test_persisted_to_disk(tmp_path, catalog_index):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path=path)
+    cache.put("harga avanza", [], "v1", "tersimpan", catalog_index)
+    cache.flush()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("Berapa harga Toyota Avanza?", [], "v1", catalog_index) == "tersimpan"
+
+
+def test_follow_up_questions_are_not_shared(cache, catalog_index):
+    history = [
+        {"role": "assistant", "content": "Halo! Ada yang bisa dibantu?"},
+        {"role": "user", "content": "Saya Budi, gaji 8 juta"},
+        {"role": "assistant", "content": "Baik Pak Budi"},
+    ]
+    cache.put("cicilan avanza berapa?", history, "v1", "Pak Budi, cicilannya ...", catalog_index)
+
+    assert len(cache) == 0
+    assert cache.get("cicilan avanza berapa?", [], "v1", catalog_index) is None
+
+
+def test_personal_first_message_is_not_cached(cache, catalog_index):
+    cache.put("nama saya Budi, harga avanza berapa?", [], "v1", "Halo Budi ...", catalog_index)
+
+    assert cache.get("nama saya Andi, harga avanza berapa?", [], "v1", catalog_index) is None
+    assert len(cache) == 0
+
+
+def test_greeting_only_history_is_still_shared(cache, catalog_index):
+    greeting = [{"role": "assistant", "content": "Halo! Ada yang bisa dibantu?"}]
+    cache.put("harga avanza", greeting, "v1", "jawaban", catalog_index)
+
+    assert cache.get("harga avanza", [], "v1", catalog_index) == "jawaban"
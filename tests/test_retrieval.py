@@ -0,0 +1,50 @@
+"""
+test_retrieval.py - Mobil, promo, dan paket yang dipilih untuk prompt
+"""
+
+import pytest
+
+from retrieval import retrieve_context
+
+
+def _models(context):
+    return [m["model"] for m in context["mobil"]]
+
+
+@pytest.mark.parametrize("message, expected", [
+    # Tahun dan kategori yang disebut tidak boleh menggeser mobil yang ditanyakan
+    ("Fortuner 2024 spesifikasinya apa?", ["Fortuner 2.8 Diesel AT"]),
+    ("apakah pajero termasuk suv?", ["Pajero Sport 2.4 AT"]),
+    ("harga toyota avanza", ["Avanza 1.3 MT"]),
+])
+def test_named_car_survives_constraints(showroom_data, message, expected):
+    assert _models(retrieve_context(showroom_data, message, [])) == expected
+
+
+def test_named_car_outside_constraints_is_kept_with_alternatives(showroom_data):
+    models = _models(retrieve_context(showroom_data, "Honda Civic bekas ada?", []))
+
+    assert models[0] == "Civic 1.5 Turbo AT"
+    assert "Jazz 1.5 Automatic" in models
+
+
+def test_constraints_only_use_filter(showroom_data):
+    context = retrieve_context(showroom_data, "SUV di bawah 300 juta", [])
+
+    assert _models(context) == ["Rush 1.5 MT", "Sonet 1.5 MT"]
+
+
+def test_follow_up_uses_previous_message(showroom_data):
+    history = [{"role": "user", "content": "Mau tanya Xenia"}, {"role": "assistant", "content": "Silakan"}]
+
+    context = retrieve_context(showroom_data, "cicilannya berapa?", history)
+
+    assert _models(context) == ["Xenia 1.3 MT"]
+    assert context["paket_pembiayaan"]
+
+
+def test_promo_and_financing_only_when_asked(showroom_data):
+    context = retrieve_context(showroom_data, "Avanza warnanya apa saja?", [])
+
+    assert context["paket_pembiayaan"] == []
+    assert len(retrieve_context(showroom_data, "ada promo apa?", [])["promosi"]) == len(showroom_data["promosi"])
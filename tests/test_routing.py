@@ -0,0 +1,66 @@
+"""
+test_routing.py - Pesan yang dijawab lokal vs dikirim ke model (helper.route_local_answer)
+"""
+
+import pytest
+
+import helper
+from intent import car_name_candidates
+
+GREETING = [{"role": "assistant", "content": "Halo! Ada yang bisa dibantu?"}]
+
+
+@pytest.mark.parametrize("message, source, expected", [
+    ("SUV di bawah 300 juta", "filter", "Rush"),
+    ("kredit avanza dp 30% 48 bulan", "financing", "Simulasi Kredit Toyota Avanza"),
+    ("cicilan avanza dp 20 juta", "financing", "Rp 20.000.000"),
+    ("harga avanza berapa?", "intent", "Avanza"),
+    ("brp harga fortuner", "intent", "Fortuner"),
+    ("harga innova bekas", "intent", "Innova"),
+    ("jam buka", "intent", "JAM OPERASIONAL"),
+    ("alamat", "intent", "HUBUNGI KAMI"),
+    ("ada promo bulan ini?", "intent", "PROMOSI"),
+    ("bisa kredit?", "intent", "PAKET PEMBIAYAAN"),
+])
+def test_answered_locally(showroom_data, message, source, expected):
+    response, routed = helper.route_local_answer(message, showroom_data, conversation_history=GREETING)
+
+    assert routed == source
+    assert expected in response
+
+
+@pytest.mark.parametrize("message", [
+    "cicilan xpander dp 20 juta",      # mobil di luar katalog
+    "harga xpander",
+    "stok brio ada?",
+    "harga avanza bekas",              # kualifier bertentangan dengan mobil yang disebut
+    "harga fortuner 2019",
+    "cicilan dp 20 juta",              # DP disebut tanpa mobil
+    "apa bedanya avanza dan xenia",    # pertanyaan terbuka
+    "stok avanza warna putih ada?",    # atribut yang tidak ada di data
+    "bisa bayar pakai kartu kredit?",
+])
+def test_sent_to_model(showroom_data, message):
+    assert helper.route_local_answer(message, showroom_data, conversation_history=GREETING) == (None, "")
+
+
+def test_reference_words_only_matter_after_a_user_turn(showroom_data):
+    history = GREETING + [
+        {"role": "user", "content": "harga fortuner berapa?"},
+        {"role": "assistant", "content": "Rp 530.000.000"},
+    ]
+
+    assert helper.route_local_answer("promo juga ada?", showroom_data, conversation_history=GREETING)[1] == "intent"
+    assert helper.route_local_answer("promo juga ada?", showroom_data, conversation_history=history) == (None, "")
+
+
+def test_classifier_can_be_disabled(showroom_data):
+    assert helper.route_local_answer("jam buka", showroom_data, classify=False) == (None, "")
+    assert helper.route_local_answer("SUV di bawah 300 juta", showroom_data, classify=False)[1] == "filter"
+
+
+def test_car_name_candidates():
+    assert car_name_candidates("cicilan xpander dp 20 juta") == ["xpander"]
+    assert car_name_candidates("harga terbaru mobil brio dong") == ["brio"]
+    assert car_name_candidates("bunga leasing berapa persen") == []
+    assert car_name_candidates("promo bulan ini apa") == []